@@ -0,0 +1,44 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Benchmarks for RGB. Run them from the root of the repository:
+
+	python -m bench.grammars
+	python -m bench.stages
+	python -m bench.startup
+	python -m bench.structs
+	python -m bench.params
+	python -m bench.backends <llvm_dir>
+	python -m bench.memory <llvm_dir>
+"""
+
+import os # Finding the source folder
+import sys # Making the source modules importable
+
+# The source modules import each other by name, just like when running
+# src/main.py, so the source folder has to be on the path.
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src')
+
+if SRC_DIR not in sys.path:
+	sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,228 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Compares the backends on the same headers.
+
+Every header in `example/` and a large synthetic header are run through every
+backend. For each one this reports how long each backend took (best of a few
+runs), how many declarations per second that is and whether it generated the
+same bindings as the first (pyparsing) backend. Generated argument names are
+random, so they are ignored when comparing.
+
+Backends can be left out with `--backends pyparsing,clang`.
+
+	python -m bench.backends <llvm_dir> [--declarations N] [--runs N] [--diff]
+		[--backends a,b]
+"""
+
+import argparse # Command line arguments
+import contextlib # Silencing warnings printed by the compilers
+import difflib # Comparing the outputs
+import glob # Finding the example headers
+import os # Paths
+import re # Ignoring generated argument names
+import tempfile # Where the outputs and the synthetic header go
+import time # Timing
+from bench import SRC_DIR # Where the examples are relative to
+import batch # Running a whole library
+
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(SRC_DIR), 'example')
+
+BACKENDS = ('pyparsing', 'pycparser', 'clang')
+
+# Arguments without names get a random one, e.g. `arg_name_ab12`
+RANDOM_NAME = re.compile(r'arg_name_\w+')
+
+
+def synthetic_header(path, count):
+	"""
+	Writes a header with `count` groups of typical declarations: a pound
+	define, function pointer, typedef, global variable, struct, enum and a
+	couple of functions each.
+
+	Args:
+		path(str): the header to write.
+		count(int): how many groups of declarations to write.
+	"""
+	types = ['int', 'unsigned int', 'float', 'double', 'char *', 'void *',
+		'short int', 'long long', 'const char *']
+
+	with open(path, 'w') as file:
+		file.write('#define SYNTHETIC_H 1\n')
+
+		for i in range(count):
+			a = types[i % len(types)]
+			b = types[(i * 7 + 3) % len(types)]
+			file.write(
+				f'#define CONST_{i} {i}\n'
+				f'typedef void (*callback_{i})(int a, {b} b);\n'
+				f'typedef unsigned int uint_{i};\n'
+				f'extern {a} global_{i};\n'
+				f'struct Struct_{i}\n'
+				'{\n'
+				'    int x, y;\n'
+				f'    {b} value;\n'
+				'    char **names;\n'
+				'};\n'
+				f'enum Enum_{i}\n'
+				'{\n'
+				f'    FIRST_{i} = {i},\n'
+				f'    SECOND_{i},\n'
+				f'    THIRD_{i} = 0x{i:X}\n'
+				'};\n'
+				f'{a} function_{i}({b} a0, int count, void *user);\n'
+				f'void procedure_{i}(void);\n'
+			)
+
+
+def run(header, llvm_dir, backend, out_file, runs):
+	"""
+	Generates the bindings of a header with one backend.
+
+	Args:
+		header(str): the header.
+		llvm_dir(str): the binary directory where LLVM lives.
+		backend(str): the backend to use.
+		out_file(str): where to write the bindings.
+		runs(int): how many times to run it.
+
+	Returns:
+		A tuple of (best time in seconds, number of declarations).
+	"""
+	best = None
+
+	for _ in range(runs):
+		start = time.perf_counter()
+
+		with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+			summary = batch.run_library(header, llvm_dir, out_file=out_file,
+				include_dir=os.path.dirname(header), dump_file=None,
+				backend=backend)
+
+		seconds = time.perf_counter() - start
+		best = seconds if best == None else min(best, seconds)
+
+	return best, sum(summary['kinds'].values())
+
+
+def differences(first, second):
+	"""
+	Compares two generated files, ignoring generated argument names.
+
+	Returns:
+		The lines of a unified diff, empty if they are the same.
+	"""
+	def read(path):
+		with open(path) as file:
+			return [RANDOM_NAME.sub('arg_name', i) for i in file]
+
+	return list(difflib.unified_diff(read(first), read(second), first,
+		second))
+
+
+def main(argv=None):
+	"""
+	Runs the comparison from the command line.
+
+	Args:
+		argv(list): the command line arguments (defaults to sys.argv).
+	"""
+	parser = argparse.ArgumentParser(
+		prog='python -m bench.backends',
+		description='Compares the backends.'
+	)
+	parser.add_argument('llvm_dir', help='the folder containing clang')
+	parser.add_argument(
+		'--declarations', type=int, default=1000,
+		help='how many groups of declarations the synthetic header has'
+	)
+	parser.add_argument(
+		'--runs', type=int, default=3, help='how many times to run each'
+	)
+	parser.add_argument(
+		'--diff', action='store_true', help='print the differences'
+	)
+	parser.add_argument(
+		'--backends', default=','.join(BACKENDS),
+		help='comma-separated backends to run, the first is the reference'
+	)
+	args = parser.parse_args(argv)
+
+	backends = args.backends.split(',')
+	for backend in backends:
+		if backend not in BACKENDS:
+			parser.error(f'unknown backend: {backend} (one of {BACKENDS})')
+
+	with tempfile.TemporaryDirectory() as directory:
+		synthetic = os.path.join(directory, 'synthetic.h')
+		synthetic_header(synthetic, args.declarations)
+
+		headers = sorted(glob.glob(os.path.join(EXAMPLE_DIR, '*.h')))
+		headers.append(synthetic)
+
+		print(
+			f'{"Header":<40} {"backend":<10} {"seconds":>8} {"decls":>6} '
+			f'{"decls/s":>9}  output'
+		)
+		print('-' * 86)
+
+		for header in headers:
+			reference = None
+
+			for backend in backends:
+				out_file = os.path.join(directory, f'{backend}.reds')
+
+				try:
+					seconds, count = run(header, args.llvm_dir, backend,
+						out_file, args.runs)
+				except Exception as e:
+					print(f'{os.path.basename(header):<40} {backend:<10} '
+						f'failed: {e}')
+					continue
+
+				diff = []
+				if backend == backends[0]:
+					reference = out_file
+					result = ''
+				elif reference == None:
+					result = 'no reference'
+				else:
+					diff = differences(reference, out_file)
+					result = 'same' if len(diff) == 0 else (
+						f'{sum(1 for i in diff if i[:1] in "+-") - 2} '
+						'lines differ'
+					)
+
+				print(
+					f'{os.path.basename(header):<40} {backend:<10} '
+					f'{seconds:>8.3f} {count:>6} {count / seconds:>9,.0f}  '
+					f'{result}'
+				)
+
+				if args.diff and len(diff) > 0:
+					print(''.join(diff))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,202 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Times every grammar in `parse_utils` against the grammars it replaced (see
+`legacy_grammars`) and checks that both produce the same tokens.
+
+	python -m bench.grammars [iterations]
+"""
+
+import sys # Command line arguments
+import time # Timing
+import warnings # Pyparsing warns about camelCase names
+from pyparsing import ParserElement, ParseException
+from bench import legacy_grammars as legacy
+import parse_utils as tuned
+
+
+'''
+Representative inputs for each grammar. Some of them are not valid so that
+both the success and the failure paths are compared.
+'''
+INPUTS = {
+	'Number' : [
+		'12', '-42', '0x1Fu', '0xFFFFFFFF12ull', '1.5f', '.25', '6e+10ul',
+		'-3.0e-5L', '12i64', 'abc'
+	],
+	'PoundDefine' : [
+		'#define CALC_H',
+		'#define VERSION 12',
+		'#define FLAG (0x10)',
+		'#define NAME "calc"',
+		'#define MASK (FLAG | 0x20)',
+		'#define CALL() do_it()',
+		'#define NESTED MAKE(1, 2, 3)',
+		'#define __INT64_TYPE__ long long int'
+	],
+	'Macro' : [
+		'#define MAX(a, b) ((a) > (b) ? (a) : (b))',
+		'#define LOG(fmt, ...) printf(fmt, __VA_ARGS__)',
+		'#define NOT_A_MACRO (1)'
+	],
+	'Prefix' : [
+		'__declspec(dllexport) unsigned long long int __cdecl',
+		'const char',
+		'long double value',
+		'signed short int count',
+		'long unsigned int size'
+	],
+	'FunctionPtr' : [
+		'typedef void (*callback)(int a, char *b);',
+		'typedef void (__stdcall *handler)(unsigned int, const void *);',
+		'typedef void (*no_args)();',
+		'typedef int (*not_void)(int);'
+	],
+	'Types' : [
+		'unsigned long long int',
+		'long unsigned int',
+		'const char',
+		'my_type'
+	],
+	'Typedef' : [
+		'typedef unsigned int uint;',
+		'typedef long long signed int i64;',
+		'typedef struct Point Point;'
+	],
+	'Function' : [
+		'__declspec(dllexport) float __cdecl colonist_add(float x, float y);',
+		'int do_it(int, char *name, ...);',
+		'void nothing(void);',
+		'const char **get_names(unsigned long long int count, void *user);',
+		'long double __stdcall precise(long double a, long long b);'
+	],
+	'GlobalVar' : [
+		'extern int counter;',
+		'extern const char *name;',
+		'extern unsigned long long int big;'
+	],
+	'Decl' : [
+		'int x, y, z;',
+		'char **first_name, last_name;',
+		'unsigned long long int big;',
+		'const struct Point *origin;'
+	],
+	'StructStart' : ['struct Point', 'typedef struct Point'],
+	'StructEnd' : ['};', '} Point, *PPoint;'],
+	'Enum' : [
+		'enum Color { RED = 1, GREEN, BLUE };',
+		"enum Keys { A = 'a', B = 'b', C } Keys;",
+		'enum Flags { NONE = 0x0, ALL = -1 };'
+	]
+}
+
+
+def tokens(grammar, text):
+	"""
+	Parses `text` and returns everything that identifies the result.
+
+	Args:
+		grammar: the parser.
+		text(str): the text to parse.
+
+	Returns:
+		A tuple of (tokens as nested lists, named results) or the location of
+		the error if it didn't parse.
+	"""
+	try:
+		result = grammar.parseString(text)
+	except ParseException as e:
+		return ('error', e.loc)
+
+	return (result.asList(), sorted(result.asDict().items()))
+
+
+def time_grammar(grammar, inputs, iterations):
+	"""
+	Times parsing all of the inputs.
+
+	Args:
+		grammar: the parser.
+		inputs(list): the texts to parse.
+		iterations(int): how many times to parse all of them.
+
+	Returns:
+		The average number of microseconds per parse.
+	"""
+	start = time.perf_counter()
+
+	for _ in range(iterations):
+		for text in inputs:
+			try:
+				grammar.parseString(text)
+			except ParseException:
+				pass
+
+	elapsed = time.perf_counter() - start
+	return elapsed / (iterations * len(inputs)) * 1e6
+
+
+def main(iterations=200):
+	"""
+	Prints a table of the time per parse of each grammar before and after.
+
+	Args:
+		iterations(int): how many times to parse each grammar's inputs.
+
+	Returns:
+		The number of grammars whose tokens differ (0 means all identical).
+	"""
+	warnings.simplefilter('ignore')
+	mismatches = 0
+
+	print(f'{"Grammar":<13} {"legacy us":>10} {"tuned us":>10} '
+		f'{"packrat us":>11} {"speedup":>8}  tokens')
+	print('-' * 70)
+
+	for name, inputs in INPUTS.items():
+		old = getattr(legacy, name)
+		new = getattr(tuned, name)
+
+		# The legacy grammars never had packrat enabled
+		ParserElement.disable_memoization()
+		same = all(tokens(old, i) == tokens(new, i) for i in inputs)
+		before = time_grammar(old, inputs, iterations)
+		plain = time_grammar(new, inputs, iterations)
+
+		tuned.enable_packrat()
+		after = time_grammar(new, inputs, iterations)
+
+		if not same:
+			mismatches += 1
+
+		print(
+			f'{name:<13} {before:>10.1f} {plain:>10.1f} {after:>11.1f} '
+			f'{before / plain:>7.2f}x  {"same" if same else "DIFFERENT"}'
+		)
+
+	return mismatches
+
+
+if __name__ == '__main__':
+	sys.exit(main(*[int(i) for i in sys.argv[1:]]))
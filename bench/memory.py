@@ -0,0 +1,143 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Measures the peak memory of generating the bindings of a large header.
+
+Every compiler and its parse result is kept until the whole header has been
+generated, so the peak resident set size grows with the size of the header.
+A synthetic header (see `bench.backends.synthetic_header`) is generated in a
+fresh interpreter for each backend so that the peaks don't add up.
+
+Another checkout's source folder can be given with `--src` to compare before
+and after a change.
+
+	python -m bench.memory <llvm_dir> [--declarations N] [--src DIR]
+		[--backends a,b]
+"""
+
+import argparse # Command line arguments
+import json # Reading the results of the child interpreter
+import os # Paths
+import subprocess # Starting fresh interpreters
+import sys # The interpreter to run
+import tempfile # Where the output and the synthetic header go
+from bench import SRC_DIR # Where the modules to measure live
+from bench.backends import BACKENDS, synthetic_header # Test input
+
+
+# Runs inside of the child interpreter, whose working directory is the source
+# folder being measured.
+CHILD = '''
+import contextlib, json, os, resource, sys, time
+import batch
+header, llvm_dir, backend, out_file = sys.argv[1:]
+start = time.perf_counter()
+with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+	summary = batch.run_library(header, llvm_dir, out_file=out_file,
+		include_dir=os.path.dirname(header), dump_file=None, backend=backend)
+print(json.dumps({
+	'seconds' : time.perf_counter() - start,
+	'declarations' : sum(summary['kinds'].values()),
+	'peak_kb' : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+}))
+'''
+
+
+def measure(src_dir, header, llvm_dir, backend, out_file):
+	"""
+	Generates the bindings of a header in a fresh interpreter.
+
+	Args:
+		src_dir(str): the source folder of the RGB to run.
+		header(str): the header.
+		llvm_dir(str): the binary directory where LLVM lives.
+		backend(str): the backend to use.
+		out_file(str): where to write the bindings.
+
+	Returns:
+		A dict with the seconds it took, the number of declarations and the
+		peak resident set size in kilobytes.
+	"""
+	output = subprocess.run(
+		[sys.executable, '-c', CHILD, header, llvm_dir, backend, out_file],
+		cwd=src_dir,
+		stdout=subprocess.PIPE,
+		check=True
+	).stdout.decode('UTF-8')
+
+	return json.loads(output.splitlines()[-1])
+
+
+def main(argv=None):
+	"""
+	Runs the measurement from the command line.
+
+	Args:
+		argv(list): the command line arguments (defaults to sys.argv).
+	"""
+	parser = argparse.ArgumentParser(
+		prog='python -m bench.memory',
+		description='Measures the peak memory of a large header.'
+	)
+	parser.add_argument('llvm_dir', help='the folder containing clang')
+	parser.add_argument(
+		'--declarations', type=int, default=12500,
+		help='how many groups of declarations the synthetic header has'
+	)
+	parser.add_argument(
+		'--src', default=SRC_DIR, help='the source folder of the RGB to run'
+	)
+	parser.add_argument(
+		'--backends', default='pyparsing',
+		help='comma-separated backends to run'
+	)
+	args = parser.parse_args(argv)
+
+	backends = args.backends.split(',')
+	for backend in backends:
+		if backend not in BACKENDS:
+			parser.error(f'unknown backend: {backend} (one of {BACKENDS})')
+
+	llvm_dir = os.path.abspath(args.llvm_dir)
+
+	with tempfile.TemporaryDirectory() as directory:
+		header = os.path.join(directory, 'synthetic.h')
+		synthetic_header(header, args.declarations)
+
+		print(f'{"backend":<10} {"seconds":>8} {"decls":>7} {"peak MB":>8}')
+		print('-' * 36)
+
+		for backend in backends:
+			result = measure(os.path.abspath(args.src), header, llvm_dir,
+				backend, os.path.join(directory, f'{backend}.reds'))
+
+			print(
+				f'{backend:<10} {result["seconds"]:>8.2f} '
+				f'{result["declarations"]:>7} '
+				f'{result["peak_kb"] / 1024:>8.1f}'
+			)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,187 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Checks how splitting and generating functions with hundreds of parameters
+scales.
+
+A function declaration with N parameters is parsed once with the Function
+grammar, for N = 200 up to 1600 by default. Then the time it takes to turn the
+tokens into an `ir.Function` and generate it is measured two ways:
+
+	spans:   what the compilers do, a `TokenSpan` over the shared tokens for
+	         each parameter.
+	copying: the way it used to be done, where the tokens are split by
+	         copying the rest of the list after every comma, every
+	         parameter is a tuple of its own and each one is copied again
+	         before it is generated.
+
+The time per parameter of the spans column should stay flat as N grows.
+
+	python -m bench.params [--params N] [--runs N]
+"""
+
+import argparse # Command line arguments
+import io # Throw away generated code
+import time # Timing
+import bench # Makes the source folder importable
+import ir
+import parse_utils
+from red_utils import argument, get_return_type
+
+
+# The kinds of parameters the function is made of
+PARAMS = (
+	'int a_{0}',
+	'char *name_{0}',
+	'const float *values_{0}',
+	'unsigned long long big_{0}',
+	'void **data_{0}',
+	'double'
+)
+
+
+def synthetic_function(params):
+	"""
+	Writes a function declaration with `params` parameters.
+
+	Args:
+		params(int): how many parameters to declare.
+
+	Returns:
+		The C code as a string.
+	"""
+	args = ', '.join(PARAMS[i % len(PARAMS)].format(i) for i in range(params))
+	return f'extern int *big_function({args});\n'
+
+
+def copying(tokens, file):
+	"""
+	Splits and generates a function the way it was done before `TokenSpan`.
+
+	Args:
+		tokens(ParseResults): what the Function grammar returned.
+		file(file): where to write the Red/System code.
+	"""
+	signature = ir.names(tokens[0])
+	rest = list(tokens[1])
+	params = []
+
+	while ',' in rest:
+		index = rest.index(',')
+		params.append(ir.names(rest[:index]))
+		rest = rest[index + 1:]
+
+	params.append(ir.names(rest))
+
+	lines = [f'{signature[-1]}: "{signature[-1]}"\n[']
+	for param in params:
+		lines.append('\n\t%s' % argument(list(param)))
+
+	returns = list(signature[:-1])
+	lines.append('\n\treturn: %s\n]\n' % get_return_type(returns))
+	file.write(''.join(lines))
+
+
+def spans(tokens, file):
+	"""
+	Splits and generates a function the way the compilers do.
+
+	Args:
+		tokens(ParseResults): what the Function grammar returned.
+		file(file): where to write the Red/System code.
+	"""
+	result = ir.Function.from_tokens(tokens)
+
+	lines = [f'{result.name}: "{result.name}"\n[']
+	for param in result.params:
+		lines.append('\n\t%s' % argument(param))
+
+	lines.append('\n\treturn: %s\n]\n' % get_return_type(result.returns))
+	file.write(''.join(lines))
+
+
+def measure(operation, tokens, runs):
+	"""
+	Times an operation on the tokens of a function.
+
+	Args:
+		operation(function): `copying` or `spans`.
+		tokens(ParseResults): what the Function grammar returned.
+		runs(int): how many times to do it.
+
+	Returns:
+		The best time in seconds.
+	"""
+	best = None
+
+	for _ in range(runs):
+		start = time.perf_counter()
+		operation(tokens, io.StringIO())
+		seconds = time.perf_counter() - start
+
+		best = seconds if best == None else min(best, seconds)
+
+	return best
+
+
+def main(argv=None):
+	"""
+	Runs the benchmark from the command line.
+
+	Args:
+		argv(list): the command line arguments (defaults to sys.argv).
+	"""
+	parser = argparse.ArgumentParser(
+		prog='python -m bench.params',
+		description='Measures how functions with many parameters scale.'
+	)
+	parser.add_argument(
+		'--params', type=int, default=1600,
+		help='how many parameters the largest function has'
+	)
+	parser.add_argument(
+		'--runs', type=int, default=20, help='how many times to run each'
+	)
+	args = parser.parse_args(argv)
+
+	sizes = [args.params // 8, args.params // 4, args.params // 2, args.params]
+
+	print(
+		f'{"params":>7} {"spans ms":>9} {"us/param":>9} '
+		f'{"copying ms":>11} {"us/param":>9}'
+	)
+	print('-' * 49)
+
+	for size in sizes:
+		tokens = parse_utils.Function.parse_string(synthetic_function(size))
+		fast = measure(spans, tokens, args.runs)
+		slow = measure(copying, tokens, args.runs)
+
+		print(
+			f'{size:>7} {fast * 1e3:>9.3f} {fast / size * 1e6:>9.2f} '
+			f'{slow * 1e3:>11.3f} {slow / size * 1e6:>9.2f}'
+		)
+
+
+if __name__ == '__main__':
+	main()
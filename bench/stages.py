@@ -0,0 +1,378 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Times every stage of RGB separately so that a grammar edit or a Pyparsing
+upgrade that makes it slower shows up, even when the full run hides it.
+
+Each benchmark is a single operation on representative input: parsing one
+declaration with a grammar, one `parse()`/`generate()` pair of a compiler,
+classifying one line with `RGB.__classify_line` or calling one of the
+`red_utils` helpers. For each one this reports:
+
+	ops/s:  operations per second.
+	peak:   most bytes allocated at once during a single operation.
+	blocks: memory blocks an operation leaves allocated (caches, leaks).
+
+	python -m bench.stages [-k FILTER] [--save FILE] [--compare FILE]
+
+Saving the results of two runs (e.g. before and after upgrading Pyparsing)
+and comparing them prints how much each benchmark changed.
+"""
+
+import argparse # Command line arguments
+import contextlib # Silencing warnings printed by the compilers
+import gc # Collecting garbage before measuring memory
+import io # Throw away generated code
+import json # Saving and comparing results
+import os # Null device
+import platform # Python version in the results
+import sys # Exit status
+import time # Timing
+import tracemalloc # Counting allocations
+import warnings # Pyparsing warns about camelCase names
+import pyparsing
+import bench # Makes the source folder importable
+import parse_utils
+import red_utils
+from rgb import RGB
+from compilers.pound_define import PoundDefineCompiler
+from compilers.macro import MacroCompiler
+from compilers.func_ptr import FuncPtrCompiler
+from compilers.typedef import TypedefCompiler
+from compilers.function import FunctionCompiler
+from compilers.global_var import GlobalVarCompiler
+from compilers.struct import StructCompiler
+from compilers.enum import EnumCompiler
+
+
+# How long to run each benchmark for (in seconds) unless told otherwise
+DEFAULT_SECONDS = 0.5
+
+# Changes smaller than this fraction are treated as noise when comparing
+NOISE = 0.1
+
+
+'''
+One representative line for every grammar and compiler. These are lines as
+they come out of Clang-Format.
+'''
+FUNCTION = (
+	'__declspec(dllexport) const char **__cdecl get_names('
+	'unsigned long long int count, void *user, float scale, ...);'
+)
+FUNC_PTR = 'typedef void (*callback)(int a, char *b, unsigned int flags);'
+POUND_DEFINE = '#define BIG_MASK 0xFFFFFFFF12ull'
+MACRO = '#define MAX(a, b) ((a) > (b) ? (a) : (b))'
+ENUM = 'enum Color { RED = 1, GREEN = 0x2, BLUE = -3, ALPHA };'
+TYPEDEF = 'typedef unsigned long long int u64;'
+GLOBAL_VAR = 'extern const char *program_name;'
+DECL = 'unsigned long int *first, second, third;'
+STRUCT = '\n'.join([
+	'struct Shape',
+	'{',
+	'int kind;',
+	'float x, y;',
+	'char **names;',
+	'struct Point *origin;',
+	'struct Color',
+	'{',
+	'unsigned char r, g, b;',
+	'} color;',
+	'};'
+])
+
+ARGUMENT = ['int', '*', 'count']
+RETURN_TYPE = ['char', '*', '*']
+SPLIT = ['int', 'age', ',', 'int', '*', 'numbers', ',', 'char', 'initial']
+
+
+def grammar(parser, line):
+	"""
+	Makes a benchmark that parses `line` with one of the grammars.
+	"""
+	return lambda: parser.parseString(line)
+
+
+def compiler(kind, line):
+	"""
+	Makes a benchmark that parses `line` with a compiler and generates it.
+	"""
+	def run():
+		instance = kind(line)
+		instance.parse()
+		instance.generate(io.StringIO())
+	return run
+
+
+def classifier(line):
+	"""
+	Makes a benchmark that figures out which compiler to use for `line`.
+	"""
+	rgb = RGB([], 'bench.dll', 'cdecl')
+	return lambda: rgb._RGB__classify_line(line)
+
+
+'''
+Every benchmark by name, in the order they are run and reported. Names are
+grouped by stage so that `-k` can select a whole stage.
+'''
+BENCHMARKS = {
+	'grammar.Function' : grammar(parse_utils.Function, FUNCTION),
+	'grammar.FunctionPtr' : grammar(parse_utils.FunctionPtr, FUNC_PTR),
+	'grammar.PoundDefine' : grammar(parse_utils.PoundDefine, POUND_DEFINE),
+	'grammar.Macro' : grammar(parse_utils.Macro, MACRO),
+	'grammar.Enum' : grammar(parse_utils.Enum, ENUM),
+	'grammar.Typedef' : grammar(parse_utils.Typedef, TYPEDEF),
+	'grammar.GlobalVar' : grammar(parse_utils.GlobalVar, GLOBAL_VAR),
+	'grammar.Decl' : grammar(parse_utils.Decl, DECL),
+
+	'compiler.Function' : compiler(FunctionCompiler, FUNCTION),
+	'compiler.FuncPtr' : compiler(FuncPtrCompiler, FUNC_PTR),
+	'compiler.PoundDefine' : compiler(PoundDefineCompiler, POUND_DEFINE),
+	'compiler.Macro' : compiler(MacroCompiler, MACRO),
+	'compiler.Enum' : compiler(EnumCompiler, ENUM),
+	'compiler.Typedef' : compiler(TypedefCompiler, TYPEDEF),
+	'compiler.GlobalVar' : compiler(GlobalVarCompiler, GLOBAL_VAR),
+	'compiler.Struct' : compiler(StructCompiler, STRUCT),
+
+	'classify.Function' : classifier(FUNCTION),
+	'classify.FuncPtr' : classifier(FUNC_PTR),
+	'classify.Typedef' : classifier(TYPEDEF),
+	'classify.Macro' : classifier(MACRO),
+
+	'red_utils.fix_hex_num' : lambda: red_utils.fix_hex_num('0xFFFFFFFF12'),
+	'red_utils.split_list' : lambda: red_utils.split_list(SPLIT, ','),
+	'red_utils.TokenSpan.split' : lambda: red_utils.TokenSpan(SPLIT).split(','),
+	'red_utils.mangle_type' : lambda: red_utils.mangle_type('__int64'),
+	'red_utils.argument' : lambda: red_utils.argument(ARGUMENT),
+	'red_utils.get_return_type' : lambda: red_utils.get_return_type(
+		RETURN_TYPE
+	)
+}
+
+
+def time_ops(operation, seconds, rounds=5):
+	"""
+	Runs `operation` over and over for about `seconds`.
+
+	The time is split into rounds and the fastest round is kept, since
+	anything else running on the machine can only ever make a round slower.
+
+	Args:
+		operation(callable): the benchmark.
+		seconds(float): how long to run it for.
+		rounds(int): how many rounds to split the time into.
+
+	Returns:
+		The number of operations per second.
+	"""
+	# Warm up and find out how many calls fit in a timer check
+	start = time.perf_counter()
+	operation()
+	batch = max(1, int(0.01 / max(time.perf_counter() - start, 1e-9)))
+	best = 0
+
+	for _ in range(rounds):
+		count = 0
+		start = time.perf_counter()
+		deadline = start + seconds / rounds
+
+		while True:
+			for _ in range(batch):
+				operation()
+			count += batch
+
+			now = time.perf_counter()
+			if now >= deadline:
+				break
+
+		best = max(best, count / (now - start))
+
+	return best
+
+
+def count_allocations(operation, repeat=20):
+	"""
+	Measures the memory one call to `operation` allocates.
+
+	Tracemalloc cannot count blocks that are freed again before it is asked,
+	so the peak is used for the temporary allocations and the number of
+	blocks still allocated afterwards for what the call keeps around.
+
+	Args:
+		operation(callable): the benchmark.
+		repeat(int): how many calls to measure.
+
+	Returns:
+		A tuple of (peak bytes of a single call, blocks left per call).
+	"""
+	peak = 0
+
+	gc.collect()
+	tracemalloc.start()
+	try:
+		blocks = len(tracemalloc.take_snapshot().traces)
+
+		for _ in range(repeat):
+			tracemalloc.reset_peak()
+			before = tracemalloc.get_traced_memory()[0]
+			operation()
+			peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+
+		gc.collect()
+		blocks = len(tracemalloc.take_snapshot().traces) - blocks
+	finally:
+		tracemalloc.stop()
+
+	return peak, max(0, blocks) / repeat
+
+
+def run(names, seconds):
+	"""
+	Runs the benchmarks.
+
+	Args:
+		names(list): names of the benchmarks to run.
+		seconds(float): how long to time each one for.
+
+	Returns:
+		The results as a dict that can be saved as JSON.
+	"""
+	results = {}
+
+	# Some compilers print warnings about the C code they could not convert
+	with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+		for name in names:
+			operation = BENCHMARKS[name]
+			peak, blocks = count_allocations(operation)
+			results[name] = {
+				'ops_per_sec' : time_ops(operation, seconds),
+				'peak_bytes' : peak,
+				'blocks' : blocks
+			}
+
+	return {
+		'python' : platform.python_version(),
+		'pyparsing' : pyparsing.__version__,
+		'time' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'results' : results
+	}
+
+
+def print_results(run_results, baseline=None):
+	"""
+	Prints a table of the results, next to the baseline if one is given.
+
+	Args:
+		run_results(dict): what `run` returned.
+		baseline(dict): what `run` returned for an earlier run.
+
+	Returns:
+		The number of benchmarks that got slower by more than the noise.
+	"""
+	slower = 0
+	header = f'{"Benchmark":<28} {"ops/s":>12} {"peak":>9} {"blocks":>7}'
+
+	if baseline != None:
+		header += f' {"before":>12} {"change":>8}'
+		print(
+			f'Comparing with Python {baseline["python"]}, Pyparsing '
+			f'{baseline["pyparsing"]} ({baseline["time"]})\n'
+		)
+
+	print(header)
+	print('-' * len(header))
+
+	for name, result in run_results['results'].items():
+		row = (
+			f'{name:<28} {result["ops_per_sec"]:>12,.0f} '
+			f'{result["peak_bytes"]:>9,} {result["blocks"]:>7.1f}'
+		)
+
+		before = None
+		if baseline != None:
+			before = baseline['results'].get(name)
+
+		if before != None:
+			change = result['ops_per_sec'] / before['ops_per_sec'] - 1
+			row += f' {before["ops_per_sec"]:>12,.0f} {change:>+8.1%}'
+
+			if change < -NOISE:
+				slower += 1
+				row += '  slower'
+
+		print(row)
+
+	return slower
+
+
+def main(argv=None):
+	"""
+	Runs the benchmarks from the command line.
+
+	Args:
+		argv(list): the command line arguments (defaults to sys.argv).
+
+	Returns:
+		The exit status: 1 if compared with a baseline and something got
+		slower, 0 otherwise.
+	"""
+	parser = argparse.ArgumentParser(
+		prog='python -m bench.stages',
+		description='Times each stage of RGB separately.'
+	)
+	parser.add_argument(
+		'-k', dest='filter', default='',
+		help='only run benchmarks whose name contains this'
+	)
+	parser.add_argument(
+		'--seconds', type=float, default=DEFAULT_SECONDS,
+		help='how long to time each benchmark for'
+	)
+	parser.add_argument('--save', help='write the results to this JSON file')
+	parser.add_argument(
+		'--compare', help='compare against results saved by an earlier run'
+	)
+	args = parser.parse_args(argv)
+
+	warnings.simplefilter('ignore')
+	names = [i for i in BENCHMARKS if args.filter in i]
+	baseline = None
+
+	if args.compare != None:
+		with open(args.compare) as file:
+			baseline = json.load(file)
+
+	results = run(names, args.seconds)
+	slower = print_results(results, baseline)
+
+	if args.save != None:
+		with open(args.save, 'w') as file:
+			json.dump(results, file, indent=4)
+
+	return 1 if slower > 0 else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
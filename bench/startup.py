@@ -0,0 +1,184 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Measures how long it takes before RGB can start doing any work.
+
+A build that runs RGB once per header pays for starting Python and importing
+RGB every single time, so this has to stay small. Two things are measured:
+
+	import: time spent importing `main` (and everything it imports) as
+	        reported by `python -X importtime`.
+	wall:   wall time of `python -c "import main"` minus the time of an
+	        empty `python -c "pass"`.
+
+Both are the best of several runs. The modules that took the longest to
+import are listed so that a new heavy import is easy to spot.
+
+	python -m bench.startup [--runs N] [--save FILE] [--compare FILE]
+"""
+
+import argparse # Command line arguments
+import json # Saving and comparing results
+import subprocess # Starting fresh interpreters
+import sys # The interpreter to run
+import time # Timing
+from bench import SRC_DIR # Where main.py lives
+
+
+def import_times(module):
+	"""
+	Imports `module` in a fresh interpreter with `-X importtime`.
+
+	Args:
+		module(str): the module to import.
+
+	Returns:
+		A tuple of (total microseconds, {module : self microseconds}).
+	"""
+	output = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+		cwd=SRC_DIR,
+		stderr=subprocess.PIPE,
+		stdout=subprocess.DEVNULL,
+		check=True
+	).stderr.decode('UTF-8')
+
+	total = 0
+	modules = {}
+
+	for line in output.splitlines():
+		if not line.startswith('import time:') or 'self [us]' in line:
+			continue
+
+		own, cumulative, name = line[len('import time:'):].split('|')
+		modules[name.strip()] = int(own)
+
+		if name.strip() == module:
+			total = int(cumulative)
+
+	return total, modules
+
+
+def wall_time(code):
+	"""
+	Runs `code` in a fresh interpreter.
+
+	Returns:
+		The wall time in seconds.
+	"""
+	start = time.perf_counter()
+	subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, check=True)
+	return time.perf_counter() - start
+
+
+def run(runs):
+	"""
+	Measures the startup time.
+
+	Args:
+		runs(int): how many times to measure (the best run is kept).
+
+	Returns:
+		The results as a dict that can be saved as JSON.
+	"""
+	best_import = None
+	slowest = {}
+
+	for _ in range(runs):
+		total, modules = import_times('main')
+		if best_import == None or total < best_import:
+			best_import = total
+			slowest = modules
+
+	empty = min(wall_time('pass') for _ in range(runs))
+	startup = min(wall_time('import main') for _ in range(runs))
+
+	return {
+		'python' : sys.version.split()[0],
+		'time' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'import_ms' : best_import / 1000,
+		'wall_ms' : max(0, startup - empty) * 1000,
+		'slowest' : sorted(slowest.items(), key=lambda i: -i[1])[:10]
+	}
+
+
+def print_results(results, baseline=None):
+	"""
+	Prints the startup times, next to the baseline if one is given.
+
+	Args:
+		results(dict): what `run` returned.
+		baseline(dict): what `run` returned for an earlier run.
+	"""
+	for name in ('import_ms', 'wall_ms'):
+		row = f'{name:<10} {results[name]:>8.1f} ms'
+
+		if baseline != None:
+			before = baseline[name]
+			row += f'   before {before:>8.1f} ms'
+			if before > 0:
+				row += f'   {results[name] / before - 1:>+7.1%}'
+
+		print(row)
+
+	print('\nSlowest imports (self time):')
+	for name, micros in results['slowest']:
+		print(f'{micros / 1000:>8.1f} ms  {name}')
+
+
+def main(argv=None):
+	"""
+	Measures the startup time from the command line.
+
+	Args:
+		argv(list): the command line arguments (defaults to sys.argv).
+	"""
+	parser = argparse.ArgumentParser(
+		prog='python -m bench.startup',
+		description='Measures how long importing RGB takes.'
+	)
+	parser.add_argument(
+		'--runs', type=int, default=10, help='how many times to measure'
+	)
+	parser.add_argument('--save', help='write the results to this JSON file')
+	parser.add_argument(
+		'--compare', help='compare against results saved by an earlier run'
+	)
+	args = parser.parse_args(argv)
+
+	baseline = None
+	if args.compare != None:
+		with open(args.compare) as file:
+			baseline = json.load(file)
+
+	results = run(args.runs)
+	print_results(results, baseline)
+
+	if args.save != None:
+		with open(args.save, 'w') as file:
+			json.dump(results, file, indent=4)
+
+
+if __name__ == '__main__':
+	main()
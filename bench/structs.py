@@ -0,0 +1,160 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Checks that parsing and generating a struct scales linearly with its size.
+
+A struct with N fields spread over 8 levels of nested structs is generated
+(laid out the way clang-format writes it) for N = 1250 up to 10000 by
+default. For each size this reports the best time of a `parse()` and
+`generate()` pair and the time per field, which should stay flat as N grows.
+
+	python -m bench.structs [--fields N] [--levels N] [--runs N]
+"""
+
+import argparse # Command line arguments
+import io # Throw away generated code
+import time # Timing
+import bench # Makes the source folder importable
+from compilers.struct import StructCompiler
+
+
+# The kinds of declarations the struct is made of, with how many fields each
+# one declares
+DECLARATIONS = (
+	('int a_{0}, b_{0};', 2),
+	('char *name_{0};', 1),
+	('float value_{0};', 1),
+	('unsigned long long big_{0};', 1),
+	('const char **argv_{0};', 1),
+	('struct Other *other_{0};', 1)
+)
+
+
+def synthetic_struct(fields, levels):
+	"""
+	Writes a struct with about `fields` fields, split evenly between `levels`
+	levels of nested structs.
+
+	Args:
+		fields(int): how many fields to declare.
+		levels(int): how many levels of structs there are.
+
+	Returns:
+		A tuple of (the C code, how many fields it actually has).
+	"""
+	lines = []
+	per_level = fields // levels
+	count = 0
+
+	for level in range(levels):
+		tab = '    ' * level
+		lines.append(f'{tab}struct Level{level}')
+		lines.append(f'{tab}{{')
+
+		level_count = 0
+		while level_count < per_level:
+			text, declared = DECLARATIONS[count % len(DECLARATIONS)]
+			lines.append(f'{tab}    {text.format(count)}')
+			level_count += declared
+			count += declared
+
+	for level in reversed(range(levels)):
+		tab = '    ' * level
+		lines.append(f'{tab}}}' + (f' level{level};' if level > 0 else ';'))
+
+	return '\n'.join(lines) + '\n', count
+
+
+def measure(text, runs):
+	"""
+	Parses and generates a struct.
+
+	Args:
+		text(str): the C code of the struct.
+		runs(int): how many times to do it.
+
+	Returns:
+		The best time in seconds.
+	"""
+	best = None
+
+	for _ in range(runs):
+		compiler = StructCompiler(text)
+
+		start = time.perf_counter()
+		compiler.parse()
+		compiler.generate(io.StringIO())
+		seconds = time.perf_counter() - start
+
+		best = seconds if best == None else min(best, seconds)
+
+	return best
+
+
+def main(argv=None):
+	"""
+	Runs the benchmark from the command line.
+
+	Args:
+		argv(list): the command line arguments (defaults to sys.argv).
+	"""
+	parser = argparse.ArgumentParser(
+		prog='python -m bench.structs',
+		description='Measures how struct parsing scales.'
+	)
+	parser.add_argument(
+		'--fields', type=int, default=10000,
+		help='how many fields the largest struct has'
+	)
+	parser.add_argument(
+		'--levels', type=int, default=8, help='how deeply structs are nested'
+	)
+	parser.add_argument(
+		'--runs', type=int, default=3, help='how many times to run each'
+	)
+	args = parser.parse_args(argv)
+
+	sizes = [args.fields // 8, args.fields // 4, args.fields // 2, args.fields]
+
+	print(f'{"fields":>7} {"seconds":>9} {"us/field":>9} {"vs smallest":>12}')
+	print('-' * 40)
+
+	smallest = None
+
+	for size in sizes:
+		text, count = synthetic_struct(size, args.levels)
+		seconds = measure(text, args.runs)
+		per_field = seconds / count * 1e6
+
+		if smallest == None:
+			smallest = per_field
+
+		print(
+			f'{count:>7} {seconds:>9.4f} {per_field:>9.2f} '
+			f'{per_field / smallest:>11.2f}x'
+		)
+
+
+if __name__ == '__main__':
+	main()
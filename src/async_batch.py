@@ -0,0 +1,342 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+The pipeline of `batch` for asyncio programs.
+
+`format.preprocess` waits for clang with `subprocess`, which blocks whatever
+event loop it is called from, so build tools written with asyncio had to run
+RGB in threads. Here every tool is started with
+`asyncio.create_subprocess_exec` instead, and the stages that don't depend on
+each other run at the same time: the `-dM` pass for the pound defines no
+longer waits for clang and clang-format to finish.
+
+	summaries = await async_batch.compile_many(jobs, llvm_dir, concurrency=8)
+
+Parsing and generating are plain Python and are run on a thread so the event
+loop stays responsive. The number of tool processes running at once across
+every library is limited by a shared `ProcessLimit`.
+"""
+
+import os # Running clang-format on clang's output
+import asyncio # Running the tools without blocking
+import contextlib # Holding process slots
+import subprocess # Errors of the tools
+import tempfile # Where clang writes the list of included files
+import time # Timing each library
+import format # Reading the output of the tools
+import batch # The rest of the pipeline
+import stamp # Skipping libraries that are up to date
+from symbols import symbol_filter # Picking the declarations to generate
+
+
+class ProcessLimit:
+	"""
+	Limits how many tool processes run at the same time.
+
+	Unlike a semaphore, a stage takes every slot it needs at once: clang
+	piped into clang-format takes two. A stage never holds some slots while
+	waiting for the rest, so stages can't keep each other waiting forever.
+
+	Attributes:
+		count(int): how many processes may run at once, None for no limit.
+		running(int): how many are running right now.
+		peak(int): the most that were ever running at once.
+	"""
+	def __init__(self, count=None):
+		"""
+		Constructor.
+
+		Args:
+			count(int): how many processes may run at once, None for no
+				limit.
+		"""
+		if count != None and count < 1:
+			raise Exception('At least one process has to be able to run')
+
+		self.count = count
+		self.running = 0
+		self.peak = 0
+		self.__condition = None
+
+	@contextlib.asynccontextmanager
+	async def hold(self, processes):
+		"""
+		Waits until `processes` more processes may run, and keeps their slots
+		until the block ends.
+
+		Args:
+			processes(int): how many processes the stage runs. A stage that
+				needs more than `count` runs on its own.
+		"""
+		# Created here so it belongs to the running event loop
+		if self.__condition == None:
+			self.__condition = asyncio.Condition()
+
+		if self.count != None:
+			processes = min(processes, self.count)
+
+		async with self.__condition:
+			await self.__condition.wait_for(
+				lambda: self.count == None or
+					self.running + processes <= self.count
+			)
+			self.running += processes
+			self.peak = max(self.peak, self.running)
+
+		try:
+			yield
+		finally:
+			async with self.__condition:
+				self.running -= processes
+				self.__condition.notify_all()
+
+
+async def declarations_pass(header, llvm_dir, includes, dep_file,
+	single_pass, limit):
+	"""
+	Runs clang piped into clang-format and splits their output.
+
+	Args:
+		header(str): the header to preprocess.
+		llvm_dir(str): the binary directory where LLVM lives, ending with a
+			slash.
+		includes(str): the path of the folder containing relevant headers.
+		dep_file(str): where clang writes the files it read.
+		single_pass(bool): keep the pound defines in the output.
+		limit(ProcessLimit): shared by every stage.
+
+	Returns:
+		A tuple of (defines, declarations) as `format.split_output` returns.
+	"""
+	cmd_line = [
+		f'{llvm_dir}clang', '-I', includes, '-E', header,
+		'-MD', '-MF', dep_file
+	]
+
+	# Keep the pound defines in the output
+	if single_pass:
+		cmd_line.append('-dD')
+
+	async with limit.hold(2):
+		read_end, write_end = os.pipe()
+
+		try:
+			clang = await asyncio.create_subprocess_exec(*cmd_line,
+				stdout=write_end)
+			clang_format = await asyncio.create_subprocess_exec(
+				f'{llvm_dir}clang-format', '-style=file', stdin=read_end,
+				stdout=asyncio.subprocess.PIPE)
+		finally:
+			# Only the tools use the pipe
+			os.close(read_end)
+			os.close(write_end)
+
+		lines = [line.decode('UTF-8') async for line in clang_format.stdout]
+		await clang_format.wait()
+
+		if await clang.wait() != 0:
+			raise subprocess.CalledProcessError(clang.returncode, cmd_line)
+
+	return format.split_output(lines, header)
+
+
+async def pound_defines(header, llvm_dir, limit):
+	"""
+	Same as `format.pound_defines`, without blocking.
+
+	Args:
+		header(str): the header to preprocess.
+		llvm_dir(str): the binary directory where LLVM lives, ending with a
+			slash.
+		limit(ProcessLimit): shared by every stage.
+
+	Returns:
+		A list of pound defines, each ending with a newline.
+	"""
+	cmd_line = [f'{llvm_dir}clang', '-dM', '-E', header]
+
+	async with limit.hold(1):
+		clang = await asyncio.create_subprocess_exec(*cmd_line,
+			stdout=asyncio.subprocess.PIPE)
+		output, _ = await clang.communicate()
+
+	if clang.returncode != 0:
+		raise subprocess.CalledProcessError(clang.returncode, cmd_line)
+
+	return [i + '\n' for i in output.decode('UTF-8').split('\n')]
+
+
+async def preprocess(header, llvm_dir, includes, dump_file=None, cache=None,
+	single_pass=False, limit=None):
+	"""
+	Same as `format.preprocess`, without blocking the event loop.
+
+	Without `single_pass`, the `-dM` pass runs at the same time as clang and
+	clang-format instead of after them.
+
+	Args:
+		header (str): The header file to format.
+		llvm_dir (str): the binary directory where LLVM lives.
+		includes (str): The path of the folder containing relevant headers.
+		dump_file (str): Where to write the combined output, or None.
+		cache (PreprocessCache): cache of previous runs, or None.
+		single_pass (bool): get the pound defines from the same clang run.
+		limit (ProcessLimit): limits the processes of every library being
+			preprocessed at the same time, or None for no limit.
+
+	Returns:
+		A tuple of (declarations, dependencies), see `format.preprocess`.
+	"""
+	if llvm_dir[-1] not in '/\\':
+		llvm_dir += '/'
+
+	if limit == None:
+		limit = ProcessLimit()
+
+	# Both modes produce different output so they are cached separately
+	variant = 'single_pass' if single_pass else ''
+
+	# Nothing changed since the last run, no need to run clang at all
+	if cache != None:
+		hit = cache.lookup(header, llvm_dir, includes, variant)
+		if hit != None:
+			defines, deps = hit
+			format.write_dump(dump_file, defines)
+			return defines, deps
+
+	# Clang writes the names of all the files it read to this file
+	dep_handle, dep_file = tempfile.mkstemp(suffix='.d')
+	os.close(dep_handle)
+
+	try:
+		if single_pass:
+			defines, declarations = await declarations_pass(header, llvm_dir,
+				includes, dep_file, True, limit)
+		else:
+			(_, declarations), defines = await asyncio.gather(
+				declarations_pass(header, llvm_dir, includes, dep_file, False,
+					limit),
+				pound_defines(header, llvm_dir, limit)
+			)
+
+		with open(dep_file) as file:
+			deps = format.read_depfile(file.read())
+	finally:
+		os.remove(dep_file)
+
+	# Combine all the info into one large list
+	defines.extend(declarations)
+	format.write_dump(dump_file, defines)
+
+	if cache != None:
+		cache.store(header, llvm_dir, includes, deps, defines, variant)
+
+	return defines, deps
+
+
+async def run_library(header, llvm_dir, dynlib=None, out_file=None,
+	call_con='cdecl', include_dir='.', dump_file=None, jobs=1, cache=None,
+	memo=None, depfile=None, skip_if_up_to_date=False, single_pass=False,
+	limit=None, include_symbols=None, exclude_symbols=None,
+	reachable_from=None):
+	"""
+	Same as `batch.run_library` (with the default backend and without
+	streaming), without blocking the event loop.
+
+	Args:
+		header(str): the header to parse.
+		llvm_dir(str): the binary directory where LLVM lives
+		dynlib(str): the dynamic library target, used in the outfile
+		out_file(str): the path/name.ext of the output file
+		call_con(str): the calling convention of the library
+		include_dir(str): where other include files are, same as C
+		dump_file(str): where to write the combined output, or None.
+		jobs(int): how many processes to parse the declarations with.
+		cache(PreprocessCache): cache for the formatter's output, or None.
+		memo(ParseMemo): parse results of previous runs, or None.
+		depfile(str): where to write a Makefile-style dependency file, or
+			None.
+		skip_if_up_to_date(bool): don't do anything if the inputs and
+			options are the same as the last time (see `stamp`).
+		single_pass(bool): get the pound defines from the same clang run as
+			the declarations.
+		limit(ProcessLimit): limits the tool processes, or None.
+		include_symbols: only generate the declarations whose name matches
+			these patterns (see `batch.run_library`).
+		exclude_symbols: never generate the declarations whose name matches
+			these patterns.
+		reachable_from: generate the declarations whose name matches these
+			patterns along with every declaration they depend on.
+
+	Returns:
+		The summary of the run (see `batch.run_library`).
+	"""
+	start = time.perf_counter()
+
+	dynlib, out_file = batch.output_names(header, dynlib, out_file)
+	symbols = symbol_filter(include_symbols, exclude_symbols, reachable_from)
+	options = batch.stamp_options(header, llvm_dir, dynlib, call_con,
+		include_dir, single_pass, 'pyparsing', symbols)
+
+	if skip_if_up_to_date and stamp.is_up_to_date(out_file, options):
+		return batch.skipped_summary(header, out_file, start)
+
+	declarations, deps = await preprocess(header, llvm_dir, include_dir,
+		dump_file, cache, single_pass, limit)
+
+	return await asyncio.to_thread(batch.compile_library, header,
+		declarations, deps, dynlib, out_file, call_con, options, start, jobs,
+		memo, depfile, skip_if_up_to_date, symbols=symbols)
+
+
+async def compile_many(jobs, llvm_dir, concurrency=4, **options):
+	"""
+	Generates the bindings of every job at the same time, with at most
+	`concurrency` tool processes running at once.
+
+	A library that fails does not stop the rest, its error is put in its
+	summary just like `batch.run_batch` does.
+
+	Args:
+		jobs(list): dicts as returned by `batch.load_manifest`.
+		llvm_dir(str): the binary directory where LLVM lives
+		concurrency(int): how many clang and clang-format processes may run
+			at the same time, None for no limit.
+		options: passed on to `run_library` for every job (cache, memo,
+			skip_if_up_to_date, ...).
+
+	Returns:
+		A list of summaries (see `batch.run_library`) in the same order as
+		`jobs`.
+	"""
+	limit = ProcessLimit(concurrency)
+
+	async def run(job):
+		try:
+			return await run_library(llvm_dir=llvm_dir, limit=limit, **job,
+				**options)
+		except Exception as e:
+			return batch.failed_summary(job, e)
+
+	return list(await asyncio.gather(*[run(job) for job in jobs]))
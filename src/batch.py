@@ -0,0 +1,513 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Runs many headers through RGB in a single process.
+
+Generating bindings for a whole SDK one `gen` call at a time means paying for
+the Python imports and every grammar in `parse_utils` over and over again. A
+batch keeps everything warm and only pays for it once.
+"""
+
+import os # Basename
+import json # Reading the manifest
+import time # Timing each library
+import format # Launching the formatter
+from rgb import RGB # RGB compiler class
+from cache import PreprocessCache, hash_style, hash_strings # Skipping work
+import rgb_config # The builtin types, which change what is generated
+import stamp # Skipping libraries that are up to date
+from symbols import symbol_filter # Picking the declarations to generate
+
+
+# The ways of parsing a header (see `run_library`)
+BACKENDS = ('pyparsing', 'pycparser', 'clang')
+
+# Manifest entries can pick the declarations of their library (see `symbols`)
+SYMBOL_OPTIONS = ('include_symbols', 'exclude_symbols', 'reachable_from')
+
+# Bump this whenever RGB generates something else from the same header, so
+# that the stamps of older versions are not trusted (see `stamp_options`)
+GENERATOR_VERSION = 1
+
+
+def load_manifest(manifest):
+	"""
+	Reads the list of libraries to generate bindings for.
+
+	The manifest is a JSON file containing a list of objects. Only the header
+	is required, everything else falls back to the same defaults as `gen`:
+
+	[
+		{
+			"header": "calc.h",
+			"dynlib": "calc.dll",
+			"call_con": "cdecl",
+			"out_file": "calc.reds",
+			"include_dir": ".",
+			"depfile": "calc.reds.d",
+			"reachable_from": ["calc_*"]
+		}
+	]
+
+	Any of `SYMBOL_OPTIONS` can be given to generate only some declarations.
+
+	Args:
+		manifest(str): path to the JSON manifest file.
+
+	Returns:
+		A list of dicts, one for each library.
+	"""
+	with open(manifest) as file:
+		entries = json.load(file)
+
+	# Paths inside the manifest are relative to the manifest itself
+	root = os.path.dirname(os.path.abspath(manifest))
+
+	jobs = []
+	for entry in entries:
+		if 'header' not in entry:
+			raise Exception('Manifest entry is missing a header: %s' % entry)
+
+		job = {
+			'header' : os.path.join(root, entry['header']),
+			'dynlib' : entry.get('dynlib'),
+			'call_con' : entry.get('call_con', 'cdecl'),
+			'out_file' : entry.get('out_file'),
+			'include_dir' : os.path.join(root, entry.get('include_dir', '.')),
+			'depfile' : entry.get('depfile')
+		}
+
+		for path in ('out_file', 'depfile'):
+			if job[path] != None:
+				job[path] = os.path.join(root, job[path])
+
+		for name in SYMBOL_OPTIONS:
+			if name in entry:
+				job[name] = entry[name]
+
+		jobs.append(job)
+
+	return jobs
+
+
+def output_names(header, dynlib=None, out_file=None):
+	"""
+	Fills in the default dynamic library and output file names.
+
+	Args:
+		header(str): the header to parse.
+		dynlib(str): the dynamic library target or None.
+		out_file(str): the path/name.ext of the output file or None.
+
+	Returns:
+		A tuple of (dynlib, out_file).
+	"""
+
+	# Fix null dynamic lib name
+	if dynlib == None:
+		# Since the extension doesn't matter, just add a dot to it
+		dynlib = os.path.basename(header).split('.')[0] + '.'
+
+	if out_file == None:
+		out_file = dynlib.split('.')[0] + '.reds'
+
+	return dynlib, out_file
+
+
+def run_library(header, llvm_dir, dynlib=None, out_file=None,
+	call_con='cdecl', include_dir='.', dump_file='out/Output.txt', jobs=1,
+	cache=None, memo=None, depfile=None, skip_if_up_to_date=False,
+	single_pass=False, stream=False, profiler=None, backend='pyparsing',
+	emit_ir=None, from_ir=None, include_symbols=None, exclude_symbols=None,
+	reachable_from=None, style_dir=None):
+	"""
+	Formats, parses and generates the bindings for a single library.
+
+	Args:
+		header(str): the header to parse.
+		llvm_dir(str): the binary directory where LLVM lives
+		dynlib(str): the dynamic library target, used in the outfile
+		out_file(str): the path/name.ext of the output file
+		call_con(str): the calling convention of the library
+		include_dir(str): where other include files are, same as C
+		dump_file(str): where the formatter writes its combined output.
+		jobs(int): how many processes to parse the declarations with.
+		cache(PreprocessCache): cache for the formatter's output, or None.
+		memo(ParseMemo): parse results of previous runs, or None.
+		depfile(str): where to write a Makefile-style list of every file
+			the output depends on, or None.
+		skip_if_up_to_date(bool): don't do anything if the inputs and
+			options are the same as the last time (see `stamp`).
+		single_pass(bool): get the pound defines from the same clang run as
+			the declarations (see `format.preprocess`).
+		stream(bool): parse and generate declarations while clang is still
+			running without keeping them all in memory (see
+			`format.HeaderStream`).
+		profiler(Profiler): records the time spent in each stage, or None.
+		backend(str): 'pyparsing' to parse clang-format's output one line at
+			a time, 'pycparser' to parse the whole translation unit at once
+			(see `pycparser_backend`) or 'clang' to use clang's own AST (see
+			`clang_backend`).
+		emit_ir(str): also write the parsed declarations to this IR file
+			(see `ir_file`), or None.
+		from_ir(str): only generate the declarations of this IR file instead
+			of preprocessing and parsing the header, or None.
+		include_symbols: only generate the declarations whose name matches
+			this glob (or `re:` regular expression) or list of them.
+		exclude_symbols: never generate the declarations whose name matches
+			these patterns.
+		reachable_from: generate the declarations whose name matches these
+			patterns along with every declaration they depend on.
+		style_dir(str): the folder clang-format runs in, which it looks for
+			its .clang-format from. The current one if None.
+
+	Returns:
+		A dict summarizing the run: the header, the output file, the time it
+		took, how many declarations were found, how many of each kind
+		were compiled, whether it was skipped for being up to date and
+		whether the output file changed.
+	"""
+	start = time.perf_counter()
+
+	dynlib, out_file = output_names(header, dynlib, out_file)
+	symbols = symbol_filter(include_symbols, exclude_symbols, reachable_from)
+	options = stamp_options(header, llvm_dir, dynlib, call_con, include_dir,
+		single_pass, backend, symbols, style_dir)
+
+	if from_ir != None:
+		return compile_from_ir(header, from_ir, dynlib, out_file, call_con,
+			options, start, emit_ir, profiler, symbols)
+
+	if skip_if_up_to_date and stamp.is_up_to_date(out_file, options):
+		return skipped_summary(header, out_file, start)
+
+	if backend not in BACKENDS:
+		raise Exception(f'Unknown backend: {backend} (one of {BACKENDS})')
+
+	if backend != 'pyparsing' and stream:
+		raise Exception(f'The {backend} backend cannot stream')
+
+	if emit_ir != None and stream:
+		raise Exception('An IR file cannot be written while streaming')
+
+	if symbols != None and stream:
+		raise Exception('Symbols cannot be picked while streaming')
+
+	parsed = ()
+
+	# Clean up the header file and obtain all declarations/pound defines
+	if backend == 'pycparser':
+		# Only imported when used since it pulls in pycparser. The cache only
+		# holds clang-format's output, so it is not used by either backend.
+		import pycparser_backend
+		declarations, parsed, deps = pycparser_backend.translate(header,
+			llvm_dir, include_dir, dump_file, profiler)
+
+	elif backend == 'clang':
+		import clang_backend
+		declarations, parsed, deps = clang_backend.translate(header,
+			llvm_dir, include_dir, dump_file, profiler)
+
+	elif stream:
+		declarations = format.HeaderStream(header, llvm_dir, include_dir,
+			dump_file, cache, single_pass, profiler, style_dir)
+		deps = None
+	else:
+		declarations, deps = format.preprocess(header, llvm_dir, include_dir,
+			dump_file, cache, single_pass, profiler, style_dir)
+
+	return compile_library(header, declarations, deps, dynlib, out_file,
+		call_con, options, start, jobs, memo, depfile, skip_if_up_to_date,
+		stream, profiler, parsed, emit_ir, symbols)
+
+
+def compile_from_ir(header, from_ir, dynlib, out_file, call_con, options,
+	start, emit_ir=None, profiler=None, symbols=None):
+	"""
+	Generates the bindings of a library from an IR file written by an earlier
+	run, without running clang or parsing anything.
+
+	Args:
+		header(str): the header the IR file was made from.
+		from_ir(str): the IR file.
+		dynlib(str): the dynamic library target.
+		out_file(str): the path/name.ext of the output file.
+		call_con(str): the calling convention of the library.
+		options(dict): as returned by `stamp_options`.
+		start(float): when the run started (`time.perf_counter`).
+		emit_ir(str): write the declarations to this IR file again, or None.
+		profiler(Profiler): records the time spent in each stage, or None.
+		symbols(SymbolFilter): picks the declarations to generate, or None.
+
+	Returns:
+		The summary of the run (see `run_library`).
+	"""
+	# Only imported when used
+	from ir_file import IRFile
+	from profiler import stage
+
+	with stage(profiler, 'load ir') as record, IRFile(from_ir) as ir_file:
+		parsed = list(ir_file)
+		record['items'] = len(parsed)
+
+	return compile_library(header, [], [from_ir], dynlib, out_file, call_con,
+		options, start, profiler=profiler, parsed=parsed, emit_ir=emit_ir,
+		symbols=symbols)
+
+
+def stamp_options(header, llvm_dir, dynlib, call_con, include_dir,
+	single_pass, backend, symbols=None, style_dir=None):
+	"""
+	Collects everything other than the inputs that changes what is generated
+	for a library, to be compared with its stamp (see `stamp`): the options,
+	the clang-format style, the version of RGB and its builtin types.
+
+	Args:
+		header(str): the header to parse.
+		llvm_dir(str): the binary directory where LLVM lives
+		dynlib(str): the dynamic library target
+		call_con(str): the calling convention of the library
+		include_dir(str): where other include files are
+		single_pass(bool): whether clang is only run once.
+		backend(str): the backend that parses the header.
+		symbols(SymbolFilter): picks the declarations to generate, or None.
+		style_dir(str): the folder clang-format runs in.
+
+	Returns:
+		A dict of the options.
+	"""
+	options = {
+		'header' : os.path.abspath(header),
+		'llvm_dir' : llvm_dir,
+		'dynlib' : dynlib,
+		'call_con' : call_con,
+		'include_dir' : os.path.abspath(include_dir),
+		'single_pass' : single_pass,
+		'backend' : backend,
+		'style' : hash_style(style_dir),
+		'version' : GENERATOR_VERSION,
+		'types' : hash_strings(json.dumps(rgb_config.TYPES, sort_keys=True))
+	}
+
+	# Left out when every declaration is generated so older stamps still match
+	if symbols != None:
+		options['symbols'] = symbols.options()
+
+	return options
+
+
+def skipped_summary(header, out_file, start):
+	"""
+	Creates the summary of a library that was up to date.
+
+	Args:
+		header(str): the header.
+		out_file(str): its output file.
+		start(float): when the run started (`time.perf_counter`).
+
+	Returns:
+		The summary (see `run_library`).
+	"""
+	return {
+		'header' : header,
+		'out_file' : out_file,
+		'seconds' : time.perf_counter() - start,
+		'declarations' : 0,
+		'kinds' : {},
+		'skipped' : True,
+		'changed' : False,
+		'error' : None
+	}
+
+
+def compile_library(header, declarations, deps, dynlib, out_file, call_con,
+	options, start, jobs=1, memo=None, depfile=None, skip_if_up_to_date=False,
+	stream=False, profiler=None, parsed=(), emit_ir=None, symbols=None):
+	"""
+	Parses and generates the declarations of a library once they have been
+	obtained, then writes its dependency file, stamp and IR file.
+
+	This is everything `run_library` does after running clang.
+
+	Args:
+		header(str): the header that was preprocessed.
+		declarations: the lines to classify and parse, or a `HeaderStream`.
+		deps(list): every file the output depends on (None when streaming,
+			the stream knows them once it has been read).
+		dynlib(str): the dynamic library target.
+		out_file(str): the path/name.ext of the output file.
+		call_con(str): the calling convention of the library.
+		options(dict): as returned by `stamp_options`.
+		start(float): when the run started (`time.perf_counter`).
+		jobs(int): how many processes to parse the declarations with.
+		memo(ParseMemo): parse results of previous runs, or None.
+		depfile(str): where to write the dependency file, or None.
+		skip_if_up_to_date(bool): write a stamp for the next run.
+		stream(bool): whether `declarations` is a `HeaderStream`.
+		profiler(Profiler): records the time spent in each stage, or None.
+		parsed(list): compilers another backend already parsed.
+		emit_ir(str): where to write the parsed declarations, or None.
+		symbols(SymbolFilter): picks the declarations to generate, or None.
+
+	Returns:
+		The summary of the run (see `run_library`).
+	"""
+	# Both parse and generate the declarations
+	rgb_compiler = RGB(declarations, dynlib, call_con, out_file, jobs, memo,
+		stream, profiler, parsed, symbols)
+	results = rgb_compiler.compile()
+
+	if emit_ir != None:
+		# Only imported when used
+		import ir_file
+		ir_file.write(emit_ir, results)
+
+	if stream:
+		deps = declarations.deps
+
+	# Count how many of each kind of declaration were compiled
+	kinds = dict(rgb_compiler.kind_counts)
+
+	if depfile != None:
+		format.write_depfile(depfile, out_file, deps)
+
+	if skip_if_up_to_date:
+		stamp.write_stamp(out_file, deps, options)
+
+	return {
+		'header' : header,
+		'out_file' : out_file,
+		'seconds' : time.perf_counter() - start,
+		'declarations' : (
+			declarations.count if stream else len(declarations)
+		),
+		'kinds' : kinds,
+		'counters' : rgb_compiler.counters,
+		'skipped' : False,
+		'changed' : rgb_compiler.changed,
+		'error' : None
+	}
+
+
+def run_batch(jobs, llvm_dir, workers=1, **options):
+	"""
+	Generates the bindings for every job in the list.
+
+	Clang and Clang-Format run as separate processes, so several workers can
+	keep more than one of them busy at the same time. A library that fails
+	does not stop the rest of the batch, its error is put in its summary.
+
+	Since the libraries are processed at the same time, the formatter's
+	combined output (out/Output.txt) is not written for any of them.
+
+	Args:
+		jobs(list): dicts as returned by `load_manifest`.
+		llvm_dir(str): the binary directory where LLVM lives
+		workers(int): how many libraries to work on at the same time.
+		options: passed on to `run_library` for every job (cache, memo,
+			skip_if_up_to_date, ...).
+
+	Returns:
+		A list of summaries (see `run_library`) in the same order as `jobs`.
+	"""
+	def run(job):
+		try:
+			return run_library(llvm_dir=llvm_dir, dump_file=None, **job,
+				**options)
+		except Exception as e:
+			return failed_summary(job, e)
+
+	if workers <= 1:
+		return [run(job) for job in jobs]
+
+	# Only imported when needed since it takes a while
+	from concurrent.futures import ThreadPoolExecutor
+
+	with ThreadPoolExecutor(max_workers=workers) as pool:
+		return list(pool.map(run, jobs))
+
+
+def failed_summary(job, error):
+	"""
+	Creates the summary of a library that could not be generated.
+
+	Args:
+		job(dict): the job, as returned by `load_manifest`.
+		error(Exception): what went wrong.
+
+	Returns:
+		The summary (see `run_library`).
+	"""
+	return {
+		'header' : job['header'],
+		'out_file' : job['out_file'],
+		'seconds' : 0.0,
+		'declarations' : 0,
+		'kinds' : {},
+		'skipped' : False,
+		'changed' : False,
+		'error' : f'{error.__class__.__name__}: {error}'
+	}
+
+
+def print_summary(summaries, seconds):
+	"""
+	Prints a table with the time and declaration counts of each library.
+
+	Args:
+		summaries(list): the summaries returned by `run_batch`.
+		seconds(float): the wall time taken by the whole batch.
+	"""
+	print('-' * 80)
+	print(f' {"Library":<30} {"Seconds":>9} {"Decls":>7}   Compiled')
+	print('-' * 80)
+
+	for summary in summaries:
+		name = os.path.basename(summary['header'])
+
+		if summary['error'] != None:
+			print(f' {name:<30} {"FAILED":>9} {"":>7}   {summary["error"]}')
+			continue
+
+		if summary['skipped']:
+			print(f' {name:<30} {summary["seconds"]:>9.3f} {"":>7}   up to date')
+			continue
+
+		kinds = ', '.join(f'{k}: {v}' for k, v in sorted(summary['kinds'].items()))
+		if not summary['changed']:
+			kinds += ' (unchanged)'
+
+		print(
+			f' {name:<30} {summary["seconds"]:>9.3f} '
+			f'{summary["declarations"]:>7}   {kinds}'
+		)
+
+	changed = sum(1 for i in summaries if i['changed'])
+
+	print('-' * 80)
+	print(
+		f' {len(summaries)} libraries in {seconds:.3f} seconds, '
+		f'{changed} changed'
+	)
+	print('-' * 80)
@@ -0,0 +1,361 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+On-disk cache of the preprocessed declarations of a header.
+
+Running Clang, Clang-Format and then Clang again for the pound defines is by
+far the slowest part of RGB. Their output only depends on the contents of the
+header, the contents of every file it includes, the include directory, the
+versions of the tools and the `.clang-format` style, so if none of those
+changed, the previous output can be reused without launching a single
+process.
+
+The cache directory looks like this:
+
+	.rgb_cache/
+		tools.json            <- version of each tool binary seen so far
+		index/<locator>.json  <- every file a header included last time
+		objects/<content>.json <- the declarations for a set of file contents
+
+The locator is a hash of where the header is (path, include dir, tools) and
+the content key is a hash of what went into the output (the bytes of every
+file, the include dir, the tool versions and the style).
+"""
+
+import os # Paths and file stats
+import json # Cache files
+import shutil # Finding the tool binaries
+import hashlib # Hashing file contents
+import tempfile # Atomic writes
+import subprocess # Asking the tools for their version
+
+
+# The files clang-format reads its style from with `-style=file`, in the
+# order it looks for them in each folder
+STYLE_FILES = ('.clang-format', '_clang-format')
+
+
+def hash_file(path):
+	"""
+	Hashes the contents of a file.
+
+	Args:
+		path(str): the file to hash.
+
+	Returns:
+		The hex SHA-256 of the file or None if it could not be read.
+	"""
+	sha = hashlib.sha256()
+
+	try:
+		with open(path, 'rb') as file:
+			for chunk in iter(lambda: file.read(1 << 16), b''):
+				sha.update(chunk)
+	except OSError:
+		return None
+
+	return sha.hexdigest()
+
+
+def hash_strings(*strings):
+	"""
+	Hashes a sequence of strings so that ('ab', 'c') != ('a', 'bc').
+
+	Args:
+		strings(str): the strings to hash.
+
+	Returns:
+		The hex SHA-256 of the strings.
+	"""
+	sha = hashlib.sha256()
+
+	for i in strings:
+		sha.update(i.encode('UTF-8'))
+		sha.update(b'\0')
+
+	return sha.hexdigest()
+
+
+def style_file(directory=None):
+	"""
+	Finds the style file clang-format uses for what it reads from stdin, the
+	first one in the folder it runs in or any of that folder's parents.
+
+	Args:
+		directory(str): the folder clang-format runs in, the current one if
+			None.
+
+	Returns:
+		The path of the style file or None if there is none.
+	"""
+	directory = os.path.abspath(directory or os.getcwd())
+
+	while True:
+		for name in STYLE_FILES:
+			path = os.path.join(directory, name)
+			if os.path.isfile(path):
+				return path
+
+		parent = os.path.dirname(directory)
+		if parent == directory:
+			return
+
+		directory = parent
+
+
+def hash_style(directory=None):
+	"""
+	Hashes the style clang-format formats with (see `style_file`).
+
+	Args:
+		directory(str): the folder clang-format runs in, the current one if
+			None.
+
+	Returns:
+		The hex SHA-256 of the style file, or an empty string if there is
+		none.
+	"""
+	path = style_file(directory)
+	return '' if path == None else hash_file(path) or ''
+
+
+def write_json(path, data):
+	"""
+	Atomically writes `data` to `path` as JSON.
+
+	Writing to a temporary file and renaming it means that a reader never
+	sees half a file, even if two RGB processes share the cache.
+
+	Args:
+		path(str): the file to write.
+		data: anything the json module can serialize.
+	"""
+	directory = os.path.dirname(path) or '.'
+	os.makedirs(directory, exist_ok=True)
+
+	handle, temp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+	try:
+		with os.fdopen(handle, 'w') as file:
+			json.dump(data, file)
+		os.replace(temp, path)
+	except:
+		os.remove(temp)
+		raise
+
+
+def read_json(path):
+	"""
+	Reads a JSON file written by `write_json`.
+
+	Args:
+		path(str): the file to read.
+
+	Returns:
+		The data in the file or None if it doesn't exist or is corrupt.
+	"""
+	try:
+		with open(path) as file:
+			return json.load(file)
+	except (OSError, ValueError):
+		return None
+
+
+class PreprocessCache:
+	"""
+	Content-addressed cache for the output of `format.format_header`.
+
+	Attributes:
+		directory(str): where the cache files are stored.
+		hits(int): how many lookups returned cached declarations.
+		misses(int): how many lookups had to run the tools.
+	"""
+	def __init__(self, directory='.rgb_cache'):
+		"""
+		Constructor.
+
+		Args:
+			directory(str): where to keep the cache files.
+		"""
+		self.directory = directory
+		self.hits = 0
+		self.misses = 0
+		self.__tools = read_json(os.path.join(directory, 'tools.json')) or {}
+
+	def lookup(self, header, llvm_dir, includes, variant='', style_dir=None):
+		"""
+		Gets the declarations of a previous run if nothing has changed.
+
+		Only files are read and hashed, no process is spawned.
+
+		Args:
+			header(str): the header to format.
+			llvm_dir(str): the binary directory where LLVM lives.
+			includes(str): the include directory.
+			variant(str): name of the way the tools were run, if there is
+				more than one.
+			style_dir(str): the folder clang-format runs in, the current one
+				if None (see `style_file`).
+
+		Returns:
+			A tuple of (declarations, dependencies) or None on a miss.
+		"""
+		result = self.__lookup(header, llvm_dir, includes, variant,
+			style_dir)
+
+		if result == None:
+			self.misses += 1
+		else:
+			self.hits += 1
+
+		return result
+
+	def __lookup(self, header, llvm_dir, includes, variant, style_dir):
+		"""
+		Does the actual lookup for `lookup` (which counts hits and misses).
+		"""
+		versions = self.__versions(llvm_dir, run=False)
+		if versions == None:
+			return
+
+		index = read_json(
+			self.__index_path(header, llvm_dir, includes, variant)
+		)
+		if index == None:
+			return
+
+		content_key = self.__content_key(index['deps'], includes, versions,
+			variant, style_dir)
+		if content_key == None:
+			return
+
+		declarations = read_json(self.__object_path(content_key))
+		if declarations == None:
+			return
+
+		return declarations, index['deps']
+
+	def store(self, header, llvm_dir, includes, deps, declarations,
+		variant='', style_dir=None):
+		"""
+		Saves the declarations of a run so the next one can reuse them.
+
+		Args:
+			header(str): the header that was formatted.
+			llvm_dir(str): the binary directory where LLVM lives.
+			includes(str): the include directory.
+			deps(list): the header and every file it includes.
+			declarations(list): the output of `format.format_header`.
+			variant(str): name of the way the tools were run.
+			style_dir(str): the folder clang-format ran in.
+		"""
+		versions = self.__versions(llvm_dir, run=True)
+		if versions == None:
+			return
+
+		content_key = self.__content_key(deps, includes, versions, variant,
+			style_dir)
+		if content_key == None:
+			return
+
+		write_json(self.__object_path(content_key), declarations)
+		write_json(
+			self.__index_path(header, llvm_dir, includes, variant),
+			{ 'deps' : deps }
+		)
+
+	def __index_path(self, header, llvm_dir, includes, variant):
+		"""
+		Path to the list of files a header included on its last run.
+		"""
+		locator = hash_strings(
+			os.path.abspath(header),
+			os.path.abspath(includes),
+			os.path.abspath(llvm_dir),
+			variant
+		)
+		return os.path.join(self.directory, 'index', locator + '.json')
+
+	def __object_path(self, content_key):
+		"""
+		Path to the declarations stored for the given content key.
+		"""
+		return os.path.join(self.directory, 'objects', content_key + '.json')
+
+	def __content_key(self, deps, includes, versions, variant, style_dir):
+		"""
+		Hashes everything that determines the output of the tools.
+
+		Returns:
+			The hex content key or None if one of the files is gone.
+		"""
+		parts = [
+			os.path.abspath(includes), variant, hash_style(style_dir)
+		] + versions
+
+		for dep in deps:
+			digest = hash_file(dep)
+			if digest == None:
+				return
+			parts += [dep, digest]
+
+		return hash_strings(*parts)
+
+	def __versions(self, llvm_dir, run):
+		"""
+		Gets the version strings of clang and clang-format.
+
+		A version is remembered by the size and modification time of the tool
+		binary, so it is only ever asked for once per installed tool.
+
+		Args:
+			llvm_dir(str): the binary directory where LLVM lives.
+			run(bool): whether to run `--version` for unknown binaries.
+
+		Returns:
+			A list of version strings or None if they are unknown.
+		"""
+		versions = []
+
+		for tool in ('clang', 'clang-format'):
+			path = shutil.which(f'{llvm_dir}{tool}')
+			if path == None:
+				return
+
+			stat = os.stat(path)
+			fingerprint = f'{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}'
+
+			if fingerprint not in self.__tools:
+				if not run:
+					return
+
+				output = subprocess.check_output([path, '--version'])
+				self.__tools[fingerprint] = output.decode('UTF-8').strip()
+				write_json(
+					os.path.join(self.directory, 'tools.json'),
+					self.__tools
+				)
+
+			versions.append(self.__tools[fingerprint])
+
+		return versions
@@ -0,0 +1,835 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Builds the compilers straight from clang's own AST.
+
+The other backends parse C code again after clang has already understood it.
+This one runs `clang -Xclang -ast-dump=json -fsyntax-only` once and converts
+the FunctionDecl, RecordDecl, EnumDecl, TypedefDecl and VarDecl nodes of the
+header into compilers that already have their parse results. Neither
+clang-format nor any grammar is involved, and every type is exactly the one
+clang saw, no matter how the declaration was laid out.
+
+The dump of a large header easily reaches hundreds of megabytes, so it is
+never loaded at once: `iter_nodes` decodes one top-level declaration at a
+time while clang is still writing the rest.
+
+Pound defines are not part of the AST, so they still come from clang's `-dM`
+pass and go through the regular compilers.
+"""
+
+import os # Paths
+import re # Taking C types apart
+import json # Decoding each declaration of the dump
+import subprocess # Running clang
+import tempfile # Where clang writes the list of included files
+import format # Pound defines and dependency files
+import compilers # Compiler classes
+from profiler import stage # Timing each stage
+from red_utils import QUALIFIERS, base_type # Shortening C types
+
+
+# How many characters of clang's output are read at once
+CHUNK_SIZE = 1 << 16
+
+'''
+Start of the list of declarations of the translation unit. The keys clang
+writes before it (id, kind, loc and range) are all empty or plain strings, so
+the first match is always the translation unit's own list.
+'''
+INNER_START = re.compile(r'"inner"\s*:\s*\[')
+
+# What clang writes between two declarations
+SEPARATOR = re.compile(r'[\s,]*')
+
+# How clang names a struct that has no name: `struct (unnamed at a.h:3:9)`
+UNNAMED = re.compile(r'\((?:unnamed|anonymous)[^)]*\)')
+
+# Clang keeps attributes in the types it writes out
+ATTRIBUTE = re.compile(r'__attribute__\(\(.*?\)\)')
+
+# Pointer to a function: `int *(*)(char, float)`
+FUNCTION_POINTER = re.compile(r'^([^(]*)\(\s*(\*+)\s*\)\s*\((.*)\)$', re.S)
+
+# Array dimensions: `char [16]`
+ARRAY = re.compile(r'\[[^\]]*\]')
+
+# C identifiers, for finding the names of function pointer parameters
+IDENTIFIER = re.compile(r'[A-Za-z_]\w*')
+
+
+def iter_nodes(stream):
+	"""
+	Yields the top-level declarations of clang's JSON AST dump one at a time,
+	as they are read.
+
+	Only the part of the output that has not been decoded yet is kept. When a
+	declaration doesn't fit in what has been read so far, decoding it fails
+	and is tried again once more has been read.
+
+	Args:
+		stream (file): clang's output, opened in text mode.
+
+	Yields:
+		Each node of the translation unit's `inner` list, decoded.
+	"""
+	decoder = json.JSONDecoder()
+	buffer = ''
+	match = None
+
+	# Skip the translation unit's own keys
+	while match == None:
+		chunk = stream.read(CHUNK_SIZE)
+		if chunk == '':
+			return
+		buffer += chunk
+		match = INNER_START.search(buffer)
+
+	pos = match.end()
+
+	while True:
+		pos = SEPARATOR.match(buffer, pos).end()
+
+		if pos == len(buffer):
+			buffer = read_more(stream, '', CHUNK_SIZE)
+			pos = 0
+			continue
+
+		if buffer[pos] == ']':
+			return
+
+		try:
+			node, pos = decoder.raw_decode(buffer, pos)
+		except json.JSONDecodeError:
+			# Reading as much again as is left keeps a huge declaration from
+			# being decoded over and over
+			left = len(buffer) - pos
+			buffer = read_more(stream, buffer[pos:], max(CHUNK_SIZE, left))
+			pos = 0
+			continue
+
+		yield node
+
+		# Drop what was decoded
+		if pos > CHUNK_SIZE:
+			buffer = buffer[pos:]
+			pos = 0
+
+
+def read_more(stream, buffer, size):
+	"""
+	Reads the next part of clang's output.
+
+	Args:
+		stream (file): clang's output.
+		buffer (str): what is left of the previous parts.
+		size (int): how many characters to read.
+
+	Returns:
+		The buffer with the next part appended to it.
+	"""
+	chunk = stream.read(size)
+	if chunk == '':
+		raise Exception('The AST dump ended in the middle of a declaration')
+	return buffer + chunk
+
+
+class Locations:
+	"""
+	Follows the file and line of each node of the dump as it is read.
+
+	Clang only writes the file of a location when it is not the same as the
+	one of the previous location it wrote, and likewise for the line. Nodes
+	therefore have to be visited in the order they were written, which is the
+	order of the keys of the decoded dicts.
+
+	Attributes:
+		file (str): the file of the last location visited.
+		line (int): the line of the last location visited.
+		files (list): every file a location was in, in order.
+	"""
+	def __init__(self):
+		"""
+		Constructor.
+		"""
+		self.file = None
+		self.line = None
+		self.files = []
+
+	def visit(self, value):
+		"""
+		Walks a decoded node, storing the file and line of every declaration
+		in it in the `_file` and `_line` keys of that declaration.
+
+		Args:
+			value: a decoded node, or any value inside of one.
+		"""
+		if isinstance(value, dict):
+			# A location: {"offset": 12, "file": "a.h", "line": 1, ...}
+			if 'tokLen' in value:
+				if 'file' in value:
+					self.file = value['file']
+					self.files.append(self.file)
+				if 'line' in value:
+					self.line = value['line']
+				return
+
+			for key, item in list(value.items()):
+				self.visit(item)
+
+				# The location of a node comes before everything inside it
+				if key == 'loc' and 'kind' in value:
+					value['_file'] = self.file
+					value['_line'] = self.line
+
+		elif isinstance(value, list):
+			for item in value:
+				self.visit(item)
+
+
+def position(loc):
+	"""
+	Returns the offset of a location in its file. For code that came from a
+	macro, this is where the macro was used.
+
+	Args:
+		loc (dict): the location.
+
+	Returns:
+		The offset, or None if the location is not in a file.
+	"""
+	return loc.get('expansionLoc', loc).get('offset')
+
+
+def source(code, node):
+	"""
+	Returns the C code a node was parsed from.
+
+	Args:
+		code (bytes): the contents of the header.
+		node (dict): a node of the header.
+
+	Returns:
+		The code as a string, empty if the node has no location.
+	"""
+	begin = node['range']['begin']
+	end = node['range']['end']
+
+	if position(begin) == None or position(end) == None:
+		return ''
+
+	last = end.get('expansionLoc', end).get('tokLen', 0)
+	return code[position(begin):position(end) + last].decode('UTF-8',
+		'replace')
+
+
+def split_parameters(text):
+	"""
+	Splits a parameter list at the commas that aren't nested in parentheses.
+
+	Args:
+		text (str): the inside of the parentheses: `int a, void (*f)(int)`.
+
+	Returns:
+		A list of the parameters, without surrounding whitespace.
+	"""
+	result = []
+	depth = 0
+	begin = 0
+
+	for i, char in enumerate(text):
+		if char in '([':
+			depth += 1
+		elif char in ')]':
+			depth -= 1
+		elif char == ',' and depth == 0:
+			result.append(text[begin:i].strip())
+			begin = i + 1
+
+	result.append(text[begin:].strip())
+	return [i for i in result if i != '']
+
+
+def split_function(text):
+	"""
+	Splits a function type (or declaration) into what comes before its
+	parameter list and the parameters: `int *(char, float)` becomes
+	`('int *', ['char', 'float'])`.
+
+	Args:
+		text (str): the function type.
+
+	Returns:
+		A tuple of (return type, list of parameters).
+	"""
+	text = ATTRIBUTE.sub('', text).rstrip().rstrip(';').rstrip()
+	depth = 0
+
+	for i in range(len(text) - 1, -1, -1):
+		if text[i] == ')':
+			depth += 1
+		elif text[i] == '(':
+			depth -= 1
+			if depth == 0:
+				return text[:i].strip(), split_parameters(text[i + 1:-1])
+
+	return text, []
+
+
+def unwrap(qual_type):
+	"""
+	Finds the words of the base type and the pointer count of a type as
+	clang writes it. Arrays count as pointers, as do function pointers.
+
+	Args:
+		qual_type (str): the type, e.g. `const char *[4]`.
+
+	Returns:
+		A tuple of (list of words, pointer count), e.g. `(['char'], 2)`.
+	"""
+	qual_type = UNNAMED.sub('', ATTRIBUTE.sub('', qual_type))
+	ptr_count = len(ARRAY.findall(qual_type))
+	qual_type = ARRAY.sub('', qual_type)
+
+	match = FUNCTION_POINTER.match(qual_type.strip())
+	if match != None:
+		qual_type = match.group(1)
+		ptr_count += len(match.group(2))
+
+	# A function type, only its return type matters
+	elif '(' in qual_type:
+		qual_type = split_function(qual_type)[0]
+
+	ptr_count += qual_type.count('*')
+	words = qual_type.replace('*', ' ').split()
+	return [i for i in words if i not in QUALIFIERS], ptr_count
+
+
+def tokens(qual_type, name=None):
+	"""
+	Returns a declaration as the grammars tokenize it: `['char', '*', 'name']`.
+
+	Args:
+		qual_type (str): its type.
+		name (str): its name, left out if None.
+
+	Returns:
+		The list of tokens.
+	"""
+	words, ptr_count = unwrap(qual_type)
+	result = [base_type(words)] + ['*'] * ptr_count
+
+	if name != None:
+		result.append(name)
+
+	return result
+
+
+def declaration(qual_type, name):
+	"""
+	Writes a declaration back as C code: `char **` and `names` become
+	`char **names`.
+
+	Args:
+		qual_type (str): its type.
+		name (str): its name.
+
+	Returns:
+		The C code, without a semicolon.
+	"""
+	# The name of a function pointer goes inside of the parentheses
+	index = qual_type.find('(*')
+	if index != -1:
+		end = qual_type.index(')', index)
+		return qual_type[:end] + name + qual_type[end:]
+
+	index = qual_type.find('[')
+	if index == -1:
+		index = len(qual_type)
+
+	head = qual_type[:index].rstrip()
+	space = '' if head.endswith('*') else ' '
+	return head + space + name + qual_type[index:]
+
+
+def parameters(node):
+	"""
+	Returns the parameters of a FunctionDecl as the grammars tokenize them,
+	with a `,` between each parameter: `['int', 'a', ',', '...']`.
+
+	Args:
+		node (dict): the FunctionDecl.
+
+	Returns:
+		The list of tokens, `['void']` if there are no parameters.
+	"""
+	result = []
+	for i in node.get('inner', []):
+		if i['kind'] != 'ParmVarDecl':
+			continue
+
+		if len(result) > 0:
+			result.append(',')
+
+		result.extend(tokens(i['type']['qualType'], i.get('name')))
+
+	if node.get('variadic') or node['type']['qualType'].endswith('...)'):
+		result.extend([','] * (len(result) > 0) + ['...'])
+
+	if len(result) == 0:
+		return ['void']
+
+	return result
+
+
+def pointer_parameters(qual_type, line):
+	"""
+	Returns the parameters of a function pointer type as the grammars
+	tokenize them.
+
+	Clang's types don't keep the names of the parameters, so they are taken
+	from the C code of the declaration: whatever comes after the words of a
+	parameter's type is its name.
+
+	Args:
+		qual_type (str): the type: `void (*)(int, char *)`.
+		line (str): the declaration: `typedef void (*f)(int a, char *b);`.
+
+	Returns:
+		The list of tokens, empty if there are no parameters.
+	"""
+	types = split_parameters(FUNCTION_POINTER.match(qual_type).group(3))
+	written = split_function(line)[1]
+
+	if types == ['void']:
+		return []
+
+	result = []
+	for i, the_type in enumerate(types):
+		if len(result) > 0:
+			result.append(',')
+
+		if the_type == '...':
+			result.append('...')
+			continue
+
+		name = None
+		if len(types) == len(written):
+			words = IDENTIFIER.findall(written[i])
+			if len(words) > 0 and words[-1] not in IDENTIFIER.findall(the_type):
+				name = words[-1]
+
+		result.extend(tokens(the_type, name))
+
+	return result
+
+
+def refers_to(field, record):
+	"""
+	Whether a field is declared with a struct that was defined right before
+	it: `struct { int x, y; } position;`.
+
+	Args:
+		field (dict): the FieldDecl.
+		record (dict): the RecordDecl defined right before it.
+
+	Returns:
+		True if the field's type is the struct itself.
+	"""
+	words, ptr_count = unwrap(field['type']['qualType'])
+	return ptr_count == 0 and words[:1] == ['struct'] and (
+		len(words) == 1 or words[1] == record.get('name')
+	)
+
+
+def struct_members(record):
+	"""
+	Creates the tokens of each member of a struct, as `StructCompiler.parse`
+	would (see `ir.Struct`).
+
+	Fields declared on the same line are kept together, like the fields of a
+	declaration are.
+
+	Args:
+		record (dict): the RecordDecl.
+
+	Returns:
+		A list with, for each nested struct, `['struct', name, members]` and
+		for each line of fields, `['fields', [field tokens, ...]]`.
+	"""
+
+	# Either a list of fields on the same line or a (struct, field) tuple
+	entries = []
+	nested = None
+
+	for node in record.get('inner', []):
+		if node['kind'] == 'RecordDecl':
+			complete = node.get('completeDefinition')
+			nested = node if complete and node['tagUsed'] == 'struct' else None
+			continue
+
+		if node['kind'] != 'FieldDecl':
+			continue
+
+		if nested != None and refers_to(node, nested):
+			entries.append((nested, node))
+		elif (
+			len(entries) > 0 and isinstance(entries[-1], list) and
+			entries[-1][0]['_line'] == node['_line']
+		):
+			entries[-1].append(node)
+		else:
+			entries.append([node])
+
+		nested = None
+
+	members = []
+
+	for entry in entries:
+		# Nested struct declaration
+		if isinstance(entry, tuple):
+			inner, field = entry
+			members.append([
+				'struct',
+				inner.get('name') or field['name'],
+				struct_members(inner)
+			])
+			continue
+
+		fields = []
+
+		for field in entry:
+			qual_type = field['type']['qualType']
+			name = field.get('name')
+			words, ptr_count = unwrap(qual_type)
+
+			# Red/System only supports a single pointer
+			note = None
+			if ptr_count > 1:
+				note = f'{declaration(qual_type, name)};'
+
+			fields.append([name, base_type(words), ptr_count,
+				words[:1] == ['struct'], note, [], None])
+
+		members.append(['fields', fields])
+
+	return members
+
+
+def struct_result(record, name):
+	"""
+	Creates the parse result of a struct, as `StructCompiler.parse` would.
+
+	Args:
+		record (dict): the RecordDecl.
+		name (str): the name of the alias.
+
+	Returns:
+		The tokens of the struct (see `ir.Struct`).
+	"""
+	return [name, struct_members(record)]
+
+
+def enum_result(enum, name, code):
+	"""
+	Creates the parse result of an enum, as `EnumCompiler.parse` would.
+
+	Values are taken from the header as they were written. Values that come
+	from a macro are taken from clang instead, already evaluated.
+
+	Args:
+		enum (dict): the EnumDecl.
+		name (str): the name of the enum.
+		code (bytes): the contents of the header.
+
+	Returns:
+		The parse result: `[name, ['RED', ': ', '1', ',', 'GREEN']]`.
+	"""
+	members = []
+	for i in enum.get('inner', []):
+		if i['kind'] != 'EnumConstantDecl':
+			continue
+
+		if len(members) > 0:
+			members.append(',')
+
+		members.append(i['name'])
+
+		if len(i.get('inner', [])) > 0:
+			value = i['inner'][0]
+			written = value['range']['begin']
+
+			if 'expansionLoc' in written and 'value' in value:
+				written = [value['value']]
+			else:
+				written = source(code, value).split()
+
+			members.append(': ')
+			members.extend(written)
+
+	return [name, members]
+
+
+def is_definition(node):
+	"""
+	Whether a node defines a struct, union or enum (and doesn't just refer
+	to one).
+
+	Args:
+		node (dict): a top-level node.
+
+	Returns:
+		True for a RecordDecl or EnumDecl with a body.
+	"""
+	if node['kind'] == 'RecordDecl':
+		return bool(node.get('completeDefinition'))
+
+	return node['kind'] == 'EnumDecl' and len(node.get('inner', [])) > 0
+
+
+def owns(typedef, tag):
+	"""
+	Whether a struct or enum was defined as part of a typedef:
+	`typedef struct { int x; } Point;`
+
+	Clang writes such a struct as its own node right before the typedef.
+
+	Args:
+		typedef (dict): the TypedefDecl.
+		tag (dict): the RecordDecl or EnumDecl right before it, or None.
+
+	Returns:
+		True if the typedef starts before the struct does.
+	"""
+	if tag == None:
+		return False
+
+	return (
+		position(tag['range']['begin']) >=
+		position(typedef['range']['begin'])
+	)
+
+
+def convert_typedef(node, line, tag, code):
+	"""
+	Creates the compiler for a typedef.
+
+	Args:
+		node (dict): the TypedefDecl.
+		line (str): its C code.
+		tag (dict): the complete RecordDecl or EnumDecl right before it, or
+			None.
+		code (bytes): the contents of the header.
+
+	Returns:
+		The compiler, or None if RGB has no use for it.
+	"""
+	name = node['name']
+	qual_type = node['type']['qualType']
+
+	if owns(node, tag):
+		# The struct has its own name, its compiler was already created
+		if tag.get('name') != None:
+			return None
+
+		if tag['kind'] == 'EnumDecl':
+			return compilers.handed_over(compilers.ENUM, line,
+				enum_result(tag, name, code))
+
+		if tag['tagUsed'] != 'struct':
+			return None
+
+		return compilers.handed_over(compilers.STRUCT, line,
+			struct_result(tag, name))
+
+	# Function pointer
+	match = FUNCTION_POINTER.match(UNNAMED.sub('', qual_type))
+	if match != None and len(match.group(2)) == 1 and '[' not in qual_type:
+		return compilers.handed_over(compilers.FUNC_PTR, line,
+			[name, pointer_parameters(qual_type, line)])
+
+	words, ptr_count = unwrap(qual_type)
+	if ptr_count == 0 and words[:1] == ['struct']:
+		return compilers.handed_over(compilers.TYPEDEF, line,
+			['struct', base_type(words), name])
+
+	if ptr_count == 0 and words[:1] == ['union']:
+		return None
+
+	return compilers.handed_over(compilers.TYPEDEF, line,
+		tokens(qual_type, name))
+
+
+def convert(node, tag, code):
+	"""
+	Creates the compiler for a top-level declaration of the header.
+
+	Args:
+		node (dict): the declaration.
+		tag (dict): the complete RecordDecl or EnumDecl right before it, or
+			None.
+		code (bytes): the contents of the header.
+
+	Returns:
+		The compiler, or None if RGB has no use for it (function bodies,
+		unions, forward declarations, ...).
+	"""
+	kind = node['kind']
+	line = source(code, node) + ';'
+
+	if kind == 'TypedefDecl':
+		return convert_typedef(node, line, tag, code)
+
+	if kind == 'FunctionDecl':
+		# Function definitions are not imported
+		if any(i['kind'] == 'CompoundStmt' for i in node.get('inner', [])):
+			return None
+
+		return_type = split_function(node['type']['qualType'])[0]
+		return compilers.handed_over(compilers.FUNCTION, line,
+			[tokens(return_type, node['name']), parameters(node)])
+
+	if kind == 'RecordDecl':
+		if (
+			not node.get('completeDefinition') or node.get('name') == None or
+			node['tagUsed'] != 'struct'
+		):
+			return None
+
+		return compilers.handed_over(compilers.STRUCT, line,
+			struct_result(node, node['name']))
+
+	if kind == 'EnumDecl':
+		if len(node.get('inner', [])) == 0 or node.get('name') == None:
+			return None
+
+		return compilers.handed_over(compilers.ENUM, line,
+			enum_result(node, node['name'], code))
+
+	if kind == 'VarDecl':
+		words, ptr_count = unwrap(node['type']['qualType'])
+		if ptr_count == 0 and words[:1] == ['union']:
+			return None
+
+		return compilers.handed_over(compilers.GLOBAL_VAR, line,
+			tokens(node['type']['qualType'], node['name']))
+
+	return None
+
+
+def translate(header, llvm_dir, includes, dump_file=None, profiler=None):
+	"""
+	Dumps the header's AST with clang and creates a compiler with its parse
+	result for each of the header's declarations.
+
+	Args:
+		header(str): the header to parse.
+		llvm_dir(str): the binary directory where LLVM lives.
+		includes(str): the path of the folder containing relevant headers.
+		dump_file(str): where to write the defines and declarations found
+			for debugging, or None.
+		profiler(Profiler): times each stage if given.
+
+	Returns:
+		A tuple of (pound defines, compilers, dependencies). The pound
+		defines are lines that still have to be classified and parsed.
+	"""
+	if llvm_dir[-1] not in '/\\':
+		llvm_dir += '/'
+
+	# Offsets in the dump are in bytes
+	with open(header, 'rb') as file:
+		code = file.read()
+
+	wanted = os.path.abspath(header)
+	in_header = {}
+
+	# Clang writes the names of all the files it read to this file
+	dep_handle, dep_file = tempfile.mkstemp(suffix='.d')
+	os.close(dep_handle)
+
+	cmd_line = [
+		f'{llvm_dir}clang', '-I', includes, '-Xclang', '-ast-dump=json',
+		'-fsyntax-only', header, '-MD', '-MF', dep_file
+	]
+
+	try:
+		# Decoding and converting happen while clang is still writing
+		with stage(profiler, 'clang -ast-dump=json') as record:
+			clang = subprocess.Popen(cmd_line, stdout=subprocess.PIPE,
+				encoding='UTF-8', errors='replace')
+
+			locations = Locations()
+			found = []
+			tag = None
+
+			try:
+				for node in iter_nodes(clang.stdout):
+					locations.visit(node)
+					file = node.get('_file')
+
+					if file not in in_header:
+						in_header[file] = (
+							file != None and os.path.abspath(file) == wanted
+						)
+
+					# Only the header's own declarations, not included ones
+					if not in_header[file] or node.get('isImplicit'):
+						tag = None
+						continue
+
+					compiler = convert(node, tag, code)
+					if compiler != None:
+						found.append(compiler)
+
+					# A typedef right after a definition may own it
+					tag = node if is_definition(node) else None
+			finally:
+				clang.stdout.close()
+
+				if clang.wait() != 0:
+					raise subprocess.CalledProcessError(clang.returncode,
+						cmd_line)
+
+			record['items'] = len(found)
+
+		with open(dep_file) as file:
+			deps = format.read_depfile(file.read())
+	finally:
+		os.remove(dep_file)
+
+	# Every file a declaration came from, if clang didn't list them
+	if len(deps) == 0:
+		deps = [wanted] + [
+			os.path.abspath(i) for i in dict.fromkeys(locations.files)
+			if os.path.abspath(i) != wanted
+		]
+
+	with stage(profiler, 'clang -dM') as record:
+		defines = format.pound_defines(header, llvm_dir)
+		record['items'] = len(defines)
+
+	format.write_dump(dump_file, defines + [i.line + '\n' for i in found])
+
+	return defines, found, deps
@@ -0,0 +1,128 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+One compiler class for each kind of C declaration.
+
+The compilers are imported on first use, e.g. `compilers.StructCompiler`
+only imports `compilers.struct` (and Pyparsing with it) once a struct is
+found, so runs that never parse anything don't pay for any of them.
+"""
+
+import importlib # Importing the compiler modules on first use
+import ir # Records that parse results are kept in
+
+
+# The kind of declaration each compiler handles, which is its `KIND`. They
+# can be compared and bucketed without importing any compiler.
+STRUCT = 'Struct'
+POUND_DEFINE = 'PoundDefine'
+MACRO = 'Macro'
+ENUM = 'Enum'
+TYPEDEF = 'Typedef'
+FUNC_PTR = 'FuncPtr'
+FUNCTION = 'Function'
+GLOBAL_VAR = 'GlobalVar'
+
+# Kind -> compiler class
+CLASSES = {
+	STRUCT : 'StructCompiler',
+	POUND_DEFINE : 'PoundDefineCompiler',
+	MACRO : 'MacroCompiler',
+	ENUM : 'EnumCompiler',
+	TYPEDEF : 'TypedefCompiler',
+	FUNC_PTR : 'FuncPtrCompiler',
+	FUNCTION : 'FunctionCompiler',
+	GLOBAL_VAR : 'GlobalVarCompiler'
+}
+
+# Compiler class -> module it lives in
+MODULES = {
+	'PoundDefineCompiler' : 'pound_define',
+	'MacroCompiler' : 'macro',
+	'FuncPtrCompiler' : 'func_ptr',
+	'TypedefCompiler' : 'typedef',
+	'FunctionCompiler' : 'function',
+	'GlobalVarCompiler' : 'global_var',
+	'StructCompiler' : 'struct',
+	'EnumCompiler' : 'enum'
+}
+
+
+def __getattr__(name):
+	"""
+	Imports the module of a compiler class the first time it is used.
+
+	Args:
+		name(str): the name of the compiler class.
+
+	Returns:
+		The compiler class.
+	"""
+	if name not in MODULES:
+		raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+	module = importlib.import_module(f'{__name__}.{MODULES[name]}')
+	kind = getattr(module, name)
+
+	# Later lookups find it directly without calling this function again
+	globals()[name] = kind
+	return kind
+
+
+def create(kind, line):
+	"""
+	Creates the compiler of a kind of declaration, importing it if needed.
+
+	Args:
+		kind(str): one of the kinds, such as `STRUCT`.
+		line(str): the C code of the declaration.
+
+	Returns:
+		The compiler.
+	"""
+	name = CLASSES[kind]
+
+	if name in globals():
+		return globals()[name](line)
+
+	return __getattr__(name)(line)
+
+
+def handed_over(kind, line, result):
+	"""
+	Creates a compiler that already has its parse result, for the backends
+	that parse the header themselves (see `pycparser_backend`).
+
+	Args:
+		kind(str): one of the kinds, such as `STRUCT`.
+		line(str): the C code of the declaration.
+		result: its parse result, in the same shape as the tokens the
+			grammar of the compiler produces (see `ir`).
+
+	Returns:
+		The compiler.
+	"""
+	compiler = create(kind, line)
+	compiler.result = ir.compact(kind, result)
+	return compiler
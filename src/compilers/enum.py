@@ -25,6 +25,8 @@ SOFTWARE.
 from pyparsing import * # Best parsing library for Python
 from red_utils import * # Tools for parsing C/Red/System code
 from parse_utils import * # Tools for parsing in general
+import ir # Compact parse results
+import compilers # Kinds of declarations
 
 
 class EnumCompiler:
@@ -33,8 +35,11 @@ class EnumCompiler:
 
 	Attributes:
 		line(str): the line (or lines) of C code to parse.
-		result(str): the resulting Red/System code from parsing the C code.
+		result(ir.Enum): what the line parsed to, or None.
 	"""
+	__slots__ = ('line', 'result')
+	KIND = compilers.ENUM
+
 	def __init__(self, line):
 		"""
 		Constructor.
@@ -49,7 +54,7 @@ class EnumCompiler:
 		"""
 		Split the line into its constituent parts for code generation.
 		"""
-		self.result = Enum.parseString(self.line)
+		self.result = ir.Enum.from_tokens(Enum.parseString(self.line))
 
 	def generate(self, file):
 		"""
@@ -58,29 +63,26 @@ class EnumCompiler:
 		Args:
 			file(file): the already-opened file to write the Red/System code.
 		"""
-		res = list(self.result)
-		args = split_list(res[1][:], ',')
-
 		c_code = False
 
 		values = ''
-		for i in args:
-			if len(i) > 1:
+		for i in self.result.members:
+			if i.value != None:
 
 				# Possible C code expression for enum value
-				if len(i) > 3:
+				if len(i.value) > 1:
 					c_code = True
 
-				values += f'{i[0]}: ' + ' '.join(i[2:]) + ' '
+				values += f'{i.name}: ' + ' '.join(i.value) + ' '
 
 			else:
-				values += f'{i[0]} '
+				values += f'{i.name} '
 
 		if c_code:
 			file.write('; ' + '-' * 77)
 			file.write('; WARNING: Potential C expression, please review:')
 
-		file.write(f'#enum {res[0]}! [ {values} ]\n')
+		file.write(f'#enum {self.result.name}! [ {values} ]\n')
 
 		if c_code:
 			file.write('; ' + '-' * 77)
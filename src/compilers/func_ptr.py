@@ -25,6 +25,8 @@ SOFTWARE.
 from pyparsing import * # Best parsing library for Python
 from red_utils import * # Tools for parsing C/Red/System code
 from parse_utils import * # Tools for parsing in general
+import ir # Compact parse results
+import compilers # Kinds of declarations
 
 
 class FuncPtrCompiler:
@@ -33,23 +35,27 @@ class FuncPtrCompiler:
 
 	Attributes:
 		line(str): the line (or lines) of C code to parse.
-		result(str): the resulting Red/System code from parsing the C code.
+		result(ir.FuncPtr): what the line parsed to, or None.
 	"""
-	def __init__(self, line):
+	__slots__ = ('line', 'result')
+	KIND = compilers.FUNC_PTR
+
+	def __init__(self, line, result=None):
 		"""
 		Constructor.
 
 		Args:
 			line(str): the line to parse.
+			result: the result of `try_parse` if the line was already parsed.
 		"""
 		self.line = line
-		self.result = None
+		self.result = result
 
 	def parse(self):
 		"""
 		Split the line into its constituent parts for code generation.
 		"""
-		self.result = FunctionPtr.parseString(self.line)
+		self.result = ir.FuncPtr.from_tokens(FunctionPtr.parseString(self.line))
 
 	@staticmethod
 	def try_parse(line):
@@ -58,12 +64,16 @@ class FuncPtrCompiler:
 
 		Args:
 			line(str): the C code line that could pertain to this compiler.
+
+		Returns:
+			The parse result, which can be given to the constructor so that
+			the line isn't parsed twice, or None if it is not a function
+			pointer.
 		"""
 		try:
-			FunctionPtr.parseString(line)
-			return True
+			return ir.FuncPtr.from_tokens(FunctionPtr.parseString(line))
 		except:
-			return False
+			return None
 
 	def generate(self, file):
 		"""
@@ -72,10 +82,12 @@ class FuncPtrCompiler:
 		Args:
 			file(file): the already-opened file to write the Red/System code.
 		"""
-		res = list(self.result)
-		name = res[0]
-		signature = split_list(list(res[1]), ',')
-		signature = [argument(i) for i in signature if len(i) > 0]
+		name = self.result.name
+		signature = [
+			argument(param, position)
+			for position, param in enumerate(self.result.params, 1)
+			if len(param) > 0
+		]
 		file.write(f'{name}!: alias function! [ ')
 
 		for arg_type in signature:
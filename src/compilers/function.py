@@ -25,6 +25,8 @@ SOFTWARE.
 from pyparsing import * # Best parsing library for Python
 from red_utils import * # Tools for parsing C/Red/System code
 from parse_utils import * # Tools for parsing in general
+import ir # Compact parse results
+import compilers # Kinds of declarations
 
 
 class FunctionCompiler:
@@ -33,8 +35,11 @@ class FunctionCompiler:
 
 	Attributes:
 		line(str): the line (or lines) of C code to parse.
-		result(str): the resulting Red/System code from parsing the C code.
+		result(ir.Function): what the line parsed to, or None.
 	"""
+	__slots__ = ('line', 'result')
+	KIND = compilers.FUNCTION
+
 	def __init__(self, line):
 		"""
 		Constructor.
@@ -50,7 +55,7 @@ class FunctionCompiler:
 		Split the line into its constituent parts for code generation.
 		"""
 		try:
-			self.result = Function.parseString(self.line)
+			self.result = ir.Function.from_tokens(Function.parseString(self.line))
 		except:
 			print('BROKEN!')
 			print(self.line)
@@ -62,14 +67,9 @@ class FunctionCompiler:
 		Args:
 			file(file): the already-opened file to write the Red/System code.
 		"""
-		res = self.result
-		return_sig = list(res[0])
-		func_name = return_sig[-1]
-		return_sig = return_sig[:-1]
-		return_type = return_sig
-		ptr_count = return_sig.count('*')
-		return_sig = return_sig[:len(return_sig) - ptr_count]
-		args = split_list(list(res[1]), ',')
+		func_name = self.result.name
+		return_type = self.result.returns
+		args = self.result.params
 
 		function_gen = f'{func_name}: "{func_name}"\n[%s'
 		variadic = ''
@@ -78,7 +78,7 @@ class FunctionCompiler:
 			# Takes care of void do_this(void) <- there is no arg
 			if args[i][0] != 'void':
 				if args[i][0] != '...':
-					function_gen += '\n\t%s' % argument(args[i])
+					function_gen += '\n\t%s' % argument(args[i], i + 1)
 
 				else:
 					# The function has a variable number of arguments
@@ -87,10 +87,9 @@ class FunctionCompiler:
 		# Add the [variadic] attribute
 		function_gen %= variadic
 
-		if not return_sig[0] == 'void' or ptr_count > 0:
+		if not return_type[0] == 'void' or '*' in return_type:
 			function_gen += '\n\treturn: %s'
-			return_sig = get_return_type(return_type)
-			function_gen %= return_sig
+			function_gen %= get_return_type(return_type)
 
 		function_gen += '\n]\n'
 
@@ -25,6 +25,8 @@ SOFTWARE.
 from pyparsing import * # Best parsing library for Python
 from red_utils import * # Tools for parsing C/Red/System code
 from parse_utils import * # Tools for parsing in general
+import ir # Compact parse results
+import compilers # Kinds of declarations
 
 
 class GlobalVarCompiler:
@@ -33,8 +35,11 @@ class GlobalVarCompiler:
 
 	Attributes:
 		line(str): the line (or lines) of C code to parse.
-		result(str): the resulting Red/System code from parsing the C code.
+		result(ir.GlobalVar): what the line parsed to, or None.
 	"""
+	__slots__ = ('line', 'result')
+	KIND = compilers.GLOBAL_VAR
+
 	def __init__(self, line):
 		"""
 		Constructor.
@@ -50,7 +55,9 @@ class GlobalVarCompiler:
 		Split the line into its constituent parts for code generation.
 		"""
 		try:
-			self.result = GlobalVar.parseString(self.line)
+			self.result = ir.GlobalVar.from_tokens(
+				GlobalVar.parseString(self.line)
+			)
 		except:
 			print(e)
 			print(self.line)
@@ -62,9 +69,8 @@ class GlobalVarCompiler:
 		Args:
 			file(file): the already-opened file to write the Red/System code.
 		"""
-		res = list(self.result)
-		name = res[-1]
-		out = argument(res)
+		name = self.result.name
+		out = argument(self.result.tokens())
 		the_type = out[out.index(' ') + 1:]
 		file.write('\n; Global Variable:\n')
 		file.write(f'{name}: "{name}" {the_type}\n\n')
@@ -25,6 +25,8 @@ SOFTWARE.
 from pyparsing import * # Best parsing library for Python
 from red_utils import * # Tools for parsing C/Red/System code
 from parse_utils import * # Tools for parsing in general
+import ir # Compact parse results
+import compilers # Kinds of declarations
 
 
 class MacroCompiler:
@@ -33,8 +35,11 @@ class MacroCompiler:
 
 	Attributes:
 		line(str): the line (or lines) of C code to parse.
-		result(str): the resulting Red/System code from parsing the C code.
+		result(ir.Macro): what the line parsed to, or None.
 	"""
+	__slots__ = ('line', 'result')
+	KIND = compilers.MACRO
+
 	def __init__(self, line):
 		"""
 		Constructor.
@@ -49,7 +54,7 @@ class MacroCompiler:
 		"""
 		Split the line into its constituent parts for code generation.
 		"""
-		self.result = Macro.parseString(self.line)
+		self.result = ir.Macro.from_tokens(Macro.parseString(self.line))
 
 	@staticmethod
 	def try_parse(line):
@@ -72,9 +77,8 @@ class MacroCompiler:
 		Args:
 			file(file): the already-opened file to write the Red/System code.
 		"""
-		res = list(self.result)
-		args = [i[0] for i in split_list(list(res[1]), ',')]
-		output = "#define %s (%s) ()" % (res[0], " ".join(args))
+		args = [i[0] for i in self.result.params]
+		output = "#define %s (%s) ()" % (self.result.name, " ".join(args))
 		c_code_warning(file, output, self.line)
 
 
@@ -25,6 +25,8 @@ SOFTWARE.
 from pyparsing import * # Best parsing library for Python
 from red_utils import * # Tools for parsing C/Red/System code
 from parse_utils import * # Tools for parsing in general
+import ir # Compact parse results
+import compilers # Kinds of declarations
 
 
 # Configuration Variables for testing
@@ -43,8 +45,11 @@ class PoundDefineCompiler:
 
 	Attributes:
 		line(str): the line (or lines) of C code to parse.
-		result(str): the resulting Red/System code from parsing the C code.
+		result(ir.Define): what the line parsed to, or None.
 	"""
+	__slots__ = ('line', 'result')
+	KIND = compilers.POUND_DEFINE
+
 	def __init__(self, line):
 		"""
 		Constructor.
@@ -60,7 +65,9 @@ class PoundDefineCompiler:
 		Split the line into its constituent parts for code generation.
 		"""
 		try:
-			self.result = PoundDefine.parseString(self.line)
+			self.result = ir.Define.from_tokens(
+				PoundDefine.parseString(self.line)
+			)
 		except Exception as e:
 			print(e)
 			print(self.line)
@@ -72,7 +79,7 @@ class PoundDefineCompiler:
 		Args:
 			file(file): the already-opened file to write the Red/System code.
 		"""
-		res = list(self.result)
+		res = self.result.tokens()
 
 		# DONE {
 
@@ -22,181 +22,749 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from pyparsing import * # Best parsing library for Python
-from pycparser import CParser # For parsing C a little easier
+import re # Splitting the struct into tokens
+import sys # Interning names
 from red_utils import * # Tools for parsing C/Red/System code
-from parse_utils import * # Tools for parsing in general
+import ir # Compact parse results
+import compilers # Kinds of declarations
 
-RGB_ENABLE_STDOUT = False
 
-class StructCompiler:
+# C tokens: identifiers, numbers and any other single character
+TOKEN = re.compile(r'[A-Za-z_$][A-Za-z0-9_$]*|[0-9][A-Za-z0-9_.]*|\S')
+
+# Keywords that start a (possibly nested) record
+RECORDS = ('struct', 'union')
+
+# Sizes in bytes of the C types whose Red/System type has another size
+C_SIZES = {
+	'char': 1, 'bool': 1, '_Bool': 1, 'short': 2, '__int16': 2, 'int16_t': 2,
+	'uint16_t': 2
+}
+
+# Sizes in bytes of the Red/System types (Red/System only targets 32-bit
+# platforms, so pointers take 4 bytes)
+RED_SIZES = {'byte': 1, 'logic': 4, 'integer': 4, 'float32': 4, 'float64': 8}
+POINTER_SIZE = 4
+
+
+def is_identifier(token):
 	"""
-	Parses a Struct from C code and generates a Red/System version of it.
+	Checks whether a token is an identifier (or keyword).
+
+	Args:
+		token(str): the token.
+
+	Returns:
+		True if it is.
+	"""
+	return token[0].isalpha() or token[0] in '_$'
+
+
+def opens_record(tokens, index):
+	"""
+	Checks whether a record with a body starts at a token, e.g.
+	`struct Name {` or `struct {`.
+
+	Args:
+		tokens(list): all of the tokens.
+		index(int): where the record would start.
+
+	Returns:
+		The index of its `{`, or None if there is no record with a body.
+	"""
+	if tokens[index] not in RECORDS:
+		return None
+
+	for i in (index + 1, index + 2):
+		if i >= len(tokens):
+			return None
+
+		if tokens[i] == '{':
+			return i
+
+		if not is_identifier(tokens[i]):
+			return None
+
+	return None
+
+
+def declarator(tokens, start, end):
+	"""
+	Finds the name and pointer count of a declarator such as `**name`,
+	`names[4]` or `(*callback)(int)`. Arrays and function pointers count as
+	pointers.
+
+	Args:
+		tokens(list): all of the tokens.
+		start(int): the first token of the declarator.
+		end(int): one past its last token.
+
+	Returns:
+		A tuple of (name or None, pointer count).
+	"""
+	name = None
+	pointers = 0
+	depth = 0
+	i = start
+
+	while i < end:
+		token = tokens[i]
+
+		if token == '*':
+			pointers += 1
+
+		elif token == '[':
+			pointers += 1
+
+			# Skip the dimension
+			while i < end and tokens[i] != ']':
+				i += 1
+
+		elif token == '(':
+			# The parameters of a function pointer come after its name
+			if name != None:
+				break
+			depth += 1
+
+		# A bit field's width comes after its name
+		elif token == ':' and depth == 0:
+			break
+
+		# `* const name` is a constant pointer named `name`
+		elif name == None and is_identifier(token) and (
+			token not in QUALIFIERS
+		):
+			name = token
+
+		i += 1
+
+	return name, pointers
+
+
+def dimensions(tokens, start, end):
+	"""
+	Finds the array dimensions of a declarator such as `names[4][MAX]`.
+
+	Args:
+		tokens(list): all of the tokens.
+		start(int): the first token of the declarator.
+		end(int): one past its last token.
+
+	Returns:
+		A tuple with each dimension as written, e.g. `('4', 'MAX')`.
+	"""
+	result = []
+	i = start
+
+	while i < end and tokens[i] != ':':
+		if tokens[i] == '[':
+			begin = i + 1
+			while i < end and tokens[i] != ']':
+				i += 1
+			result.append(sys.intern(' '.join(tokens[begin:i])))
+
+		i += 1
+
+	return tuple(result)
+
+
+def bit_width(tokens, start, end):
+	"""
+	Finds the width of a bit field such as `flags : 3`.
+
+	Args:
+		tokens(list): all of the tokens.
+		start(int): the first token of the declarator.
+		end(int): one past its last token.
+
+	Returns:
+		The width in bits, -1 if it isn't a number (a macro for instance),
+		or None if the declarator isn't a bit field.
+	"""
+	for i in range(start, end):
+		if tokens[i] == ':':
+			if i + 1 < end and tokens[i + 1].isdigit():
+				return int(tokens[i + 1])
+			return -1
+
+	return None
+
+
+def fields(tokens, start, end, note):
+	"""
+	Creates a field for each declarator of a declaration such as
+	`int x, *y, z[3]`.
+
+	Args:
+		tokens(list): all of the tokens.
+		start(int): the first token of the declaration.
+		end(int): the index of its `;`.
+		note(function): returns the C code of the declaration, for fields
+			that Red/System can't represent exactly.
+
+	Returns:
+		A tuple of `ir.StructField`, with a name of None for padding such as
+		`int : 4`, which only takes up room.
+	"""
+	# Each declarator is separated by a comma outside of any parentheses
+	bounds = []
+	depth = 0
+	begin = start
+
+	for i in range(start, end):
+		token = tokens[i]
+
+		if token in '([':
+			depth += 1
+		elif token in ')]':
+			depth -= 1
+		elif token == ',' and depth == 0:
+			bounds.append((begin, i))
+			begin = i + 1
+
+	bounds.append((begin, end))
+
+	# The type is the run of words in front of the first declarator, except
+	# for the last one when nothing else follows it (it is the name then)
+	first = bounds[0][0]
+	i = first
+	while i < bounds[0][1] and is_identifier(tokens[i]):
+		i += 1
+
+	if i == bounds[0][1] or tokens[i] in '[:':
+		i -= 1
+
+	words = [j for j in tokens[first:i] if j not in QUALIFIERS]
+	bounds[0] = (i, bounds[0][1])
+
+	the_type = sys.intern(base_type(words))
+	record = words[:1] == ['struct']
+	result = []
+
+	for begin, finish in bounds:
+		name, pointers = declarator(tokens, begin, finish)
+		width = bit_width(tokens, begin, finish)
+
+		# Only bit fields can go without a name
+		if name == None and width == None:
+			continue
+
+		result.append(ir.StructField(ir.interned(name), the_type, pointers,
+			record, note() if pointers > 1 else None,
+			dimensions(tokens, begin, finish), width))
+
+	return tuple(result)
+
+
+class Record:
+	"""
+	A record of `parse_struct()` whose `}` hasn't been reached yet.
 
 	Attributes:
-		line(str): the line (or lines) of C code to parse.
-		result(str): the resulting Red/System code from parsing the C code.
+		name(str): its tag, or None until its declarator is known.
+		kind(str): `struct` or `union`.
+		start(int): the index of its first token.
+		members(list): as in `ir.Struct`.
 	"""
-	def __init__(self, line):
+	__slots__ = ('name', 'kind', 'start', 'members')
+
+	def __init__(self, name, kind, start):
 		"""
 		Constructor.
 
 		Args:
-			line(str): the line to parse.
+			name(str): its tag, or None.
+			kind(str): `struct` or `union`.
+			start(int): the index of its first token.
 		"""
-		self.line = line
-		self.result = None
+		self.name = name
+		self.kind = kind
+		self.start = start
+		self.members = []
 
-	def parse(self):
-		"""
-		Split the line into its constituent parts for code generation.
-		"""
-		self.result = ''
 
-		w = ' ' * 40
+def parse_struct(text):
+	"""
+	Parses a struct, nested records included, in a single pass over its
+	tokens.
+
+	The fields of each declaration are kept together so that they are
+	generated together. Line breaks don't matter. Unions and bit fields are
+	kept as they are, since laying them out needs the sizes of typedefs and
+	structs that are only all known when the header is generated (see
+	`laid_out()`).
+
+	Args:
+		text(str): the C code of the struct.
+
+	Returns:
+		The `ir.Struct`.
+	"""
+	matches = list(TOKEN.finditer(text))
+	tokens = [i.group() for i in matches]
+
+	# C code from the token at `start` to the one at `end`
+	code = lambda start, end: ' '.join(
+		text[matches[start].start():matches[end].end()].split()
+	)
+
+	# Each record whose `}` hasn't been reached
+	stack = []
+	i = 0
+
+	while i < len(tokens):
+		token = tokens[i]
+		brace = opens_record(tokens, i)
+
+		# Start of a record, named after its tag if it has one
+		if brace != None:
+			name = tokens[i + 1] if brace == i + 2 else None
+			stack.append(Record(name, token, i))
+			i = brace + 1
+
+		elif token == '}':
+			# Declarators of the record up to the `;`
+			end = i + 1
+			while end < len(tokens) and tokens[end] != ';':
+				end += 1
+
+			current = stack.pop()
+			name, pointers = declarator(tokens, i + 1, end)
+			members = tuple(current.members)
+			i = end + 1
+
+			if current.kind == 'union':
+				if len(stack) == 0:
+					raise Exception(f'Not a struct: {text}')
+
+				stack[-1].members.append(ir.Union(ir.interned(name),
+					members, pointers, code(current.start, end - 1)))
+				continue
+
+			if current.name == None:
+				current.name = name
+
+			record = ir.Struct(ir.interned(current.name), members)
+
+			if len(stack) == 0:
+				return record
+
+			stack[-1].members.append(record)
 
-		# List of structure names and the current index level to access them
-		struct_name = ['']
-		struct_nest = 0
+		# A declaration of fields (`typedef` only precedes the outer record)
+		elif len(stack) > 0:
+			end = i
+			while end < len(tokens) and tokens[end] != ';':
+				end += 1
 
-		# The result of each line
-		res = None
+			# Only the fields Red/System can't represent need their C code
+			last = min(end, len(matches) - 1)
+			note = lambda: code(i, last)
 
-		for line in self.line.split('\n'):
-			if line.strip() == '': continue
-			line = line.replace('\r', '')
+			declared = fields(tokens, i, end, note)
+			if len(declared) > 0:
+				stack[-1].members.append(declared)
+			i = end + 1
 
-			tab = '    ' * struct_nest
+		else:
+			i += 1
 
-			if '{' in line:
-				tab = '    ' * (struct_nest - 1)
-				res = tab + '['
+	# The struct never ended
+	if len(stack) == 0:
+		raise Exception(f'Not a struct: {text}')
 
-				if RGB_ENABLE_STDOUT:
-					print(line + w[len(line):], res)
+	while len(stack) > 1:
+		current = stack.pop()
+		stack[-1].members.append(
+			ir.Struct(ir.interned(current.name), tuple(current.members))
+		)
 
+	return ir.Struct(ir.interned(stack[0].name), tuple(stack[0].members))
 
-			# Individual Declarations
-			elif ';' in line and '}' not in line:
 
-				# Inline struct value
-				if 'struct' in line and '*' not in line:
-					vals = line.split(' ')
-					nme = vals[-1].replace(';', '')
-					strct = vals[-2]
-					res = tab + f'{nme} [{strct} value]'
-					if RGB_ENABLE_STDOUT:
-						print(line + w[len(line):], res)
-					continue
+def type_size(the_type):
+	"""
+	Finds the size of a single word C type.
+
+	Args:
+		the_type(str): the type.
+
+	Returns:
+		The size in bytes, or None for structs and unknown types.
+	"""
+	if the_type in C_SIZES:
+		return C_SIZES[the_type]
+
+	the_type, pointers = types().resolve(the_type)
+	if pointers > 0:
+		return POINTER_SIZE
+
+	return RED_SIZES.get(the_type)
+
+
+def field_layout(field, within):
+	"""
+	Finds the size and alignment of a field, e.g. 16 and 4 for
+	`int name[4]`.
+
+	Args:
+		field(ir.StructField): the field.
+		within(tuple): the names of the structs being laid out, which can't
+			contain themselves.
+
+	Returns:
+		A tuple of (size, alignment) in bytes, or None if it isn't known.
+	"""
+	count = 1
+	for i in field.array:
+		# Only plain numbers, not macros or expressions
+		try:
+			count *= int(i.rstrip('uUlL'), 0)
+		except ValueError:
+			return None
+
+	# Pointers, or arrays of them
+	if field.pointers > len(field.array):
+		return POINTER_SIZE * count, POINTER_SIZE
+
+	if not field.record:
+		size = type_size(field.type)
+		return None if size == None else (size * count, size)
+
+	struct = types().structs.get(field.type)
+	if struct == None or field.type in within:
+		return None
+
+	layout = struct_layout(laid_out(struct.members, within + (field.type,))[1])
+	return None if layout == None else (layout[0] * count, layout[1])
+
+
+def struct_layout(layouts):
+	"""
+	Lays out members one after another the way C does.
+
+	Args:
+		layouts(list): the (size, alignment) of each member.
+
+	Returns:
+		The (size, alignment) of the struct, or None if the layout of a
+		member isn't known.
+	"""
+	if None in layouts:
+		return None
+
+	offset = 0
+	alignment = 1
+
+	for size, align in layouts:
+		offset = -(-offset // align) * align + size
+		alignment = max(alignment, align)
 
-				# Pointer to struct
-				elif 'struct' in line and line.count('*') == 1:
-					vals = line.split(' ')
-					nme = vals[-1].replace('*', '').replace(';', '')
-					strct = vals[-2]
-					res = tab + f'{nme} [{strct}]'
-					if RGB_ENABLE_STDOUT:
-						print(line + w[len(line):], res)
-					continue
+	return -(-offset // alignment) * alignment, alignment
 
 
-				# Anything past here is a normal declaration (remove struct)
-				line.replace('struct', '')
+def union_layout(union, within):
+	"""
+	Lays out the members of a union on top of each other.
+
+	Args:
+		union(ir.Union): the union.
+		within(tuple): as in `field_layout()`.
+
+	Returns:
+		The (size, alignment) of the union, or None if the layout of a member
+		isn't known.
+	"""
+	if union.pointers > 0:
+		return POINTER_SIZE, POINTER_SIZE
+
+	layouts = laid_out(union.members, within)[1]
+	if len(layouts) == 0 or None in layouts:
+		return None
+
+	alignment = max(i[1] for i in layouts)
+	size = max(i[0] for i in layouts)
+	return -(-size // alignment) * alignment, alignment
+
+
+def placeholders(name, layout, note):
+	"""
+	Creates the fields that take up the room of something Red/System can't
+	represent, such as a union or the storage unit of bit fields.
+
+	Args:
+		name(str): the name of the first field. The others are numbered.
+		layout(tuple): the (size, alignment) to take up.
+		note(str): what the fields stand for, written next to the first one.
+
+	Returns:
+		A tuple of `ir.StructField`.
+	"""
+	size, alignment = layout
 
-				# Handle Multiple Declarations on one line
+	if alignment == 8:
+		unit, the_type = 8, 'double'
+	elif size % 4 == 0:
+		unit, the_type = 4, 'int'
+	else:
+		unit, the_type = 1, 'char'
 
-				the_decl = list(Decl.parseString(line.strip()))
-				end_of_type = None # Index where the type ends in list
+	count = size // unit
+	names = [name] if count == 1 else [
+		f'{name}_{i}' for i in range(1, count + 1)
+	]
 
-				# Get the index of where the type ends
-				if '*' in the_decl:
-					end_of_type = (len(the_decl) - the_decl[::-1].index('*'))
-					
-				# The first item _is_ the type
-				else:
-					end_of_type = 1
+	return tuple(
+		ir.StructField(sys.intern(j), the_type, 0, False,
+			note if i == 0 else None)
+		for i, j in enumerate(names)
+	)
 
-				# ['int', '*', <-- 'x', ',', 'y', ',', 'z']
-				the_type = the_decl[:end_of_type]
 
-				values = split_list(the_decl[end_of_type:], ',')
+def bit_units(bits, number):
+	"""
+	Creates a placeholder for each storage unit of a run of bit fields.
+	Red/System has no bit fields, so they have to be taken apart by hand.
+
+	Args:
+		bits(list): the (name, width, size) of each bit field, where the
+			size is that of its type.
+		number(int): the number of the first unit, for units that only
+			hold padding.
+
+	Returns:
+		A list with a tuple of (placeholders, layout) for each unit.
+	"""
+	# Each unit: [size, bits used, bit fields]
+	units = []
 
-				'''
-				Since the `argument` function needs only one type + id,
-				add the type to each and every var and handle them separately
-				'''
-				values = [the_type + i for i in values]
+	for name, width, size in bits:
+		if width == -1:
+			width = size * 8
 
+		if width == 0:
+			if len(units) > 0:
+				units[-1][1] = units[-1][0] * 8
+			continue
 
-				for value in values:
+		if (
+			len(units) == 0 or units[-1][0] != size or
+			units[-1][1] + width > size * 8
+		):
+			units.append([size, 0, []])
 
-					had_to_make_affordances_for_red_system_again = False
+		units[-1][1] += width
+		units[-1][2].append((name, width))
 
-					# Handle pointers
-					if '*' in value:
+	result = []
 
-						# Only cap it to a single pointer if the decl has > 1
-						if value.count('*') > 1:
-							value = 'int', '*', value[-1]
-							had_to_make_affordances_for_red_system_again = True
+	for size, used, members in units:
+		names = [i for i, j in members if i != None]
+		name = names[0] if len(names) > 0 else f'bits_{number + len(result)}'
+		described = ', '.join(
+			f'{i} : {j}' if i != None else f': {j}' for i, j in members
+		)
 
-					res = tab + argument(value)
+		result.append((
+			placeholders(name, (size, size),
+				f'Please check, bit fields {described}'),
+			(size, size)
+		))
 
-					if had_to_make_affordances_for_red_system_again:
-						res += f' ; {line.strip()}'
+	return result
 
-					if RGB_ENABLE_STDOUT:
-						print(line + w[len(line):], res)
 
-					# Manually add this res so that each variable can be added
-					self.result += res + '\n'
+# Written next to the field that stands for a union whose size isn't known
+UNKNOWN_SIZE = 'WARNING! Unknown size, please check: '
 
-				'''
-				Since we manually added each var, we don't need to add the
-				last one again
-				'''
-				res = ''
 
-			elif '}' in line:
-				tab = '    ' * (struct_nest - 1)
-				ender = StructEnd.parseString(line.strip())[0]
+def laid_out(members, within=()):
+	"""
+	Replaces the unions and bit fields of a struct by fields that take up as
+	much room, and lays out every member with the types in use.
 
-				if struct_nest > 1:
-					res = tab + '] value]'
-					if RGB_ENABLE_STDOUT:
-						print(line + w[len(line):], res)
-				else:
-					res = tab + ']'
-					if RGB_ENABLE_STDOUT:
-						print(line + w[len(line):], res)
+	A union whose size isn't known (it holds a struct or typedef that isn't
+	in the header) becomes a single field marked with `UNKNOWN_SIZE`.
 
-				struct_nest -= 1
-				struct_name.pop()
+	Args:
+		members(tuple): as in `ir.Struct`.
+		within(tuple): as in `field_layout()`.
 
+	Returns:
+		A tuple of (members, layouts) where the members only are nested
+		`ir.Struct`s and tuples of `ir.StructField`s, and the layouts are the
+		(size, alignment) of each of their fields, or None when it isn't
+		known.
+	"""
+	result = []
+	layouts = []
+
+	# Bit fields waiting for the storage units they share
+	bits = []
+
+	# Adds the storage units of the bit fields so far
+	def add_bits():
+		for placeholder, layout in bit_units(bits, len(layouts) + 1):
+			result.append(placeholder)
+			layouts.append(layout)
+		bits.clear()
+
+	for member in members:
+		if isinstance(member, ir.Struct):
+			add_bits()
+			inner, inner_layouts = laid_out(member.members, within)
+			result.append(ir.Struct(member.name, inner))
+			layouts.append(struct_layout(inner_layouts))
+			continue
+
+		if isinstance(member, ir.Union):
+			add_bits()
+			name = member.name or f'union_{len(layouts) + 1}'
+			layout = union_layout(member, within)
+
+			if layout == None:
+				result.append((ir.StructField(sys.intern(name), 'int', 0,
+					False, UNKNOWN_SIZE + member.note),))
 			else:
-				struct_nest += 1
-				struct_name.append(StructStart.parseString(line.strip())[0])
+				result.append(placeholders(name, layout,
+					'Please check, ' + member.note))
+
+			layouts.append(layout)
+			continue
+
+		kept = []
+
+		for field in member:
+			layout = field_layout(field, within)
+
+			if field.bits != None:
+				# A bit field of a type that isn't known is taken to be an int
+				size = 4 if layout == None else layout[1]
+				bits.append((field.name, field.bits, size))
+				continue
+
+			add_bits()
+			layouts.append(layout)
+			kept.append(field)
+
+		if len(kept) > 0:
+			result.append(tuple(kept))
 
-				pre = line + w[len(line):]
+	add_bits()
+	return tuple(result), layouts
 
-				if struct_nest > 1:
-					res = tab + f'{struct_name[struct_nest]} [struct!'
-					if RGB_ENABLE_STDOUT:
-						print(pre, res)
-				else:
-					res = tab + f'{struct_name[struct_nest]}!: alias struct!'
-					if RGB_ENABLE_STDOUT:
-						print(pre, res)
 
-			# After each iteration, add the result to self.result
-			self.result += res + '\n'
+def field_row(field):
+	"""
+	Writes a field as Red/System.
+
+	Args:
+		field(ir.StructField): the field.
+
+	Returns:
+		The field as a string.
+	"""
+	# Inline struct value or pointer to a struct
+	if field.record and field.pointers < 2:
+		value = ' value' if field.pointers == 0 else ''
+		return f'{field.name} [{field.type}!{value}]'
+
+	# Red/System only supports a single pointer
+	if field.pointers > 1:
+		return f'{field.name} {red_type("int", 1)} ; {field.note}'
+
+	row = f'{field.name} {red_type(field.type, field.pointers)}'
+
+	# Placeholder for a union or bit fields
+	if field.note != None:
+		return f'{row} ; {field.note}'
+
+	return row
+
+
+def struct_rows(members, depth, rows):
+	"""
+	Adds the Red/System version of each member of a struct to `rows`,
+	including an empty row after the fields of each declaration.
+
+	Args:
+		members(tuple): as in `ir.Struct`.
+		depth(int): how many structs the members are nested in.
+		rows(list): the rows to add to.
+	"""
+	member_rows(laid_out(members)[0], depth, rows)
+
+
+def member_rows(members, depth, rows):
+	"""
+	Adds the rows of members that are already laid out (see `struct_rows()`).
+
+	Args:
+		members(tuple): as returned by `laid_out()`.
+		depth(int): how many structs the members are nested in.
+		rows(list): the rows to add to.
+	"""
+	tab = '    ' * depth
+
+	for member in members:
+		# Nested struct declaration
+		if isinstance(member, ir.Struct):
+			rows.append(tab + f'{member.name} [struct!')
+			rows.append(tab + '[')
+			member_rows(member.members, depth + 1, rows)
+			rows.append(tab + '] value]')
+			continue
+
+		for field in member:
+			rows.append(tab + field_row(field))
+
+			if field.note != None and field.note.startswith(UNKNOWN_SIZE):
+				print('-' * 80)
+				print(' ' + field.note)
+				print('-' * 80 + '\n\n')
+
+		rows.append('')
+
+
+class StructCompiler:
+	"""
+	Parses a Struct from C code and generates a Red/System version of it.
+
+	Attributes:
+		line(str): the line (or lines) of C code to parse.
+		result(ir.Struct): what the line parsed to, or None.
+	"""
+	__slots__ = ('line', 'result')
+	KIND = compilers.STRUCT
+
+	def __init__(self, line):
+		"""
+		Constructor.
+
+		Args:
+			line(str): the line to parse.
+		"""
+		self.line = line
+		self.result = None
+
+	def parse(self):
+		"""
+		Split the line into its constituent parts for code generation.
+		"""
+		self.result = parse_struct(self.line)
 
 	def generate(self, file):
 		"""
 		Generate a Red/System version of the parsing result.
 
+		Every row is put together in a list and written at once.
+
 		Args:
 			file(file): the already-opened file to write the Red/System code.
 		"""
+		rows = [f'{self.result.name}!: alias struct!', '[']
+		struct_rows(self.result.members, 1, rows)
+		rows.append(']')
+
 		file.write('; Please check for accuracy:\n')
-		file.write(f'{self.result}\n\n\n')
+		file.write('\n'.join(rows) + '\n\n\n\n')
@@ -25,6 +25,23 @@ SOFTWARE.
 from pyparsing import * # Best parsing library for Python
 from red_utils import * # Tools for parsing C/Red/System code
 from parse_utils import * # Tools for parsing in general
+import ir # Compact parse results
+import compilers # Kinds of declarations
+
+
+def struct_define(tag):
+	"""
+	Writes the define of a struct that is only declared, such as `Point` in
+	`typedef struct Point Point;`. It is left out when the header also has
+	the struct, whose alias is used instead.
+
+	Args:
+		tag(str): the tag of the struct.
+
+	Returns:
+		The define as a line.
+	"""
+	return f'#define {tag}! [pointer! [byte!]]\n'
 
 
 class TypedefCompiler:
@@ -33,8 +50,11 @@ class TypedefCompiler:
 
 	Attributes:
 		line(str): the line (or lines) of C code to parse.
-		result(str): the resulting Red/System code from parsing the C code.
+		result(ir.Typedef): what the line parsed to, or None.
 	"""
+	__slots__ = ('line', 'result')
+	KIND = compilers.TYPEDEF
+
 	def __init__(self, line):
 		"""
 		Constructor.
@@ -49,7 +69,7 @@ class TypedefCompiler:
 		"""
 		Split the line into its constituent parts for code generation.
 		"""
-		self.result = Typedef.parseString(self.line)
+		self.result = ir.Typedef.from_tokens(Typedef.parseString(self.line))
 
 	def generate(self, file):
 		"""
@@ -58,11 +78,16 @@ class TypedefCompiler:
 		Args:
 			file(file): the already-opened file to write the Red/System code.
 		"""
-		res = list(self.result)
+		res = self.result.tokens()
+
+		# Only a name, such as the rest of a typedef the grammar can't read
+		if len(self.result.type) == 0:
+			c_code_warning(file, ' '.join(self.line.split()), self.line)
 
-		if res[0] == 'struct':
-			file.write(f'#define {res[1]}! [pointer! [byte!]]\n')
+		elif res[0] == 'struct':
+			# Such as `typedef struct Point Point;`, Point! is the struct
+			if res[1] not in types().structs:
+				file.write(struct_define(res[1]))
 		else:
-			the_type = mangle_type(res[0])
-			the_type = make_type(the_type)
+			the_type = red_type(res[0], res.count('*'))
 			file.write(f'#define {res[-1]}! {the_type}\n')
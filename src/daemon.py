@@ -0,0 +1,440 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Keeps RGB running between requests so each one skips the start-up work.
+
+Editor integrations and pre-commit hooks run RGB many times a minute, and
+every run pays for starting Python, importing the compilers and building the
+grammars before doing anything useful. `rgb serve` does all of that once,
+keeps the caches in memory and answers requests on a Unix domain socket.
+
+Every request and every response is a single line of JSON. A connection can
+send any number of requests:
+
+	{"command": "gen", "header": "calc.h", "llvm_dir": "/usr/bin", "cwd": ...}
+	{"ok": true, "out_file": null, "text": "Red/System [] ...", ...}
+
+	{"command": "stats"}
+	{"ok": true, "requests": 12, "errors": 0, "latency_ms": {...}, ...}
+
+Relative paths in a request are relative to its `cwd`, which is also where
+clang-format looks for its .clang-format from. The bindings are written to
+`out_file` if the request has one, otherwise they are sent back as `text`.
+
+Each connection is served on its own thread, so several clients are handled
+at the same time. Most of the waiting is on clang, which runs as a separate
+process.
+
+Clients only need `request`, which doesn't import any of RGB's parsing
+modules.
+"""
+
+import os # Paths
+import math # Percentiles
+import json # Requests and responses
+import time # Latencies
+import socket # Talking to the daemon
+import signal # Stopping cleanly when terminated
+import tempfile # Generating bindings that are sent back as text
+import threading # Counting requests from several connections
+import collections # Recent latencies
+import socketserver # Serving several connections at once
+
+
+# Default path of the socket, relative to where the daemon was started
+SOCKET_PATH = '.rgb.sock'
+
+# How many of the latest requests the latency percentiles are taken over
+LATENCY_WINDOW = 1000
+
+# The memo is written back at most this often (in seconds) while serving
+SAVE_INTERVAL = 30.0
+
+# Options of `batch.run_library` that a gen request can set
+GEN_OPTIONS = (
+	'dynlib', 'call_con', 'jobs', 'single_pass', 'backend',
+	'skip_if_up_to_date', 'include_symbols', 'exclude_symbols',
+	'reachable_from'
+)
+
+# Options that are paths, relative to the request's `cwd`
+PATH_OPTIONS = (
+	'header', 'out_file', 'include_dir', 'depfile', 'emit_ir', 'from_ir'
+)
+
+
+def warm_up():
+	"""
+	Imports the pipeline and every compiler and builds every grammar so that
+	the first request doesn't have to.
+
+	Returns:
+		How many grammars were built.
+	"""
+	import batch # The pipeline and everything it imports
+	import compilers # Compiler classes
+	import parse_utils # Grammars
+
+	for name in compilers.MODULES:
+		getattr(compilers, name)
+
+	count = 0
+	for value in list(vars(parse_utils).values()):
+		if isinstance(value, parse_utils.LazyGrammar):
+			value.get()
+			count += 1
+
+	return count
+
+
+def percentile(values, fraction):
+	"""
+	Returns the value below which `fraction` of the values fall (nearest
+	rank).
+
+	Args:
+		values(list): sorted values.
+		fraction(float): between 0 and 1.
+
+	Returns:
+		The value, or 0.0 if there are none.
+	"""
+	if len(values) == 0:
+		return 0.0
+
+	index = max(0, math.ceil(fraction * len(values)) - 1)
+	return values[index]
+
+
+def hit_rate(store):
+	"""
+	Summarizes the hits and misses of a cache or memo.
+
+	Args:
+		store: a PreprocessCache or ParseMemo, or None.
+
+	Returns:
+		A dict with the hits, misses and hit rate, or None.
+	"""
+	if store == None:
+		return None
+
+	total = store.hits + store.misses
+	return {
+		'hits' : store.hits,
+		'misses' : store.misses,
+		'hit_rate' : store.hits / total if total else 0.0
+	}
+
+
+class Daemon:
+	"""
+	Answers the requests of every connection, keeping the caches and the
+	counters they share.
+
+	Attributes:
+		llvm_dir(str): the LLVM directory of requests that don't give one.
+		cache(PreprocessCache): shared by every request, or None.
+		memo(ParseMemo): shared by every request, or None.
+		started(float): when the daemon started (`time.time`).
+		requests(int): how many requests were answered.
+		errors(int): how many of them failed.
+		active(int): how many are being answered right now.
+		latencies(deque): the seconds each of the latest requests took.
+	"""
+	def __init__(self, llvm_dir=None, cache=None, memo=None):
+		"""
+		Constructor.
+
+		Args:
+			llvm_dir(str): the binary directory where LLVM lives, for
+				requests that don't say.
+			cache(PreprocessCache): cache for clang's output, or None.
+			memo(ParseMemo): parse results to reuse, or None.
+		"""
+		self.llvm_dir = llvm_dir
+		self.cache = cache
+		self.memo = memo
+		self.started = time.time()
+		self.requests = 0
+		self.errors = 0
+		self.active = 0
+		self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+		self.__lock = threading.Lock()
+		self.__saved = time.perf_counter()
+
+	def answer(self, message):
+		"""
+		Answers one request.
+
+		Args:
+			message(dict): the decoded request.
+
+		Returns:
+			The response as a dict. Errors are reported in the response
+			instead of being raised.
+		"""
+		start = time.perf_counter()
+
+		# Asking for the stats doesn't count as work
+		counted = message.get('command') != 'stats'
+
+		with self.__lock:
+			self.active += counted
+
+		try:
+			command = message.get('command')
+
+			if command == 'gen':
+				response = self.gen(message)
+			elif command == 'stats':
+				response = self.stats()
+			else:
+				raise Exception(f'Unknown command: {command}')
+
+			response['ok'] = True
+		except Exception as e:
+			response = { 'ok' : False, 'error' : f'{e.__class__.__name__}: {e}' }
+
+		seconds = time.perf_counter() - start
+
+		with self.__lock:
+			self.active -= counted
+
+			if counted:
+				self.requests += 1
+				self.errors += not response['ok']
+				self.latencies.append(seconds)
+
+		return response
+
+	def gen(self, message):
+		"""
+		Generates the bindings of one header.
+
+		Args:
+			message(dict): the request: `header` and optionally `llvm_dir`,
+				`cwd`, `out_file`, `include_dir`, `depfile` and any of
+				`GEN_OPTIONS`.
+
+		Returns:
+			The run's summary (see `batch.run_library`), with the bindings
+			in `text` if the request has no `out_file`.
+		"""
+		import batch # Already imported by `warm_up`
+
+		if 'header' not in message:
+			raise Exception('A gen request needs a header')
+
+		cwd = message.get('cwd', os.getcwd())
+		options = { i : message[i] for i in GEN_OPTIONS if i in message }
+
+		for name in PATH_OPTIONS:
+			if message.get(name) != None:
+				options[name] = os.path.join(cwd, message[name])
+
+		options.setdefault('include_dir', cwd)
+
+		llvm_dir = message.get('llvm_dir', self.llvm_dir)
+		if llvm_dir == None:
+			raise Exception('A gen request needs an llvm_dir')
+
+		temp = None
+		if 'out_file' not in options:
+			handle, temp = tempfile.mkstemp(suffix='.reds')
+			os.close(handle)
+			options['out_file'] = temp
+
+		try:
+			# clang-format looks for the style from the request's folder,
+			# not the daemon's
+			summary = batch.run_library(llvm_dir=llvm_dir, dump_file=None,
+				cache=self.cache, memo=self.memo, style_dir=cwd, **options)
+
+			if temp != None:
+				with open(temp) as file:
+					summary['text'] = file.read()
+				summary['out_file'] = None
+			else:
+				summary['text'] = None
+		finally:
+			if temp != None:
+				os.remove(temp)
+
+		self.save_memo(force=False)
+		return summary
+
+	def stats(self):
+		"""
+		Summarizes what the daemon has done so far.
+
+		Returns:
+			A dict with the uptime, request counts, latency percentiles (in
+			milliseconds, over the latest requests) and cache hit rates.
+		"""
+		with self.__lock:
+			latencies = sorted(self.latencies)
+			stats = {
+				'uptime' : time.time() - self.started,
+				'requests' : self.requests,
+				'errors' : self.errors,
+				'active' : self.active
+			}
+
+		stats['latency_ms'] = {
+			name : 1000.0 * percentile(latencies, fraction)
+			for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+		}
+		stats['latency_ms']['max'] = 1000.0 * (
+			latencies[-1] if latencies else 0.0
+		)
+		stats['cache'] = hit_rate(self.cache)
+		stats['memo'] = hit_rate(self.memo)
+		return stats
+
+	def save_memo(self, force=True):
+		"""
+		Writes the memo back to its file.
+
+		Args:
+			force(bool): write it even if it was written recently.
+		"""
+		if self.memo == None:
+			return
+
+		with self.__lock:
+			now = time.perf_counter()
+			if not force and now - self.__saved < SAVE_INTERVAL:
+				return
+			self.__saved = now
+
+		self.memo.save()
+
+
+class Handler(socketserver.StreamRequestHandler):
+	"""
+	Reads the requests of one connection and writes back the responses.
+	"""
+	def handle(self):
+		"""
+		Answers each line until the client disconnects.
+		"""
+		for line in self.rfile:
+			if line.strip() == b'':
+				continue
+
+			try:
+				message = json.loads(line)
+				if not isinstance(message, dict):
+					raise ValueError('A request has to be a JSON object')
+			except ValueError as e:
+				response = { 'ok' : False, 'error' : f'Bad request: {e}' }
+			else:
+				response = self.server.rgb.answer(message)
+
+			self.wfile.write(json.dumps(response).encode('UTF-8') + b'\n')
+			self.wfile.flush()
+
+
+def stop(signum, frame):
+	"""
+	Stops `serve` the same way Ctrl+C does (for SIGTERM).
+	"""
+	raise KeyboardInterrupt
+
+
+def serve(socket_path=SOCKET_PATH, llvm_dir=None, cache=None, memo=None):
+	"""
+	Answers requests on a Unix domain socket until interrupted or
+	terminated. The memo is saved before exiting.
+
+	Args:
+		socket_path(str): where to create the socket. A socket left over by
+			a daemon that didn't exit cleanly is replaced, but not one that
+			a running daemon is serving on.
+		llvm_dir(str): the LLVM directory of requests that don't give one.
+		cache(PreprocessCache): cache for clang's output, or None.
+		memo(ParseMemo): parse results to reuse, or None.
+	"""
+	if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+		raise Exception('Unix domain sockets are not supported here')
+
+	if os.path.exists(socket_path):
+		# Only a socket that nothing answers on is left over
+		with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+			try:
+				probe.connect(socket_path)
+			except ConnectionRefusedError:
+				os.remove(socket_path)
+			else:
+				raise Exception(
+					f'Another daemon is already serving on {socket_path}'
+				)
+
+	start = time.perf_counter()
+	grammars = warm_up()
+	print(
+		f'Built {grammars} grammars in '
+		f'{time.perf_counter() - start:.3f} seconds'
+	)
+
+	daemon = Daemon(llvm_dir, cache, memo)
+	signal.signal(signal.SIGTERM, stop)
+
+	with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+		server.rgb = daemon
+		server.daemon_threads = True
+		print(f'Serving on {socket_path}')
+
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			daemon.save_memo()
+			os.remove(socket_path)
+
+
+def request(socket_path, message):
+	"""
+	Sends one request to a running daemon and waits for its response.
+
+	Args:
+		socket_path(str): the daemon's socket.
+		message(dict): the request.
+
+	Returns:
+		The response as a dict.
+	"""
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+		client.connect(socket_path)
+		client.sendall(json.dumps(message).encode('UTF-8') + b'\n')
+
+		with client.makefile('rb') as file:
+			line = file.readline()
+
+	if line == b'':
+		raise Exception(f'{socket_path} closed the connection')
+
+	return json.loads(line)
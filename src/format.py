@@ -29,9 +29,24 @@ folder in which format.py is run.
 import sys # command line arguments
 import os # Run OS commands
 import subprocess # Run OS commands and get output as str
+import tempfile # Where clang writes the list of included files
+import threading # Reading clang's output while it is being parsed
+import queue # Handing clang's output over to the parser
+import time # Timing the tools for the profiler
+from profiler import stage, children_cpu # Timing each stage
 
 
-def format_header(header, llvm_dir, includes):
+# How many lines of clang's output can be waiting to be parsed at once. Keeps
+# memory bounded when clang is faster than the parser.
+STREAM_QUEUE_SIZE = 1024
+
+# How many seconds the reader of clang's output waits for room in the queue
+# before checking whether the lines are still wanted
+STREAM_PUT_TIMEOUT = 0.1
+
+
+def format_header(header, llvm_dir, includes, dump_file='out/Output.txt',
+	cache=None, single_pass=False):
 	"""
 	Runs clang on the given header file to obtain pound defines and
 	declarations and then clean up the resulting file.
@@ -42,53 +57,543 @@ def format_header(header, llvm_dir, includes):
 	Args:
 		header (str): The header file to format.
 		includes (str): The path of the folder containing relevant headers.
+		dump_file (str): Where to write the combined output for debugging.
+			Pass None to skip writing it (e.g. when several headers are
+			formatted at the same time).
+		cache (PreprocessCache): if given, reuse the output of a previous
+			run when none of the files involved have changed.
+		single_pass (bool): run clang only once (see `preprocess`).
+	"""
+	return preprocess(header, llvm_dir, includes, dump_file, cache,
+		single_pass)[0]
+
+
+def preprocess(header, llvm_dir, includes, dump_file='out/Output.txt',
+	cache=None, single_pass=False, profiler=None, style_dir=None):
+	"""
+	Same as `format_header`, but also returns every file clang read.
+
+	Normally clang is run twice: once for the declarations and once more with
+	`-dM` for every pound define it knows about. With `single_pass`, clang is
+	run once with `-dD` instead, which leaves each pound define in the output
+	where it was defined. The pound defines are then split from the
+	declarations as the output is read, and just like the declarations, only
+	the ones defined in `header` itself are kept.
+
+	Args:
+		header (str): The header file to format.
+		includes (str): The path of the folder containing relevant headers.
+		dump_file (str): Where to write the combined output for debugging.
+		cache (PreprocessCache): cache of previous runs, or None.
+		single_pass (bool): get the pound defines from the same clang run.
+		profiler (Profiler): times each tool if given.
+		style_dir (str): the folder clang-format runs in, which it looks for
+			its .clang-format from. The current one if None.
+
+	Returns:
+		A tuple of (declarations, dependencies) where dependencies is the
+		list of the header and every file it (transitively) includes.
 	"""
 
+	# Get the LLVM bin dir
+	if llvm_dir[-1] not in '/\\':
+		llvm_dir += '/'
+
+	# Both modes produce different output so they are cached separately
+	variant = 'single_pass' if single_pass else ''
+
+	# Nothing changed since the last run, no need to run clang at all
+	if cache != None:
+		with stage(profiler, 'cache lookup') as record:
+			hit = cache.lookup(header, llvm_dir, includes, variant,
+				style_dir)
+			if hit != None:
+				record['items'] = len(hit[0])
+
+		if hit != None:
+			defines, deps = hit
+			write_dump(dump_file, defines)
+			return defines, deps
+
 	# First delete any previously-generated results:
 	if os.path.exists('out/Output.h'):
 		os.remove('out/Output.h')
 
-	# Get the LLVM bin dir
+	# Clang writes the names of all the files it read to this file
+	dep_handle, dep_file = tempfile.mkstemp(suffix='.d')
+	os.close(dep_handle)
+
+	cmd_line = [
+		f'{llvm_dir}clang', '-I', includes, '-E', header,
+		'-MD', '-MF', dep_file
+	]
+
+	# Keep the pound defines in the output
+	if single_pass:
+		cmd_line.append('-dD')
+
+	try:
+		# Both tools run at the same time, so they can only be timed together
+		with stage(profiler, 'clang | clang-format') as record:
+			# Run clang and get declarations
+			clang = subprocess.Popen(cmd_line, stdout=subprocess.PIPE)
+
+			# Run clang-format and clean up those declarations
+			clang_format = subprocess.Popen([f'{llvm_dir}clang-format', '-style=file'], stdin=clang.stdout,
+					stdout=subprocess.PIPE, cwd=style_dir)
+
+			# Close the pipe
+			clang.stdout.close()
+
+			# Get the cleansed output line by line as clang-format writes it
+			lines = (line.decode('UTF-8') for line in clang_format.stdout)
+			defines, declarations = split_output(lines, header)
+			clang_format.wait()
+
+			if clang.wait() != 0:
+				raise subprocess.CalledProcessError(clang.returncode, cmd_line)
+
+			record['items'] = len(defines) + len(declarations)
+
+		with open(dep_file) as file:
+			deps = read_depfile(file.read())
+	finally:
+		os.remove(dep_file)
+
+	if not single_pass:
+		with stage(profiler, 'clang -dM') as record:
+			# Run clang again with the purpose of obtaining all pound defines
+			defines = pound_defines(header, llvm_dir)
+			record['items'] = len(defines)
+
+	# Combine all the info into one large list
+	defines.extend(declarations)
+
+	with stage(profiler, 'write dump') as record:
+		# Append the defines to the end of the file containing the declarations
+		write_dump(dump_file, defines)
+		record['items'] = len(defines) if dump_file != None else 0
+
+	if cache != None:
+		with stage(profiler, 'cache store') as record:
+			cache.store(header, llvm_dir, includes, deps, defines, variant,
+				style_dir)
+			record['items'] = len(defines)
+
+	# NOTE(Pebaz): To support massive header files without putting every line
+	# into RAM at the same time, use `HeaderStream` instead.
+	return defines, deps
+
+
+def pound_defines(header, llvm_dir):
+	"""
+	Runs clang with `-dM` to get every pound define it knows about.
+
+	Args:
+		header (str): The header file to preprocess.
+		llvm_dir (str): the binary directory where LLVM lives, ending with a
+			slash.
+
+	Returns:
+		A list of pound defines, each ending with a newline.
+	"""
+	cmd_line = [f'{llvm_dir}clang', '-dM', '-E', header]
+	defines = subprocess.check_output(cmd_line).decode('UTF-8')
+	return [i + '\n' for i in defines.split('\n')]
+
+
+def preprocess_unit(header, llvm_dir, includes):
+	"""
+	Runs only clang's preprocessor on the header and returns all of it.
+
+	Unlike `preprocess`, the output is not run through clang-format and the
+	declarations of included files are kept, since a C parser needs every
+	type name that is used to be declared first.
+
+	Args:
+		header (str): The header file to preprocess.
+		llvm_dir (str): the binary directory where LLVM lives.
+		includes (str): The path of the folder containing relevant headers.
+
+	Returns:
+		A tuple of (preprocessed text, dependencies) where dependencies is
+		the list of the header and every file it (transitively) includes.
+	"""
 	if llvm_dir[-1] not in '/\\':
 		llvm_dir += '/'
 
-	# Run clang and get declarations
-	clang = subprocess.Popen([f'{llvm_dir}clang', '-I', includes, '-E', header],
-			stdout=subprocess.PIPE)
+	# Clang writes the names of all the files it read to this file
+	dep_handle, dep_file = tempfile.mkstemp(suffix='.d')
+	os.close(dep_handle)
+
+	cmd_line = [
+		f'{llvm_dir}clang', '-I', includes, '-E', header,
+		'-MD', '-MF', dep_file
+	]
+
+	try:
+		text = subprocess.check_output(cmd_line).decode('UTF-8')
+
+		with open(dep_file) as file:
+			deps = read_depfile(file.read())
+	finally:
+		os.remove(dep_file)
 
-	# Run clang-format and clean up those declarations
-	clang_format = subprocess.Popen([f'{llvm_dir}clang-format', '-style=file'], stdin=clang.stdout,
-			stdout=subprocess.PIPE)
+	return text, deps
 
-	# Close the pipe
-	clang.stdout.close()
 
-	# Get the cleansed output
+def split_output(lines, header):
+	"""
+	Splits the preprocessed output into pound defines and declarations and
+	keeps only the ones that come from `header` itself.
+
+	Args:
+		lines (iterable): lines of clang's preprocessed output.
+		header (str): the header that was preprocessed.
+
+	Returns:
+		A tuple of (defines, declarations), both lists of lines that each end
+		with a newline.
+	"""
+	defines = []
 	declarations = []
+	for is_define, line in iter_output(lines, header):
+		if is_define:
+			defines.append(line)
+		else:
+			declarations.append(line)
+
+	return defines, declarations
+
+
+def iter_output(lines, header):
+	"""
+	Yields the pound defines and declarations that come from `header` itself
+	out of clang's preprocessed output, as they are read.
+
+	Clang marks which file each following line came from with lines such as:
+	`# 12 "header.h" 2`
+
+	Pound defines are only present in the output if clang was run with `-dD`.
+
+	Args:
+		lines (iterable): lines of clang's preprocessed output.
+		header (str): the header that was preprocessed.
+
+	Yields:
+		Tuples of (is_define, line) where line ends with a newline.
+	"""
 	record = False
-	for line in clang_format.communicate()[0].decode('UTF-8').split('\n'):
+	for line in lines:
 		line = line.strip()
-		if line.startswith('#'):
+		if line.startswith('#define'):
+			if record:
+				yield True, line + '\n'
+		elif line.startswith('#undef'):
+			continue
+		elif line.startswith('#'):
 			# Checks to see if the __FILE__ has switched back to `header`
 			# If it has, start recording lines again and stop when __FILE__ is
 			# one of the included headers.
 			record = f'"{header}"' in line
 		elif record and line and not line.startswith('#'):
-			declarations.append(line + '\n')
+			yield False, line + '\n'
 
-	# Run clang again with the purpose of obtaining all pound defines
-	cmd_line = [f'{llvm_dir}clang', '-dM', '-E', header]
-	defines = subprocess.check_output(cmd_line).decode('UTF-8')
-	defines = [i + '\n' for i in defines.split('\n')]
 
-	# Combine all the info into one large list
-	defines.extend(declarations)
+class HeaderStream:
+	"""
+	Iterates over the declarations and pound defines of a header while clang
+	is still producing them.
+
+	This is the streaming version of `preprocess`. Clang-Format's output is
+	read on a separate thread and handed over through a bounded queue, so the
+	caller can parse each line while clang is still running and no more than
+	`STREAM_QUEUE_SIZE` lines are ever waiting in memory.
+
+	Unlike `preprocess`, the declarations come before the pound defines of the
+	`-dM` pass, since that pass only starts once the first one is done.
+
+	Attributes:
+		deps (list): the header and every file it includes. Only filled in
+			once the stream has been fully iterated.
+		count (int): how many lines have been yielded so far.
+	"""
+	def __init__(self, header, llvm_dir, includes, dump_file='out/Output.txt',
+		cache=None, single_pass=False, profiler=None, style_dir=None):
+		"""
+		Constructor.
+
+		Args:
+			header (str): The header file to format.
+			llvm_dir (str): the binary directory where LLVM lives.
+			includes (str): The path of the folder containing relevant headers.
+			dump_file (str): Where to write the lines for debugging, or None.
+			cache (PreprocessCache): cache of previous runs, or None. Note that
+				storing a new entry in it requires keeping every line.
+			single_pass (bool): get the pound defines from the same clang run.
+			profiler (Profiler): times each tool if given. The parser keeps
+				up with the tools, so their wall time overlaps with parsing.
+			style_dir (str): the folder clang-format runs in (see
+				`preprocess`).
+		"""
+		if llvm_dir[-1] not in '/\\':
+			llvm_dir += '/'
+
+		self.header = header
+		self.llvm_dir = llvm_dir
+		self.includes = includes
+		self.dump_file = dump_file
+		self.cache = cache
+		self.single_pass = single_pass
+		self.profiler = profiler
+		self.style_dir = style_dir
+		self.deps = []
+		self.count = 0
+
+	def __iter__(self):
+		"""
+		Runs the tools and yields each line as soon as it is available.
+		"""
+		variant = 'single_pass' if self.single_pass else ''
+
+		# Nothing changed since the last run, no need to run clang at all
+		if self.cache != None:
+			hit = self.cache.lookup(self.header, self.llvm_dir, self.includes,
+				variant, self.style_dir)
+			if hit != None:
+				lines, self.deps = hit
+				write_dump(self.dump_file, lines)
+				self.count = len(lines)
+				yield from lines
+				return
+
+		# The cache needs every line to store them
+		stored = [] if self.cache != None else None
+		dump = None if self.dump_file == None else open(self.dump_file, 'w')
+
+		try:
+			for line in self.__run():
+				if dump != None:
+					dump.write(line)
+				if stored != None:
+					stored.append(line)
+				self.count += 1
+				yield line
+		finally:
+			if dump != None:
+				dump.close()
+
+		if self.cache != None:
+			self.cache.store(self.header, self.llvm_dir, self.includes,
+				self.deps, stored, variant, self.style_dir)
+
+	def __run(self):
+		"""
+		Runs clang and clang-format (and clang again for the pound defines).
+
+		Yields:
+			Each declaration or pound define, ending with a newline.
+		"""
+		llvm_dir = self.llvm_dir
+
+		# Clang writes the names of all the files it read to this file
+		dep_handle, dep_file = tempfile.mkstemp(suffix='.d')
+		os.close(dep_handle)
+
+		cmd_line = [
+			f'{llvm_dir}clang', '-I', self.includes, '-E', self.header,
+			'-MD', '-MF', dep_file
+		]
+
+		# Keep the pound defines in the output
+		if self.single_pass:
+			cmd_line.append('-dD')
+
+		started = time.perf_counter()
+		cpu = children_cpu()
+		finished = [started]
+
+		clang = subprocess.Popen(cmd_line, stdout=subprocess.PIPE)
+		clang_format = subprocess.Popen(
+			[f'{llvm_dir}clang-format', '-style=file'],
+			stdin=clang.stdout,
+			stdout=subprocess.PIPE,
+			cwd=self.style_dir
+		)
+		clang.stdout.close()
+
+		# Bounded so that a fast clang can't fill up the memory
+		lines = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+		# Set once nothing takes lines out of the queue anymore
+		stop = threading.Event()
+
+		def put(item):
+			while not stop.is_set():
+				try:
+					lines.put(item, timeout=STREAM_PUT_TIMEOUT)
+					return
+				except queue.Full:
+					pass
+
+		def reader():
+			try:
+				for line in clang_format.stdout:
+					put(line.decode('UTF-8'))
+			except Exception as e:
+				# Raised again by `received` instead of cutting the output
+				# short without a word
+				put(e)
+			finally:
+				# Signal the end of the output
+				finished[0] = time.perf_counter()
+				put(None)
+
+		def received():
+			for item in iter(lines.get, None):
+				if isinstance(item, Exception):
+					raise item
+				yield item
+
+		thread = threading.Thread(target=reader, daemon=True)
+		thread.start()
+
+		try:
+			for _, line in iter_output(received(), self.header):
+				yield line
+
+			thread.join()
+			clang_format.wait()
+
+			if clang.wait() != 0:
+				raise subprocess.CalledProcessError(clang.returncode, cmd_line)
 
-	# Append the defines to the end of the file containing the declarations
-	with open('out/Output.txt', 'w') as file:
-		file.writelines(defines)
+			if self.profiler != None:
+				self.profiler.add('clang | clang-format', finished[0] - started,
+					children_cpu() - cpu, self.count)
+
+			with open(dep_file) as file:
+				self.deps = read_depfile(file.read())
+		finally:
+			# Stop the tools and the reader if the caller stopped iterating
+			# early
+			stop.set()
+			for process in (clang_format, clang):
+				if process.poll() == None:
+					process.kill()
+
+			thread.join()
+			clang_format.stdout.close()
+			for process in (clang_format, clang):
+				process.wait()
+			os.remove(dep_file)
+
+		if self.single_pass:
+			return
+
+		started = time.perf_counter()
+		cpu = children_cpu()
+		count = self.count
+
+		# Run clang again with the purpose of obtaining all pound defines
+		cmd_line = [f'{llvm_dir}clang', '-dM', '-E', self.header]
+		defines = subprocess.Popen(cmd_line, stdout=subprocess.PIPE)
+
+		try:
+			for line in defines.stdout:
+				yield line.decode('UTF-8').rstrip('\r\n') + '\n'
+
+			if defines.wait() != 0:
+				raise subprocess.CalledProcessError(defines.returncode,
+					cmd_line)
+		finally:
+			if defines.poll() == None:
+				defines.kill()
+			defines.stdout.close()
+			defines.wait()
+
+		if self.profiler != None:
+			self.profiler.add('clang -dM', time.perf_counter() - started,
+				children_cpu() - cpu, self.count - count)
+
+
+def write_dump(dump_file, lines):
+	"""
+	Writes the combined defines and declarations for debugging purposes.
+
+	Args:
+		dump_file (str): the file to write, or None to not write anything.
+		lines (list): the lines to write.
+	"""
+	if dump_file != None:
+		with open(dump_file, 'w') as file:
+			file.writelines(lines)
+
+
+def read_depfile(text):
+	"""
+	Reads the list of files out of a Makefile-style dependency file.
+
+	Clang writes these when given `-MD -MF <file>`:
+
+	calc.o: calc.h C:\\include\\stdio.h \\
+	  C:\\Program\\ Files\\include\\vcruntime.h
+
+	Args:
+		text (str): the contents of the dependency file.
+
+	Returns:
+		A list of absolute paths, in the order clang read them.
+	"""
+
+	# Join all continued lines
+	text = text.replace('\\\r\n', ' ').replace('\\\n', ' ')
+
+	deps = []
+	for line in text.split('\n'):
+
+		# Skip the target (a colon followed by a space, C:\ is not a target)
+		sep = line.find(': ')
+		if sep == -1:
+			continue
+
+		# Spaces inside of file names are escaped with a backslash
+		name = ''
+		chars = line[sep + 1:] + ' '
+		i = 0
+		while i < len(chars):
+			char = chars[i]
+			if char == '\\' and i + 1 < len(chars) and chars[i + 1] == ' ':
+				name += ' '
+				i += 1
+			elif char in ' \t':
+				if name:
+					deps.append(os.path.abspath(name))
+				name = ''
+			else:
+				name += char
+			i += 1
+
+	# Keep the first occurance of every file
+	return list(dict.fromkeys(deps))
+
+
+def write_depfile(path, target, deps):
+	"""
+	Writes a Makefile-style dependency file for a generated file.
+
+	Make and Ninja read these to know that `target` has to be generated again
+	when any of `deps` change.
+
+	Args:
+		path (str): the dependency file to write.
+		target (str): the generated file.
+		deps (list): the header and every file it includes.
+	"""
+	escape = lambda name: name.replace('\\', '/').replace(' ', '\\ ')
 
-	# NOTE(Pebaz): In the future, it may be of concern to support massive
-	# header files by yielding each line in the file rather than putting it all
-	# into RAM at the same time.
-	return defines
+	with open(path, 'w') as file:
+		file.write(escape(target) + ':')
+		for dep in deps:
+			file.write(' \\\n  ' + escape(dep))
+		file.write('\n')
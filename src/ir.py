@@ -0,0 +1,730 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Compact records that hold what each compiler parsed.
+
+A Pyparsing `ParseResults` keeps every token along with names, positions and
+nested results, which is a lot to hold on to for every declaration until the
+whole header has been generated. As soon as a declaration is parsed, its
+tokens are moved into one of these records (slotted, so they have no `__dict__`)
+and the `ParseResults` is dropped. Identifiers and type names are interned
+since the same few of them are repeated throughout a header.
+
+Lists that are split (parameters, enum values) are kept as one interned tuple
+with a `TokenSpan` over it for each part, instead of a tuple per part.
+
+Each record documents the shape of its tokens. `from_tokens()` creates the
+record from them, whether they are the `ParseResults` of a grammar or the
+nested lists that the parse memo stores and the other backends hand over.
+`tokens()` turns the record back into those nested lists.
+"""
+
+import sys # Interning strings
+from red_utils import TokenSpan # Views of token lists
+
+
+def interned(value):
+	"""
+	Interns a single token, which can be missing.
+
+	Args:
+		value(str): the token or None.
+
+	Returns:
+		The interned string or None.
+	"""
+	return None if value == None else sys.intern(str(value))
+
+
+def names(tokens):
+	"""
+	Interns each token.
+
+	Args:
+		tokens(iterable): strings.
+
+	Returns:
+		A tuple of the interned strings.
+	"""
+	return tuple(sys.intern(str(i)) for i in tokens)
+
+
+def groups(tokens):
+	"""
+	Interns a flat list of tokens and splits it on commas.
+
+	Args:
+		tokens(iterable): the tokens of a parameter list or the like.
+
+	Returns:
+		A tuple of `TokenSpan`s that all share one tuple of tokens.
+	"""
+	return tuple(TokenSpan(names(tokens)).split(','))
+
+
+def joined(groups):
+	"""
+	Turns groups back into a flat list of tokens separated by commas.
+
+	Args:
+		groups(tuple): as returned by `groups`.
+
+	Returns:
+		The list of tokens.
+	"""
+	tokens = []
+	for i, group in enumerate(groups):
+		if i > 0:
+			tokens.append(',')
+		tokens.extend(group)
+
+	return tokens
+
+
+class Function:
+	"""
+	A function declaration.
+
+	Its tokens are `[[return type..., name], [parameters...]]` with the
+	parameters separated by commas, such as
+	`[['float', 'add'], ['float', 'x', ',', 'float', 'y']]`.
+
+	Attributes:
+		name(str): the name of the function.
+		returns(TokenSpan): the tokens of the return type.
+		params(tuple): a `TokenSpan` of each parameter ('void' and '...'
+			included).
+	"""
+	__slots__ = ('name', 'returns', 'params')
+
+	def __init__(self, name, returns, params):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the name of the function.
+			returns(TokenSpan): the tokens of the return type.
+			params(tuple): a `TokenSpan` of each parameter.
+		"""
+		self.name = name
+		self.returns = returns
+		self.params = params
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Splits the name off of the return type and the parameters on their
+		commas. The return type and the name share one tuple.
+
+		Args:
+			tokens: the tokens of the function.
+
+		Returns:
+			The `Function`.
+		"""
+		signature = names(tokens[0])
+		returns = TokenSpan(signature, 0, len(signature) - 1)
+		return cls(signature[-1], returns, groups(tokens[1]))
+
+	def tokens(self):
+		"""
+		Returns:
+			The tokens of the function, with commas between the parameters
+			again.
+		"""
+		return [list(self.returns) + [self.name], joined(self.params)]
+
+
+class FuncPtr:
+	"""
+	A function pointer typedef, `typedef void (*name)(parameters);`.
+
+	Its tokens are `[name, [parameters...]]` with the parameters separated by
+	commas. The return type isn't kept.
+
+	Attributes:
+		name(str): the name of the typedef.
+		params(tuple): a `TokenSpan` of each parameter.
+	"""
+	__slots__ = ('name', 'params')
+
+	def __init__(self, name, params):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the name of the typedef.
+			params(tuple): a `TokenSpan` of each parameter.
+		"""
+		self.name = name
+		self.params = params
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Splits the parameters of a function pointer on their commas.
+
+		Args:
+			tokens: the tokens of the function pointer.
+
+		Returns:
+			The `FuncPtr`.
+		"""
+		return cls(interned(tokens[0]), groups(tokens[1]))
+
+	def tokens(self):
+		"""
+		Returns:
+			The name and the parameters, separated by commas again.
+		"""
+		return [self.name, joined(self.params)]
+
+
+class Macro:
+	"""
+	A function-like macro, `#define name(parameters) ...`. Its body isn't
+	kept since Red/System can't use it as it is.
+
+	Its tokens are `[name, [parameters...]]` with the parameters separated by
+	commas, each parameter being a single name.
+
+	Attributes:
+		name(str): the name of the macro.
+		params(tuple): a `TokenSpan` of each parameter.
+	"""
+	__slots__ = ('name', 'params')
+
+	def __init__(self, name, params):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the name of the macro.
+			params(tuple): a `TokenSpan` of each parameter.
+		"""
+		self.name = name
+		self.params = params
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Splits the parameters of a macro on their commas.
+
+		Args:
+			tokens: the tokens of the macro.
+
+		Returns:
+			The `Macro`.
+		"""
+		return cls(interned(tokens[0]), groups(tokens[1]))
+
+	def tokens(self):
+		"""
+		Returns:
+			The name and the parameters of the macro, separated by commas
+			again.
+		"""
+		return [self.name, joined(self.params)]
+
+
+class Define:
+	"""
+	A pound define, kept as tokens since what it means is only figured out
+	when it is generated.
+
+	Its tokens are flat: `['#define', name, value...]`, where the value can
+	be missing or be any number of tokens (parentheses included).
+
+	Attributes:
+		values(tuple): '#define', the name and the tokens of the value.
+	"""
+	__slots__ = ('values',)
+
+	def __init__(self, values):
+		"""
+		Constructor.
+
+		Args:
+			values(tuple): the interned tokens of the pound define.
+		"""
+		self.values = values
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Interns the tokens of a pound define, which are kept as they are.
+
+		Args:
+			tokens: the tokens of the pound define.
+
+		Returns:
+			The `Define`.
+		"""
+		return cls(names(tokens))
+
+	def tokens(self):
+		"""
+		Returns:
+			The tokens of the pound define as a list.
+		"""
+		return list(self.values)
+
+
+class Typedef:
+	"""
+	A typedef of anything but a function pointer.
+
+	Its tokens are flat: the words and `*`s of the type followed by the new
+	name, such as `['DWORD', '*', 'LPDWORD']`. A typedef of a struct starts
+	with `'struct'` and the struct's name.
+
+	Attributes:
+		name(str): the new name.
+		type(tuple): the tokens of the type it stands for. Empty when the
+			grammar could only read a name.
+	"""
+	__slots__ = ('name', 'type')
+
+	def __init__(self, name, type):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the new name.
+			type(tuple): the tokens of the type it stands for.
+		"""
+		self.name = name
+		self.type = type
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Takes the last token of a typedef as its name and the others as its
+		type.
+
+		Args:
+			tokens: the tokens of the typedef.
+
+		Returns:
+			The `Typedef`.
+		"""
+		values = names(tokens)
+		return cls(values[-1], values[:-1])
+
+	def tokens(self):
+		"""
+		Returns:
+			The type followed by the name.
+		"""
+		return list(self.type) + [self.name]
+
+
+class GlobalVar:
+	"""
+	An extern variable.
+
+	Its tokens are flat like those of a `Typedef`: the words and `*`s of the
+	type followed by the name of the variable.
+
+	Attributes:
+		name(str): the name of the variable.
+		type(tuple): the tokens of its type.
+	"""
+	__slots__ = ('name', 'type')
+
+	def __init__(self, name, type):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the name of the variable.
+			type(tuple): the tokens of its type.
+		"""
+		self.name = name
+		self.type = type
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Takes the last token of a variable as its name and the others as its
+		type.
+
+		Args:
+			tokens: the tokens of the variable.
+
+		Returns:
+			The `GlobalVar`.
+		"""
+		values = names(tokens)
+		return cls(values[-1], values[:-1])
+
+	def tokens(self):
+		"""
+		Returns:
+			The type followed by the name.
+		"""
+		return list(self.type) + [self.name]
+
+
+class EnumMember:
+	"""
+	One of the values of an enum. It has no tokens of its own, its `Enum`
+	makes it from a group of the enum's tokens.
+
+	Attributes:
+		name(str): the name of the value.
+		value(TokenSpan): the tokens of the value it is set to, or None.
+	"""
+	__slots__ = ('name', 'value')
+
+	def __init__(self, name, value):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the name of the value.
+			value(TokenSpan): the tokens after its `=`, or None if it has no
+				`=`.
+		"""
+		self.name = name
+		self.value = value
+
+	def tokens(self):
+		"""
+		Returns:
+			The name, followed by `': '` and the tokens of the value if it is
+			set.
+		"""
+		if self.value == None:
+			return [self.name]
+
+		return [self.name, ': '] + list(self.value)
+
+
+class Enum:
+	"""
+	An enum.
+
+	Its tokens are `[name, [values...]]` where the values are separated by
+	commas and each one is its name, optionally followed by `': '` (what the
+	grammar turns `=` into) and the tokens it is set to, such as
+	`['Mode', ['A', ',', 'B', ': ', '4']]`.
+
+	Attributes:
+		name(str): the name of the enum.
+		members(tuple): an `EnumMember` for each value.
+	"""
+	__slots__ = ('name', 'members')
+
+	def __init__(self, name, members):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the name of the enum.
+			members(tuple): an `EnumMember` for each value.
+		"""
+		self.name = name
+		self.members = members
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Makes an `EnumMember` of each group of values, all of them sharing
+		one tuple of tokens.
+
+		Args:
+			tokens: the tokens of the enum.
+
+		Returns:
+			The `Enum`.
+		"""
+		members = []
+
+		# A trailing comma leaves an empty group
+		for group in groups(tokens[1]):
+			if len(group) > 0:
+				value = group[2:] if len(group) > 1 else None
+				members.append(EnumMember(group[0], value))
+
+		return cls(interned(tokens[0]), tuple(members))
+
+	def tokens(self):
+		"""
+		Returns:
+			The name and the values, separated by commas again.
+		"""
+		return [self.name, joined(i.tokens() for i in self.members)]
+
+
+class StructField:
+	"""
+	A field of a struct.
+
+	Its tokens are its attributes in order:
+	`[name, type, pointers, record, note, array, bits]`.
+
+	Attributes:
+		name(str): the name of the field, or None for the padding between
+			bit fields (`int : 4`).
+		type(str): its type as a single word (the name of the struct if it
+			is one).
+		pointers(int): how many pointers (and array dimensions) it has.
+		record(bool): whether the type is a struct.
+		note(str): the C declaration, for fields that Red/System can't
+			represent exactly, or None.
+		array(tuple): the dimension of each of its arrays as written, e.g.
+			`('4', 'MAX')`.
+		bits(int): its width if it is a bit field, -1 if the width isn't a
+			number, or None if it isn't a bit field.
+	"""
+	__slots__ = ('name', 'type', 'pointers', 'record', 'note', 'array',
+		'bits')
+
+	def __init__(self, name, type, pointers, record=False, note=None,
+		array=(), bits=None):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the name of the field.
+			type(str): its type as a single word.
+			pointers(int): how many pointers (and array dimensions) it has.
+			record(bool): whether the type is a struct.
+			note(str): what to write next to the field, or None.
+			array(tuple): the dimension of each array.
+			bits(int): its width if it is a bit field.
+		"""
+		self.name = name
+		self.type = type
+		self.pointers = pointers
+		self.record = record
+		self.note = note
+		self.array = array
+		self.bits = bits
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Args:
+			tokens: the tokens of the field.
+
+		Returns:
+			The `StructField`.
+		"""
+		name, type, pointers, record, note, array, bits = tokens
+		return cls(interned(name), interned(type), pointers, record, note,
+			names(array), bits)
+
+	def tokens(self):
+		"""
+		Returns:
+			The attributes of the field as a list.
+		"""
+		return [self.name, self.type, self.pointers, self.record, self.note,
+			list(self.array), self.bits]
+
+
+def members_from_tokens(tokens):
+	"""
+	Makes the members of a struct or union from their tokens.
+
+	Args:
+		tokens: the tokens of each member (see `Struct`).
+
+	Returns:
+		A tuple of `Struct`s, `Union`s and tuples of `StructField`s.
+	"""
+	members = []
+
+	for kind, *values in tokens:
+		if kind == 'struct':
+			members.append(Struct.from_tokens(values))
+		elif kind == 'union':
+			members.append(Union.from_tokens(values))
+		else:
+			members.append(tuple(
+				StructField.from_tokens(i) for i in values[0]
+			))
+
+	return tuple(members)
+
+
+def members_tokens(members):
+	"""
+	Turns the members of a struct or union back into tokens.
+
+	Args:
+		members(tuple): as in `Struct`.
+
+	Returns:
+		The tokens of each member.
+	"""
+	result = []
+
+	for i in members:
+		if isinstance(i, Struct):
+			result.append(['struct'] + i.tokens())
+		elif isinstance(i, Union):
+			result.append(['union'] + i.tokens())
+		else:
+			result.append(['fields', [field.tokens() for field in i]])
+
+	return result
+
+
+class Struct:
+	"""
+	A struct.
+
+	Its tokens are `[name, [members...]]` where each member is either
+	`['struct', name, [members...]]` for a nested struct,
+	`['union', name, [members...], pointers, note]` for a nested union (see
+	`Union`) or `['fields', [field tokens...]]` for a declaration of fields
+	(see `StructField`).
+
+	Attributes:
+		name(str): the name of the struct.
+		members(tuple): for each nested struct, its `Struct`, for each
+			nested union, its `Union` and for each declaration of fields, a
+			tuple of its `StructField`s.
+	"""
+	__slots__ = ('name', 'members')
+
+	def __init__(self, name, members):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the name of the struct, or None for a nested struct
+				without a tag or a declarator.
+			members(tuple): its nested `Struct`s and `Union`s and tuples of
+				`StructField`s, in order.
+		"""
+		self.name = name
+		self.members = members
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Makes a `Struct` of each nested struct, a `Union` of each nested
+		union and a tuple of `StructField`s of each declaration of fields.
+
+		Args:
+			tokens: the tokens of the struct.
+
+		Returns:
+			The `Struct`.
+		"""
+		return cls(interned(tokens[0]), members_from_tokens(tokens[1]))
+
+	def tokens(self):
+		"""
+		Returns:
+			The name and the tokens of each member.
+		"""
+		return [self.name, members_tokens(self.members)]
+
+
+class Union:
+	"""
+	A union nested in a struct. Red/System has no unions, so it is only laid
+	out when it is generated, once the sizes of the types it uses are known.
+
+	Its tokens are `[name, [members...], pointers, note]`, with the members
+	as in `Struct`.
+
+	Attributes:
+		name(str): the name of its field, or None if it has no declarator.
+		members(tuple): as in `Struct`.
+		pointers(int): how many pointers (and array dimensions) its field
+			has.
+		note(str): its C code.
+	"""
+	__slots__ = ('name', 'members', 'pointers', 'note')
+
+	def __init__(self, name, members, pointers, note):
+		"""
+		Constructor.
+
+		Args:
+			name(str): the name of its field, or None.
+			members(tuple): as in `Struct`.
+			pointers(int): how many pointers its field has.
+			note(str): its C code.
+		"""
+		self.name = name
+		self.members = members
+		self.pointers = pointers
+		self.note = note
+
+	@classmethod
+	def from_tokens(cls, tokens):
+		"""
+		Args:
+			tokens: the tokens of the union.
+
+		Returns:
+			The `Union`.
+		"""
+		name, members, pointers, note = tokens
+		return cls(interned(name), members_from_tokens(members), pointers,
+			note)
+
+	def tokens(self):
+		"""
+		Returns:
+			The name, the tokens of each member, the pointers and the note.
+		"""
+		return [self.name, members_tokens(self.members), self.pointers,
+			self.note]
+
+
+# Kind of declaration (see `compilers`) -> the record its parse results are
+# kept in
+RECORDS = {
+	'Function' : Function,
+	'FuncPtr' : FuncPtr,
+	'Macro' : Macro,
+	'PoundDefine' : Define,
+	'Typedef' : Typedef,
+	'GlobalVar' : GlobalVar,
+	'Enum' : Enum,
+	'Struct' : Struct
+}
+
+
+def compact(kind, tokens):
+	"""
+	Creates the record of a compiler from its parse results.
+
+	Args:
+		kind(str): the `KIND` of the compiler.
+		tokens: a `ParseResults` or the same tokens as nested lists (or the
+			text of a struct).
+
+	Returns:
+		The record.
+	"""
+	return RECORDS[kind].from_tokens(tokens)
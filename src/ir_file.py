@@ -0,0 +1,227 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Saves parsed declarations so that they can be generated again without
+running clang or parsing anything.
+
+Trying a different output option shouldn't mean preprocessing and parsing the
+whole header again, so `gen --emit-ir` writes what every compiler parsed to an
+IR file and `gen --from-ir` only runs the generate stage from it.
+
+Layout of the file (all integers are little endian):
+
+	magic        8 bytes, b'RGBIR\0\0\0'
+	version      u32, FORMAT_VERSION
+	count        u32, how many declarations there are
+	meta_size    u32, size of the metadata
+	meta         JSON object: the grammar version and the name of each kind
+	kinds        count x u8, index of each declaration's kind in the metadata
+	(padding up to a multiple of 8)
+	table        count x (u64 offset, u64 size) of each declaration's data
+	data         for each declaration, the JSON list [line, tokens]
+
+The declarations are in the order they are generated in, so they can be read
+one after the other. The offset table lets any of them be read by itself
+straight out of a memory map without decoding the others.
+"""
+
+import os # Replacing the file atomically
+import json # Metadata and declarations
+import mmap # Reading without loading the whole file
+import struct # Header and offset table
+import compilers # Recreating the compilers
+from rgb import SECTIONS, IMPORT_SECTIONS # The order to write them in
+
+
+MAGIC = b'RGBIR\0\0\0'
+
+# Changes whenever the layout of the file or the names of the kinds change
+FORMAT_VERSION = 2
+
+HEADER = struct.Struct('<8sIII')
+ENTRY = struct.Struct('<QQ')
+
+# Every kind of compiler, in the order they are generated in
+KINDS = SECTIONS + IMPORT_SECTIONS
+
+
+def write(path, results):
+	"""
+	Writes parsed compilers to an IR file.
+
+	Args:
+		path(str): the IR file to write.
+		results(list): compilers that have their parse result.
+	"""
+	# Imported here since it imports Pyparsing
+	from parse_utils import GRAMMAR_VERSION
+
+	# Sorting is stable so each kind stays in the order it was declared in
+	results = sorted(results, key=lambda i: KINDS.index(i.KIND))
+
+	meta = json.dumps({
+		'grammar' : GRAMMAR_VERSION,
+		'kinds' : KINDS
+	}).encode('UTF-8')
+
+	kinds = bytes(KINDS.index(i.KIND) for i in results)
+	data = [
+		json.dumps([i.line, i.result.tokens()]).encode('UTF-8')
+		for i in results
+	]
+
+	start = HEADER.size + len(meta) + len(kinds)
+	start += -start % 8
+	offset = start + ENTRY.size * len(data)
+
+	table = bytearray()
+	for i in data:
+		table += ENTRY.pack(offset, len(i))
+		offset += len(i)
+
+	temp = path + '.tmp'
+	with open(temp, 'wb') as file:
+		file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(data), len(meta)))
+		file.write(meta)
+		file.write(kinds)
+		file.write(b'\0' * (start - HEADER.size - len(meta) - len(kinds)))
+		file.write(table)
+		for i in data:
+			file.write(i)
+
+	os.replace(temp, path)
+
+
+class IRFile:
+	"""
+	An IR file opened as a memory map.
+
+	Meant to be used as a context manager:
+
+		with IRFile('calc.rgbir') as ir_file:
+			results = list(ir_file)
+
+	Attributes:
+		path(str): the IR file.
+		kinds(tuple): the kind of compiler of each declaration.
+	"""
+	def __init__(self, path):
+		"""
+		Constructor.
+
+		Args:
+			path(str): the IR file to read.
+		"""
+		self.path = path
+		self.kinds = ()
+		self.__file = None
+		self.__map = None
+		self.__table = 0
+
+	def __enter__(self):
+		"""
+		Maps the file and checks that it can be read.
+		"""
+		# Imported here since it imports Pyparsing
+		from parse_utils import GRAMMAR_VERSION
+
+		self.__file = open(self.path, 'rb')
+
+		try:
+			# Too short to be one (and empty files can't even be mapped)
+			if os.fstat(self.__file.fileno()).st_size < HEADER.size:
+				raise Exception(f'{self.path} is not an IR file')
+
+			self.__map = mmap.mmap(self.__file.fileno(), 0,
+				access=mmap.ACCESS_READ)
+
+			magic, version, count, meta_size = HEADER.unpack_from(self.__map)
+
+			if magic != MAGIC:
+				raise Exception(f'{self.path} is not an IR file')
+
+			if version != FORMAT_VERSION:
+				raise Exception(
+					f'{self.path} has version {version} of the IR format '
+					f'instead of {FORMAT_VERSION}, emit it again'
+				)
+
+			start = HEADER.size + meta_size
+			self.__table = start + count + (-(start + count) % 8)
+
+			# A truncated file can't even hold the offset table
+			if len(self.__map) < self.__table + ENTRY.size * count:
+				raise Exception(f'{self.path} is truncated, emit it again')
+
+			meta = json.loads(self.__map[HEADER.size:start])
+
+			if meta['grammar'] != GRAMMAR_VERSION:
+				raise Exception(
+					f'{self.path} was parsed by another version of the '
+					'grammars, emit it again'
+				)
+
+			self.kinds = tuple(
+				meta['kinds'][i] for i in self.__map[start:start + count]
+			)
+
+		except Exception:
+			self.__exit__()
+			raise
+
+		return self
+
+	def __exit__(self, *error):
+		"""
+		Unmaps and closes the file.
+		"""
+		if self.__map != None:
+			self.__map.close()
+
+		self.__file.close()
+
+	def __len__(self):
+		"""
+		Gets how many declarations there are.
+		"""
+		return len(self.kinds)
+
+	def __getitem__(self, index):
+		"""
+		Recreates the compiler of a declaration.
+
+		Args:
+			index(int): which declaration.
+
+		Returns:
+			The compiler, with its parse result.
+		"""
+		if not 0 <= index < len(self.kinds):
+			raise IndexError(index)
+
+		offset, size = ENTRY.unpack_from(self.__map,
+			self.__table + ENTRY.size * index)
+		line, tokens = json.loads(self.__map[offset:offset + size])
+
+		return compilers.handed_over(self.kinds[index], line, tokens)
@@ -32,17 +32,31 @@ This program has multiple stages:
    in a Red program by simply importing the "header" file.
 """
 
-import os # Basename
-import fire # CLI framework
-import format # Launching the formatter
-from rgb import RGB # RGB compiler class
+import sys # Command line arguments
+import os # Current directory for requests to a server
+import ast # Parsing argument values the way Fire does
+import time # Timing batches
+import batch # Running the whole pipeline for one or more libraries
+from cache import PreprocessCache # Skipping clang for unchanged headers
+from memo import ParseMemo # Skipping parsing for unchanged declarations
+from profiler import Profiler, profile_path # Timing each stage
+
+
+# Values with these are lists, tuples, dicts or sets to Fire, which turns
+# the bare words in them into strings, so they are left to Fire
+CONTAINER_CHARS = '[({,'
 
 class CLI:
 	"""
 	Red Generator of Bindings's command line interface.
 	"""
 	def gen(self, header, llvm_dir, dynlib=None, out_file=None,
-		call_con='cdecl', include_dir='.', debug=False):
+		call_con='cdecl', include_dir='.', debug=False, jobs=1,
+		cache_dir=None, memo_file=None, depfile=None,
+		skip_if_up_to_date=False, single_pass=False, stream=False,
+		profile=False, slowest=10, backend='pyparsing', server=None,
+		emit_ir=None, from_ir=None, include_symbols=None,
+		exclude_symbols=None, reachable_from=None):
 		"""
 		Generate a Red/System binding file from the given header input.
 
@@ -54,19 +68,346 @@ class CLI:
 			call_con(str): the calling convention of the library
 			include_dir(str): where other include files are, same as C
 			debug(bool): whether verbose debugging should occur
+			jobs(int): how many processes to parse with (large headers only)
+			cache_dir(str): cache clang's output here to skip it next time
+			memo_file(str): remember parse results here to skip them next time
+			depfile(str): write a Makefile-style dependency file here
+			skip_if_up_to_date(bool): do nothing if no input has changed
+			single_pass(bool): run clang once, keeping only the header's
+				own pound defines
+			stream(bool): parse while clang runs, using flat memory
+			profile(bool): print the time spent in each stage and write it to
+				<out_file>.profile.json
+			slowest(int): how many of the slowest declarations to profile
+			backend(str): 'pyparsing' (line by line), 'pycparser' (whole
+				translation unit at once) or 'clang' (clang's own AST)
+			server(str): socket of a running `serve` to do the work instead,
+				which uses its own cache and memo (profile and stream are
+				not available)
+			emit_ir(str): also save the parsed declarations to this IR file
+			from_ir(str): generate from this IR file (written by --emit-ir)
+				instead of preprocessing and parsing the header again
+			include_symbols: only generate the declarations named like this
+				glob, `re:` regular expression or list of them
+			exclude_symbols: never generate the declarations named like
+				these patterns
+			reachable_from: generate the declarations named like these
+				patterns and everything they depend on, without parsing the
+				rest of the header (not available with stream)
 		"""
-		# Clean up the header file and obtain all declarations/pound defines
-		declarations = format.format_header(header, llvm_dir, include_dir)
+		if server != None:
+			# The server keeps its own cache and memo
+			summary = remote_gen(server, header, llvm_dir, dynlib, out_file,
+				call_con=call_con, include_dir=include_dir, jobs=jobs,
+				depfile=depfile, skip_if_up_to_date=skip_if_up_to_date,
+				single_pass=single_pass, backend=backend, emit_ir=emit_ir,
+				from_ir=from_ir, include_symbols=include_symbols,
+				exclude_symbols=exclude_symbols, reachable_from=reachable_from)
+			memo = profiler = None
+		else:
+			cache = None if cache_dir == None else PreprocessCache(cache_dir)
+			memo = None if memo_file == None else ParseMemo(memo_file)
+			profiler = Profiler(slowest) if profile else None
+
+			summary = batch.run_library(header, llvm_dir, dynlib, out_file,
+				call_con, include_dir, jobs=jobs, cache=cache, memo=memo,
+				depfile=depfile, skip_if_up_to_date=skip_if_up_to_date,
+				single_pass=single_pass, stream=stream, profiler=profiler,
+				backend=backend, emit_ir=emit_ir, from_ir=from_ir,
+				include_symbols=include_symbols,
+				exclude_symbols=exclude_symbols, reachable_from=reachable_from)
+
+		if summary['skipped']:
+			print(f'{summary["out_file"]} is up to date')
+			return
+
+		if not summary['changed']:
+			print(f'{summary["out_file"]} is unchanged')
+
+		if debug:
+			for name, count in summary['counters'].items():
+				print(f'{name:>14}: {count}')
+
+		if profiler != None:
+			profiler.report()
+			profiler.save(profile_path(summary['out_file']))
+
+		if memo != None:
+			memo.save()
+			memo.report()
+
+	def serve(self, llvm_dir=None, socket_path=None, cache_dir=None,
+		memo_file=None):
+		"""
+		Keep RGB running and generate bindings for requests sent over a Unix
+		domain socket (see `daemon` for the protocol and `gen --server`).
+
+		Args:
+			llvm_dir(str): the binary directory where LLVM lives, for
+				requests that don't say
+			socket_path(str): where to create the socket (.rgb.sock)
+			cache_dir(str): cache clang's output here for every request
+			memo_file(str): remember parse results here for every request
+		"""
+		import daemon # Only imported when used
+
+		cache = None if cache_dir == None else PreprocessCache(cache_dir)
+		memo = None if memo_file == None else ParseMemo(memo_file)
+		daemon.serve(socket_path or daemon.SOCKET_PATH, llvm_dir, cache, memo)
+
+	def stats(self, socket_path=None):
+		"""
+		Print what a running `serve` has done so far.
+
+		Args:
+			socket_path(str): the server's socket (.rgb.sock)
+		"""
+		import daemon # Only imported when used
+
+		stats = daemon.request(socket_path or daemon.SOCKET_PATH,
+			{ 'command' : 'stats' })
+		if not stats['ok']:
+			raise Exception(stats['error'])
+
+		latency = stats['latency_ms']
+		print(f'Uptime:   {stats["uptime"]:.0f} seconds')
+		print(
+			f'Requests: {stats["requests"]} ({stats["errors"]} failed, '
+			f'{stats["active"]} in progress)'
+		)
+		print(
+			f'Latency:  p50 {latency["p50"]:.1f} ms, p90 {latency["p90"]:.1f} '
+			f'ms, p99 {latency["p99"]:.1f} ms, max {latency["max"]:.1f} ms'
+		)
+
+		for name in ('cache', 'memo'):
+			if stats[name] != None:
+				print(
+					f'{name.capitalize() + ":":<10}{stats[name]["hits"]} hits, '
+					f'{stats[name]["misses"]} misses '
+					f'({100.0 * stats[name]["hit_rate"]:.1f}% hit rate)'
+				)
+
+	def batch(self, manifest, llvm_dir, workers=1, cache_dir=None,
+		memo_file=None, skip_if_up_to_date=False, single_pass=False,
+		stream=False, backend='pyparsing', shared_file=None):
+		"""
+		Generate Red/System binding files for every library in a manifest.
+
+		All libraries are handled by this one process so that the imports and
+		grammars are only set up once. See `batch.load_manifest` for the
+		layout of the manifest file.
+
+		Args:
+			manifest(str): JSON file listing each library to generate.
+			llvm_dir(str): the binary directory where LLVM lives
+			workers(int): how many libraries to generate at the same time
+			cache_dir(str): cache clang's output here to skip it next time
+			memo_file(str): remember parse results here to skip them next time
+			skip_if_up_to_date(bool): skip libraries whose inputs didn't change
+			single_pass(bool): run clang once per library, keeping only each
+				header's own pound defines
+			stream(bool): parse while clang runs, using flat memory
+			backend(str): 'pyparsing' (line by line), 'pycparser' (whole
+				translation unit at once) or 'clang' (clang's own AST)
+			shared_file(str): write the declarations that several libraries
+				have in common to this module, which the other files include
+				(see `shared`). Only works with the default backend, without
+				streaming, skipping up to date libraries or picking symbols.
+		"""
+		start = time.perf_counter()
+		cache = None if cache_dir == None else PreprocessCache(cache_dir)
+		memo = None if memo_file == None else ParseMemo(memo_file)
+
+		jobs = batch.load_manifest(manifest)
+
+		if shared_file != None:
+			if stream or skip_if_up_to_date or backend != 'pyparsing':
+				raise Exception(
+					'A shared file cannot be used with --stream, '
+					'--skip-if-up-to-date or another backend'
+				)
+
+			if any(i in job for job in jobs for i in batch.SYMBOL_OPTIONS):
+				raise Exception(
+					'A shared file cannot be used when picking symbols'
+				)
+
+			# Only imported when used
+			import shared
+
+			summaries, totals = shared.run_shared(jobs, llvm_dir, shared_file,
+				workers, cache, memo, single_pass)
+			batch.print_summary(summaries, time.perf_counter() - start)
+			shared.print_totals(shared_file, totals)
+		else:
+			summaries = batch.run_batch(jobs, llvm_dir, workers, cache=cache,
+				memo=memo, skip_if_up_to_date=skip_if_up_to_date,
+				single_pass=single_pass, stream=stream, backend=backend)
+			batch.print_summary(summaries, time.perf_counter() - start)
+
+		if memo != None:
+			memo.save()
+			memo.report()
+
+
+def remote_gen(server, header, llvm_dir, dynlib=None, out_file=None,
+	**options):
+	"""
+	Has a running `serve` generate the bindings of a header, as if
+	`batch.run_library` had been called.
+
+	Args:
+		server(str): the server's socket.
+		header(str): the header to parse.
+		llvm_dir(str): the binary directory where LLVM lives.
+		dynlib(str): the dynamic library target, used in the outfile.
+		out_file(str): the path/name.ext of the output file.
+		options: any other option of the server's gen requests
+			(see `daemon.Daemon.gen`).
+
+	Returns:
+		The summary of the run (see `batch.run_library`).
+	"""
+	# Only imported when used
+	import daemon
+
+	# The server writes the file itself, relative to our directory
+	out_file = batch.output_names(header, dynlib, out_file)[1]
+
+	response = daemon.request(server, dict(options, command='gen',
+		cwd=os.getcwd(), header=header, llvm_dir=llvm_dir, dynlib=dynlib,
+		out_file=out_file))
+
+	if not response['ok']:
+		raise Exception(response['error'])
+
+	return response
+
+
+def parse_value(text):
+	"""
+	Turns a command line value into a Python value the way Fire would, for
+	values without any of `CONTAINER_CHARS`.
+
+	Args:
+		text(str): the value as it was typed.
+
+	Returns:
+		The Python literal it spells (int, float, bool, None, ...) or the
+		text itself if it isn't one, such as a bare word.
+	"""
+	try:
+		node = ast.parse(text, mode='eval').body
+	except SyntaxError:
+		return text
+
+	# Fire keeps arithmetic such as `1-2` as it is
+	if isinstance(node, ast.BinOp):
+		return text
+
+	# Bare words are strings to Fire (`#` starts a comment)
+	if isinstance(node, ast.Name) and node.id not in ('True', 'False', 'None'):
+		return node.id
+
+	try:
+		return ast.literal_eval(node)
+	except ValueError:
+		return text
+
+
+def parse_command(cli, argv):
+	"""
+	Reads a simple command line such as:
+
+		gen calc.h C:/LLVM/bin --out-file calc.reds --jobs=4 --debug
+
+	Only a command followed by its positional arguments and then `--name`,
+	`--name value` or `--name=value` flags is understood. Anything else
+	(`--help`, unknown commands or flags, lists, ...) is left to Fire.
+
+	Args:
+		cli(CLI): the object whose methods are the commands.
+		argv(list): the command line arguments, without the program name.
+
+	Returns:
+		A tuple of (method, args, kwargs), or None if the command line needs
+		Fire to be understood.
+	"""
+	if len(argv) == 0 or argv[0].startswith('_') or not hasattr(cli, argv[0]):
+		return None
+
+	method = getattr(cli, argv[0])
+	code = method.__code__
+	names = code.co_varnames[1:code.co_argcount]
+	required = len(names) - len(method.__defaults__ or ())
+
+	args = []
+	kwargs = {}
+	rest = argv[1:]
+
+	if any(i in CONTAINER_CHARS for i in ''.join(argv[1:])):
+		return None
+
+	while len(rest) > 0 and not rest[0].startswith('-'):
+		args.append(parse_value(rest.pop(0)))
+
+	while len(rest) > 0:
+		flag = rest.pop(0)
+		if not flag.startswith('--') or flag in ('--help', '--'):
+			return None
+
+		name, equals, value = flag[2:].partition('=')
+		name = name.replace('-', '_')
+
+		if not equals:
+			# A flag without a value is a boolean switch
+			if len(rest) > 0 and not rest[0].startswith('-'):
+				value = rest.pop(0)
+			else:
+				value = 'True'
+
+		if name not in names or name in kwargs:
+			return None
+
+		kwargs[name] = parse_value(value)
+
+	# Every required argument has to be there exactly once
+	given = names[:len(args)]
+	if len(args) > len(names) or any(i in kwargs for i in given):
+		return None
+
+	if any(i not in kwargs for i in names[len(args):required]):
+		return None
+
+	return method, args, kwargs
+
+
+def main(argv=None):
+	"""
+	Runs a command without paying for importing Fire when it isn't needed.
+
+	Fire takes longer to import than the rest of RGB together, which adds
+	up when a build runs RGB for hundreds of headers. Simple command lines
+	are dispatched directly and everything else (including help) goes
+	through Fire just like before.
+
+	Args:
+		argv(list): the command line arguments, without the program name.
+	"""
+	if argv == None:
+		argv = sys.argv[1:]
+
+	command = parse_command(CLI(), argv)
 
-		# Fix null dynamic lib name
-		if dynlib == None:
-			# Since the extension doesn't matter, just add a dot to it
-			dynlib = os.path.basename(header).split('.')[0] + '.'
+	if command == None:
+		import fire # CLI framework
+		fire.Fire(CLI, command=argv)
+		return
 
-		# Both parse and generate the declarations
-		rgb_compiler = RGB(declarations, dynlib, call_con, out_file)
-		rgb_compiler.compile()
+	method, args, kwargs = command
+	method(*args, **kwargs)
 
 
 if __name__ == '__main__':
-	fire.Fire(CLI)
\ No newline at end of file
+	main()
\ No newline at end of file
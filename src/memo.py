@@ -0,0 +1,192 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Remembers parse results across runs.
+
+Most declarations of a library are exactly the same from one release to the
+next, so instead of running their grammar again, the tokens they parsed to
+last time are loaded from a file. Only new or changed declarations are parsed.
+"""
+
+import os # Checking for the memo file
+import json # Memo file format
+import hashlib # Keys
+import threading # Batch workers share a memo
+import ir # Turning tokens back into records
+
+
+def normalize(text):
+	"""
+	Removes the whitespace differences that don't change how a declaration
+	parses.
+
+	Each line is stripped, runs of whitespace become a single space and blank
+	lines are dropped. Line breaks are kept since structs are parsed line by
+	line.
+
+	Args:
+		text(str): the declaration text.
+
+	Returns:
+		The normalized text.
+	"""
+	lines = (' '.join(line.split()) for line in text.split('\n'))
+	return '\n'.join(line for line in lines if line)
+
+
+def plain(result):
+	"""
+	Turns a parse result into something that can be stored as JSON.
+
+	Args:
+		result: any of the records in `ir`.
+
+	Returns:
+		The tokens it was made from as nested lists of strings, or the text
+		of a struct.
+	"""
+	return result.tokens()
+
+
+class ParseMemo:
+	"""
+	Persistent store of parse results keyed by declaration.
+
+	Each key is made from the kind of compiler, the normalized declaration
+	text and `GRAMMAR_VERSION`.
+
+	Attributes:
+		path(str): the JSON file the memo is kept in.
+		hits(int): how many compilers got their result from the memo.
+		misses(int): how many compilers had to be parsed.
+	"""
+	def __init__(self, path):
+		"""
+		Constructor.
+
+		Args:
+			path(str): the file to load the memo from and save it to.
+		"""
+		self.path = path
+		self.hits = 0
+		self.misses = 0
+		self.__lock = threading.Lock()
+		self.__entries = {}
+		self.__changed = False
+
+		if os.path.exists(path):
+			try:
+				with open(path) as file:
+					self.__entries = json.load(file)
+			except ValueError:
+				# A corrupt memo is simply rebuilt
+				self.__entries = {}
+
+	@staticmethod
+	def key(compiler):
+		"""
+		Creates the memo key for a compiler.
+
+		Args:
+			compiler: any of the compilers, with its full line.
+
+		Returns:
+			The key as a hex string.
+		"""
+		# Imported here so that a memo created for a run that turns out to
+		# be up to date doesn't import Pyparsing
+		from parse_utils import GRAMMAR_VERSION
+
+		text = '%s\0%s\0%s' % (
+			compiler.KIND,
+			GRAMMAR_VERSION,
+			normalize(compiler.line)
+		)
+		return hashlib.sha1(text.encode('UTF-8')).hexdigest()
+
+	def load(self, compiler):
+		"""
+		Gives the compiler its remembered result if there is one.
+
+		Args:
+			compiler: the compiler that is about to be parsed.
+
+		Returns:
+			True if the compiler no longer needs to be parsed.
+		"""
+		result = self.__entries.get(self.key(compiler))
+
+		with self.__lock:
+			if result == None:
+				self.misses += 1
+				return False
+
+			self.hits += 1
+
+		compiler.result = ir.compact(compiler.KIND, result)
+		return True
+
+	def store(self, compiler):
+		"""
+		Remembers the result of a compiler that was just parsed.
+
+		Compilers that failed to parse are not remembered.
+
+		Args:
+			compiler: the compiler that was parsed.
+		"""
+		if compiler.result == None:
+			return
+
+		key = self.key(compiler)
+		result = plain(compiler.result)
+
+		with self.__lock:
+			self.__entries[key] = result
+			self.__changed = True
+
+	def save(self):
+		"""
+		Writes the memo back to its file if anything was added to it.
+		"""
+		with self.__lock:
+			if not self.__changed:
+				return
+
+			temp = self.path + '.tmp'
+			with open(temp, 'w') as file:
+				json.dump(self.__entries, file)
+			os.replace(temp, self.path)
+			self.__changed = False
+
+	def report(self):
+		"""
+		Prints how many declarations were reused and how many were parsed.
+		"""
+		total = self.hits + self.misses
+		rate = 100.0 * self.hits / total if total else 0.0
+		print(
+			f'Parse memo: {self.hits} hits, {self.misses} misses '
+			f'({rate:.1f}% reused)'
+		)
@@ -25,10 +25,39 @@ Contains several utilities for parsing with the Pyparsing library as well as
 all of the parsers for all the compilers.
 """
 
+import re # Flags for the Regex tokens
 from pyparsing import *
 from red_utils import fix_hex_num
 
 
+'''
+How many parse results Pyparsing's packrat cache may hold. The cache is reset
+for every `parseString` call, so this only bounds a single (long) declaration.
+'''
+PACKRAT_CACHE_SIZE = 1024
+
+
+def enable_packrat(cache_size=PACKRAT_CACHE_SIZE):
+	"""
+	Turns on Pyparsing's packrat cache for every grammar.
+
+	It is off by default: each declaration is a separate `parseString` call,
+	so the cache is thrown away before it pays for its own bookkeeping (see
+	`python -m bench.grammars`). Only worth it for huge single declarations.
+
+	Args:
+		cache_size(int): how many parse results to keep.
+	"""
+	ParserElement.enablePackrat(cache_size_limit=cache_size)
+
+
+'''
+Bump this whenever a grammar (or a compiler's parse method) changes the tokens
+it produces so that memoized parse results from older versions are not used.
+'''
+GRAMMAR_VERSION = 4
+
+
 '''
 Simple function to return a lambda to replace 'tokens' with 'replace'.
 
@@ -48,76 +77,164 @@ Usage A vs. B:
 '''
 Replace = lambda parser, string: parser.setParseAction(ReplaceWith(string))
 
+'''
+Characters that may not come right before or after a keyword. Used by the
+`Regex` tokens below to behave exactly like a `Keyword` would.
+'''
+IdentChars = alphanums + '_$'
+NotIdentBefore = r'(?<![A-Za-z0-9_$])'
+NotIdentAfter = r'(?![A-Za-z0-9_$])'
+
+
+def KeywordRegex(keywords):
+	'''
+	Creates a single `Regex` that matches any of the given keywords.
+
+	It matches the same text as `MatchFirst([Keyword(i) for i in keywords])`
+	but in one step instead of trying each keyword in turn.
+
+	Args:
+		keywords(list): the keywords, in the order they should be tried.
+
+	Returns:
+		The Regex parser.
+	'''
+	alternatives = '|'.join(re.escape(i) for i in keywords)
+	return Regex(f'{NotIdentBefore}(?:{alternatives}){NotIdentAfter}')
+
+
+def ReplaceKeywords(replacements):
+	'''
+	Creates a single parser that matches any of the keywords in
+	`replacements` and replaces it with its value.
+
+	Usage:
+	>>> ReplaceKeywords({'long int' : 'int', 'short int' : 'int'})
+
+	Args:
+		replacements(dict): keyword -> replacement, in the order the keywords
+			should be tried (longest first).
+
+	Returns:
+		The parser.
+	'''
+	return KeywordRegex(replacements).setParseAction(
+		lambda string, loc, tokens: replacements[tokens[0]]
+	)
+
+
+class LazyGrammar:
+	"""
+	A grammar that is only built the first time it is used.
+
+	Building every grammar takes time that is wasted whenever a run only
+	needs a few of them (or none at all, e.g. when the output is up to date).
+	Used as a decorator on a function that builds and returns the grammar:
+
+	>>> @LazyGrammar
+	... def Identifier():
+	... 	return Word(alphas + '_', bodyChars=alphanums + '_')
+	>>> Identifier.parseString('age')
+
+	Any attribute of the grammar (`parseString`, `searchString`, ...) can be
+	used on it directly. To combine it into another grammar, use `get()`.
+
+	Attributes:
+		build(callable): creates the grammar.
+		grammar(ParserElement): the grammar once it has been built.
+	"""
+	def __init__(self, build):
+		"""
+		Constructor.
+
+		Args:
+			build(callable): creates the grammar.
+		"""
+		self.build = build
+		self.grammar = None
+
+	def get(self):
+		"""
+		Returns the grammar, building it if this is the first time.
+		"""
+		if self.grammar == None:
+			self.grammar = self.build()
+		return self.grammar
+
+	def __getattr__(self, name):
+		"""
+		Forwards everything else to the grammar.
+		"""
+		return getattr(self.get(), name)
+
+
 '''
 Kills the storage specifiers of C integers because they cannot be compiled in
 Red/System.
 '''
-IntegerSuffix = (
-	CaselessLiteral('ui8').suppress()
-	| CaselessLiteral('ui16').suppress()
-	| CaselessLiteral('ui32').suppress()
-	| CaselessLiteral('ui64').suppress()
-	| CaselessLiteral('ull').suppress()
-	| CaselessLiteral('ul').suppress()
-	| CaselessLiteral('u').suppress()
-	| CaselessLiteral('ll').suppress()
-	| CaselessLiteral('l').suppress()
-	| CaselessLiteral('i8').suppress()
-	| CaselessLiteral('i16').suppress()
-	| CaselessLiteral('i32').suppress()
-	| CaselessLiteral('i64').suppress()
-)
+@LazyGrammar
+def IntegerSuffix():
+	return Regex(
+		'ui8|ui16|ui32|ui64|ull|ul|u|ll|l|i8|i16|i32|i64', flags=re.IGNORECASE
+	).suppress()
 
 '''
 Kills the storage specifiers of C floats because they cannot be compiled in
 Red/System.
 '''
-FloatSuffix = (
-	CaselessLiteral('f8').suppress()
-	| CaselessLiteral('f16').suppress()
-	| CaselessLiteral('f32').suppress()
-	| CaselessLiteral('f64').suppress()
-	| CaselessLiteral('f').suppress()
-)
+@LazyGrammar
+def FloatSuffix():
+	return Regex('f8|f16|f32|f64|f', flags=re.IGNORECASE).suppress()
 
 '''
 Parses a hex literal and automatically changes it to the Red/System equivalent.
 '''
-HexNumber = Combine(
-	Literal('0x') +
-	Word(nums + 'abcdefABCDEF') +
-	Optional(IntegerSuffix)
-	# Make sure that the replacement of the '0x' to 'h' happens here
-).setParseAction(lambda s, l, tokens: fix_hex_num(tokens[0]))('HexNumber')
+@LazyGrammar
+def HexNumber():
+	return Combine(
+		Literal('0x') +
+		Word(nums + 'abcdefABCDEF') +
+		Optional(IntegerSuffix.get())
+		# Make sure that the replacement of the '0x' to 'h' happens here
+	).setParseAction(lambda s, l, tokens: fix_hex_num(tokens[0]))('HexNumber')
 
 '''
 Parses a C integer.
 '''
-Integer = Combine(
-	Optional(Literal('-')) +
-	(
-		Word(nums) + CaselessLiteral('e') + (
-			Literal('+') | Literal('-')
-		) +
-		Word(nums) + Optional(IntegerSuffix)
-		| Word(nums) + Optional(IntegerSuffix)
-	)
-)('Integer')
+@LazyGrammar
+def Integer():
+	return Combine(
+		Optional(Literal('-')) +
+		(
+			Word(nums) + CaselessLiteral('e') + (
+				Literal('+') | Literal('-')
+			) +
+			Word(nums) + Optional(IntegerSuffix.get())
+			| Word(nums) + Optional(IntegerSuffix.get())
+		)
+	)('Integer')
 
 '''
 Parses a C floating point decimal.
 '''
-FloatNumber = Combine(
-	Optional(Literal('-')) + (
-		Optional(Word(nums)) + Literal('.') + Word(nums) + CaselessLiteral('e') + (Literal('+') | Literal('-')) + Word(nums) + Optional(FloatSuffix | IntegerSuffix)
-		| Optional(Word(nums)) + Literal('.') + Word(nums) + Optional(FloatSuffix | IntegerSuffix)
-	)
-)('FloatNumber')
+@LazyGrammar
+def FloatNumber():
+	return Combine(
+		Optional(Literal('-')) + (
+			Optional(Word(nums)) + Literal('.') + Word(nums) +
+			CaselessLiteral('e') + (Literal('+') | Literal('-')) + Word(nums) +
+			Optional(FloatSuffix.get() | IntegerSuffix.get())
+			| Optional(Word(nums)) + Literal('.') + Word(nums) +
+			Optional(FloatSuffix.get() | IntegerSuffix.get())
+		)
+	)('FloatNumber')
 
 '''
 Parses any type of C integer literal.
 '''
-Number = FloatNumber | HexNumber | Integer
+@LazyGrammar
+def Number():
+	return FloatNumber.get() | HexNumber.get() | Integer.get()
 
 '''
 Identifier:
@@ -126,212 +243,239 @@ Identifier:
 	__abc123
 	th1s1samaz3box
 '''
-Identifier = Word(alphas + '_', bodyChars=alphanums + '_')
+@LazyGrammar
+def Identifier():
+	return Word(alphas + '_', bodyChars=alphanums + '_')
 
 '''
 Parses a C pound define.
 '''
-PoundDefine = (
-	Keyword('#define') +
-	Identifier +
-	Optional(
-		OneOrMore(
-			Number
-			| quotedString
-			| Identifier
-			| Keyword('()')
-			| Keyword('( )')
-			| Literal('(')
-			| Literal(')')
-			| Literal(',')
-			| Keyword('...')
-			| Word('!@#$%^&*-=+|.')
+@LazyGrammar
+def PoundDefine():
+	return (
+		Keyword('#define') +
+		Identifier.get() +
+		Optional(
+			OneOrMore(
+				Number.get()
+				| quotedString
+				| Identifier.get()
+				| Regex(
+					f'{NotIdentBefore}\\(\\){NotIdentAfter}'
+					f'|{NotIdentBefore}\\( \\){NotIdentAfter}'
+					'|[(),]'
+				)
+				| Keyword('...')
+				| Word('!@#$%^&*-=+|.')
+			)
 		)
 	)
-)
 
 '''
 Parses a C macro.
 '''
-Macro = (
-	Keyword('#define').suppress() +
-	Identifier +
-	Literal('(').suppress() +
-	Group(
-		ZeroOrMore(
-			Identifier
-			| Literal(',')
-			| Keyword('...')
-		)
-	) +
-	Literal(')').suppress()
-)
+@LazyGrammar
+def Macro():
+	return (
+		Keyword('#define').suppress() +
+		Identifier.get() +
+		Literal('(').suppress() +
+		Group(
+			ZeroOrMore(
+				Identifier.get()
+				| Literal(',')
+				| Keyword('...')
+			)
+		) +
+		Literal(')').suppress()
+	)
+
+'''
+Storage specifiers and qualifiers that RGB ignores.
+'''
+@LazyGrammar
+def Qualifier():
+	return KeywordRegex([
+		'__declspec(dllimport)',
+		'__declspec(dllexport)',
+		'__declspec(noreturn)',
+		'__stdcall',
+		'__cdecl',
+		'unsigned',
+		'signed',
+		'const'
+	]).suppress()
+
+'''
+Replaces any occurance of a specific storage type with a single type so it can
+be ingested by RGB.
+
+NOTE: 'long unsinged int' is misspelled, as it always has been in this
+grammar, so that the tokens stay the same as previous versions (see
+`GRAMMAR_VERSION`). `Types` has the correct spelling.
+'''
+@LazyGrammar
+def StorageType():
+	return ReplaceKeywords({
+		'long long unsigned int' : 'int',
+		'long long signed int' : 'int',
+		'long long int' : 'int',
+		'long long' : 'long',
+		'long unsinged int' : 'int',
+		'long signed int' : 'int',
+		'long int' : 'int',
+		'long double' : 'double',
+		'short int' : 'int'
+	})
+
+'''
+Parses a C struct prefix.
+'''
+@LazyGrammar
+def StructPrefix():
+	return OneOrMore(Qualifier.get() | StorageType.get())
 
 '''
 Parses a C prefix such as a function return type. Replaces any occurance of a
 specific storage type with a single type so it can be ingested by RGB.
 '''
-Prefix = OneOrMore(
-	Keyword('__declspec(dllimport)').suppress()
-	| Keyword('__declspec(dllexport)').suppress()
-	| Keyword('__declspec(noreturn)').suppress()
-	| Keyword('__stdcall').suppress()
-	| Keyword('__cdecl').suppress()
-	| Keyword('unsigned').suppress()
-	| Keyword('signed').suppress()
-	| Keyword('long long unsigned int').setParseAction(ReplaceWith('int'))
-	| Keyword('long long signed int').setParseAction(ReplaceWith('int'))
-	| Keyword('long long int').setParseAction(ReplaceWith('int'))
-	| Keyword('long long').setParseAction(ReplaceWith('long'))
-	| Keyword('long unsinged int').setParseAction(ReplaceWith('int'))
-	| Keyword('long signed int').setParseAction(ReplaceWith('int'))
-	| Keyword('long int').setParseAction(ReplaceWith('int'))
-	| Keyword('long double').setParseAction(ReplaceWith('double'))
-	| Keyword('short int').setParseAction(ReplaceWith('int'))
-	| Keyword('const').suppress()
-	| Identifier
-)
+@LazyGrammar
+def Prefix():
+	return OneOrMore(Qualifier.get() | StorageType.get() | Identifier.get())
 
 '''
 Parses a C function pointer.
 '''
-FunctionPtr = (
-	Keyword('typedef void').suppress() +
-	Literal('(').suppress() +
-	Optional(Keyword('__stdcall').suppress() | Keyword('__cdecl').suppress()) +
-	Literal('*').suppress() +
-	Identifier +
-	Literal(')').suppress() +
-	Literal('(').suppress() +
-	Group(
-		ZeroOrMore(
-			(Prefix | Literal('*')) +
-			Optional(Literal(','))
-		)
-	) +
-	Literal(')').suppress() +
-	Literal(';').suppress()
-)
+@LazyGrammar
+def FunctionPtr():
+	return (
+		Keyword('typedef void').suppress() +
+		Literal('(').suppress() +
+		Optional(KeywordRegex(['__stdcall', '__cdecl']).suppress()) +
+		Literal('*').suppress() +
+		Identifier.get() +
+		Literal(')').suppress() +
+		Literal('(').suppress() +
+		Group(
+			ZeroOrMore(
+				(Prefix.get() | Literal('*')) +
+				Optional(Literal(','))
+			)
+		) +
+		Literal(')').suppress() +
+		Literal(';').suppress()
+	)
 
 '''
 Any C type.  Filters out simple unacceptable occurances.
 '''
-Types = OneOrMore(
-	Keyword('unsigned').suppress()
-	| Keyword('signed').suppress()
-	| Replace(Keyword('long long unsigned int'), 'int')
-	| Replace(Keyword('long long signed int'), 'int')
-	| Replace(Keyword('long long int'), 'int')
-	| Replace(Keyword('long long'), 'long')
-	| Replace(Keyword('long unsigned int'), 'int')
-	| Replace(Keyword('long signed int'), 'int')
-	| Replace(Keyword('long int'), 'int')
-	| Replace(Keyword('long double'), 'double')
-	| Replace(Keyword('short int'), 'int')
-	| Keyword('const').suppress()
-	| Identifier
-)
+@LazyGrammar
+def Types():
+	return OneOrMore(
+		KeywordRegex(['unsigned', 'signed', 'const']).suppress()
+		| ReplaceKeywords({
+			'long long unsigned int' : 'int',
+			'long long signed int' : 'int',
+			'long long int' : 'int',
+			'long long' : 'long',
+			'long unsigned int' : 'int',
+			'long signed int' : 'int',
+			'long int' : 'int',
+			'long double' : 'double',
+			'short int' : 'int'
+		})
+		| Identifier.get()
+	)
 
 '''
-Parses a C typedef.
+Parses a C typedef, the pointers of a pointer typedef included.
 '''
-Typedef = (
-	Keyword('typedef').suppress() +
-	OneOrMore(Types)
-)
+@LazyGrammar
+def Typedef():
+	return (
+		Keyword('typedef').suppress() +
+		OneOrMore(Types.get() | Literal('*'))
+	)
 
 '''
 Parses a C function.
 '''
-Function = (
-	Group(OneOrMore(Prefix) + Optional(OneOrMore(Literal('*'))) + Optional(Prefix)) +
-	Literal('(').suppress() +
-	Group(ZeroOrMore(
-		Prefix
-		| Literal('*')
-		| Literal(',')
-		| Keyword('...')
-	)) +
-	Literal(')').suppress() +
-	Literal(';').suppress()
-)
+@LazyGrammar
+def Function():
+	return (
+		Group(Prefix.get() + Optional(OneOrMore(Literal('*'))) + Optional(Prefix.get())) +
+		Literal('(').suppress() +
+		Group(ZeroOrMore(
+			Prefix.get()
+			| Regex('[*,]')
+			| Keyword('...')
+		)) +
+		Literal(')').suppress() +
+		Literal(';').suppress()
+	)
 
 '''
 Parses a C global variable.
 '''
-GlobalVar = (
-	Keyword('extern').suppress() +
-	OneOrMore(Prefix | Literal('*')) +
-	Literal(';').suppress()
-)
-
-'''
-Parses a C struct prefix.
-'''
-StructPrefix = OneOrMore(
-	Keyword('__declspec(dllimport)').suppress()
-	| Keyword('__declspec(dllexport)').suppress()
-	| Keyword('__declspec(noreturn)').suppress()
-	| Keyword('__stdcall').suppress()
-	| Keyword('__cdecl').suppress()
-	| Keyword('unsigned').suppress()
-	| Keyword('signed').suppress()
-	| Keyword('long long unsigned int').setParseAction(ReplaceWith('int'))
-	| Keyword('long long signed int').setParseAction(ReplaceWith('int'))
-	| Keyword('long long int').setParseAction(ReplaceWith('int'))
-	| Keyword('long long').setParseAction(ReplaceWith('long'))
-	| Keyword('long unsinged int').setParseAction(ReplaceWith('int'))
-	| Keyword('long signed int').setParseAction(ReplaceWith('int'))
-	| Keyword('long int').setParseAction(ReplaceWith('int'))
-	| Keyword('long double').setParseAction(ReplaceWith('double'))
-	| Keyword('short int').setParseAction(ReplaceWith('int'))
-	| Keyword('const').suppress()
-)
+@LazyGrammar
+def GlobalVar():
+	return (
+		Keyword('extern').suppress() +
+		OneOrMore(Prefix.get() | Literal('*')) +
+		Literal(';').suppress()
+	)
 
 '''
 Parses a variable declaration within a struct.
 '''
-Decl = OneOrMore(
-	StructPrefix
-	| Identifier
-	| Literal('*')
-	| Literal(',')
-) + Literal(';').suppress()
+@LazyGrammar
+def Decl():
+	return OneOrMore(
+		Qualifier.get()
+		| StorageType.get()
+		| Identifier.get()
+		| Regex('[*,]')
+	) + Literal(';').suppress()
 
 '''
 Parses the start of a C struct.
 '''
-StructStart = (
-	Optional(Keyword('typedef').suppress()) +
-	Keyword('struct').suppress() +
-	Identifier
-)
+@LazyGrammar
+def StructStart():
+	return (
+		Optional(Keyword('typedef').suppress()) +
+		Keyword('struct').suppress() +
+		Identifier.get()
+	)
 
 '''
 Parses the end of a C struct.
 '''
-StructEnd = (
-	Literal('}').suppress() +
-	Group(
-	ZeroOrMore(Identifier +
-	Optional(Literal(','))) +
-	Literal(';').suppress()
-))
+@LazyGrammar
+def StructEnd():
+	return (
+		Literal('}').suppress() +
+		Group(
+		ZeroOrMore(Identifier.get() +
+		Optional(Literal(','))) +
+		Literal(';').suppress()
+	))
 
 '''
 Parses a C enum.
 '''
-Enum = (
-	Keyword('enum').suppress() +
-	Identifier +
-	Literal('{').suppress() +
-	Group(OneOrMore(
-		Identifier + Replace(Literal('='), ': ') + Word(alphanums + '_-.\'"') + Literal(',')
-		| Identifier + Replace(Literal('='), ': ') + Word(alphanums + '_-.\'"')
-		| Identifier + Literal(',')
-		| Identifier
-	)) +
-	Literal('}').suppress() +
-	Optional(Identifier) +
-	Literal(';').suppress()
-)
+@LazyGrammar
+def Enum():
+	return (
+		Keyword('enum').suppress() +
+		Identifier.get() +
+		Literal('{').suppress() +
+		Group(OneOrMore(
+			Identifier.get() +
+			Optional(Replace(Literal('='), ': ') + Word(alphanums + '_-.\'"')) +
+			Optional(Literal(','))
+		)) +
+		Literal('}').suppress() +
+		Optional(Identifier.get()) +
+		Literal(';').suppress()
+	)
@@ -0,0 +1,254 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Measures where the time of a run goes, stage by stage.
+
+A `Profiler` is handed to the formatter and to `RGB`, which time each of
+their stages with it: running clang and clang-format, the `-dM` pass,
+classifying lines, parsing (in total and for each kind of declaration) and
+writing the output. The individual declarations that took the longest to
+parse are remembered along with their source lines.
+
+Nothing is measured unless a profiler is given, see `stage`.
+"""
+
+import os # CPU time of the tools
+import sys # Default report destination
+import time # Wall and CPU time
+import heapq # Keeping only the slowest declarations
+import contextlib # Timing a block of code
+from cache import write_json # Saving the profile
+
+
+def profile_path(out_file):
+	"""
+	Gets the path of the profile written for a generated file.
+
+	Args:
+		out_file(str): the generated Red/System file.
+
+	Returns:
+		The path of the JSON profile.
+	"""
+	return out_file + '.profile.json'
+
+
+def children_cpu():
+	"""
+	Returns the CPU time used by child processes that have been waited for.
+	"""
+	times = os.times()
+	return times.children_user + times.children_system
+
+
+def stage(profiler, name):
+	"""
+	Times a block of code as a stage of `profiler`, if there is one.
+
+	Usage:
+		with stage(self.profiler, 'classify') as record:
+			...
+			record['items'] = count
+
+	Args:
+		profiler(Profiler): the profiler, or None to not measure anything.
+		name(str): name of the stage.
+
+	Returns:
+		A context manager giving the stage's record, where the number of
+		items it handled can be filled in.
+	"""
+	if profiler == None:
+		return contextlib.nullcontext({})
+	return profiler.stage(name)
+
+
+class Profiler:
+	"""
+	Collects the time spent in each stage of a run.
+
+	Stages with the same name add up, so a stage can be timed in pieces.
+
+	Attributes:
+		stages(dict): stage name -> record of its wall time, CPU time (this
+			process plus any tool it waited for) and items handled, in the
+			order the stages were first seen.
+		slowest(int): how many of the slowest declarations to keep.
+		declarations(list): heap of (seconds, order, kind, line) of the
+			slowest declarations parsed so far.
+		parsed(int): how many declarations were parsed in total.
+	"""
+	def __init__(self, slowest=10):
+		"""
+		Constructor.
+
+		Args:
+			slowest(int): how many of the slowest declarations to keep.
+		"""
+		self.stages = {}
+		self.slowest = slowest
+		self.declarations = []
+		self.parsed = 0
+
+	def record(self, name):
+		"""
+		Gets the record of a stage, creating it if needed.
+
+		Args:
+			name(str): name of the stage.
+
+		Returns:
+			A dict with the wall, cpu and items of the stage so far.
+		"""
+		if name not in self.stages:
+			self.stages[name] = { 'wall' : 0.0, 'cpu' : 0.0, 'items' : 0 }
+		return self.stages[name]
+
+	@contextlib.contextmanager
+	def stage(self, name):
+		"""
+		Times the block of code inside of the `with` statement.
+
+		Args:
+			name(str): name of the stage.
+
+		Yields:
+			A dict where the number of items handled can be put under 'items'.
+		"""
+		items = {}
+		wall = time.perf_counter()
+		cpu = time.process_time() + children_cpu()
+
+		try:
+			yield items
+		finally:
+			record = self.record(name)
+			record['wall'] += time.perf_counter() - wall
+			record['cpu'] += time.process_time() + children_cpu() - cpu
+			record['items'] += items.get('items', 0)
+
+	def add(self, name, wall, cpu, items=0):
+		"""
+		Adds time that was measured elsewhere (e.g. another thread).
+
+		Args:
+			name(str): name of the stage.
+			wall(float): wall time in seconds.
+			cpu(float): CPU time in seconds.
+			items(int): how many items were handled.
+		"""
+		record = self.record(name)
+		record['wall'] += wall
+		record['cpu'] += cpu
+		record['items'] += items
+
+	def declaration(self, compiler, seconds):
+		"""
+		Adds the time one compiler took to parse its declaration.
+
+		The time is added to the stage of its kind ("parse Function") and
+		the declaration is kept if it is one of the slowest.
+
+		Args:
+			compiler: the compiler that was parsed.
+			seconds(float): how long its `parse()` took.
+		"""
+		kind = compiler.KIND
+		self.add(f'parse {kind}', seconds, seconds, 1)
+
+		entry = (seconds, self.parsed, kind, compiler.line.strip())
+		self.parsed += 1
+
+		if len(self.declarations) < self.slowest:
+			heapq.heappush(self.declarations, entry)
+		elif seconds > self.declarations[0][0]:
+			heapq.heapreplace(self.declarations, entry)
+
+	def to_dict(self):
+		"""
+		Returns the profile as a dict that can be saved as JSON.
+		"""
+		stages = []
+		for name, record in self.stages.items():
+			stages.append({
+				'stage' : name,
+				'wall' : record['wall'],
+				'cpu' : record['cpu'],
+				'items' : record['items'],
+				'per_sec' : (
+					record['items'] / record['wall'] if record['wall'] else 0
+				)
+			})
+
+		slowest = [
+			{ 'seconds' : seconds, 'kind' : kind, 'line' : line }
+			for seconds, _, kind, line in sorted(self.declarations,
+				reverse=True)
+		]
+
+		return { 'stages' : stages, 'slowest' : slowest }
+
+	def report(self, file=sys.stdout):
+		"""
+		Prints the stage breakdown and the slowest declarations.
+
+		Args:
+			file(file): where to print it.
+		"""
+		profile = self.to_dict()
+
+		print(
+			f'\n{"Stage":<24} {"wall s":>8} {"cpu s":>8} {"items":>8} '
+			f'{"items/s":>10}',
+			file=file
+		)
+		print('-' * 62, file=file)
+
+		for i in profile['stages']:
+			print(
+				f'{i["stage"]:<24} {i["wall"]:>8.3f} {i["cpu"]:>8.3f} '
+				f'{i["items"]:>8} {i["per_sec"]:>10,.0f}',
+				file=file
+			)
+
+		if len(profile['slowest']) > 0:
+			print('\nSlowest declarations:', file=file)
+
+		for i in profile['slowest']:
+			line = i['line'].replace('\n', ' ')
+			if len(line) > 60:
+				line = line[:57] + '...'
+			print(
+				f'{i["seconds"] * 1000:>8.2f} ms  {i["kind"]:<12} {line}',
+				file=file
+			)
+
+	def save(self, path):
+		"""
+		Writes the profile as JSON.
+
+		Args:
+			path(str): the file to write.
+		"""
+		write_json(path, self.to_dict())
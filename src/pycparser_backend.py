@@ -0,0 +1,453 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Parses the whole preprocessed header in one pass with pycparser.
+
+The default backend formats clang's output with clang-format, classifies it
+line by line and parses each declaration with its own Pyparsing grammar.
+This backend hands the entire translation unit to pycparser instead and
+walks the resulting AST, building the same parse results the compilers would
+have built themselves, so the compilers only have to generate.
+
+Pound defines are not part of a C AST, so they still come from clang's
+`-dM` pass and go through the regular compilers.
+
+Only declarations of the header itself are converted, but the included
+files are parsed too since pycparser has to know every type name before it
+is used.
+"""
+
+import re # Removing compiler extensions
+import itertools # Grouping struct fields by line
+from pycparser import c_parser, c_ast, c_generator # Parsing C
+import format # Running clang
+import compilers # Compiler classes
+from profiler import stage # Timing each stage
+from red_utils import STORAGE_TYPES # Shortening C types
+
+
+'''
+Types that Microsoft's compiler and clang know about without a declaration.
+pycparser needs to be told that they are type names.
+'''
+PRELUDE = '\n'.join([
+	'# 1 "<rgb prelude>"',
+	'typedef char __int8;',
+	'typedef short __int16;',
+	'typedef int __int32;',
+	'typedef long long __int64;',
+	'typedef int __builtin_va_list;',
+	''
+])
+
+# Extensions that take an argument in parentheses, removed along with it
+EXTENSION_CALLS = re.compile(
+	r'\b(?:__declspec|__attribute__|__asm__|__asm)\s*\('
+)
+
+# Extension keywords that can simply be removed
+EXTENSION_WORDS = re.compile(
+	r'\b(?:__cdecl|__stdcall|__fastcall|__extension__|__restrict__|'
+	r'__restrict|__inline__|__inline|__forceinline|_Nonnull|_Nullable|'
+	r'_Null_unspecified)\b'
+)
+
+# Turns AST nodes back into C code (for each compiler's `line`)
+GENERATOR = c_generator.CGenerator()
+
+
+def strip_extensions(text):
+	"""
+	Removes the compiler extensions pycparser does not understand.
+
+	Newlines inside of removed parentheses are kept so that line numbers
+	stay the same.
+
+	Args:
+		text(str): preprocessed C code.
+
+	Returns:
+		The C code without the extensions.
+	"""
+	text = EXTENSION_WORDS.sub('', text)
+	pieces = []
+	pos = 0
+
+	while True:
+		match = EXTENSION_CALLS.search(text, pos)
+		if match == None:
+			break
+
+		pieces.append(text[pos:match.start()])
+
+		# Skip to the matching closing parenthesis
+		depth = 1
+		end = match.end()
+		while depth > 0 and end < len(text):
+			if text[end] == '(':
+				depth += 1
+			elif text[end] == ')':
+				depth -= 1
+			end += 1
+
+		pieces.append('\n' * text.count('\n', match.start(), end))
+		pos = end
+
+	pieces.append(text[pos:])
+	return ''.join(pieces)
+
+
+def base_type(node):
+	"""
+	Returns the single word the grammars would turn a type specifier into.
+
+	Signedness is dropped and multi-word types are shortened the same way
+	`parse_utils.StorageType` does. Structs, unions and enums are referred to
+	by their name (their Red/System alias).
+
+	Args:
+		node: an IdentifierType, Struct, Union or Enum node.
+
+	Returns:
+		The type as a string.
+	"""
+	if isinstance(node, c_ast.IdentifierType):
+		words = [i for i in node.names if i not in ('unsigned', 'signed')]
+		if len(words) == 0:
+			return 'int'
+		words = ' '.join(words)
+		return STORAGE_TYPES.get(words, words)
+
+	return node.name or 'int'
+
+
+def unwrap(node):
+	"""
+	Finds the base type, pointer count and name of a declarator.
+
+	Arrays count as pointers, as do function pointers.
+
+	Args:
+		node: a TypeDecl, PtrDecl, ArrayDecl or FuncDecl node.
+
+	Returns:
+		A tuple of (type specifier node, pointer count, name or None).
+	"""
+	ptr_count = 0
+	while not isinstance(node, c_ast.TypeDecl):
+		if not isinstance(node, c_ast.FuncDecl):
+			ptr_count += 1
+		node = node.type
+
+	return node.type, ptr_count, node.declname
+
+
+def tokens(node):
+	"""
+	Returns a declarator as the grammars tokenize it: `['char', '*', 'name']`.
+
+	Args:
+		node: a TypeDecl, PtrDecl, ArrayDecl or FuncDecl node.
+
+	Returns:
+		The list of tokens. The name is left out if there is none.
+	"""
+	kind, ptr_count, name = unwrap(node)
+	result = [base_type(kind)] + ['*'] * ptr_count
+
+	if name != None:
+		result.append(name)
+
+	return result
+
+
+def parameters(params):
+	"""
+	Returns a parameter list as the grammars tokenize it, with a `,` between
+	each parameter: `['int', 'a', ',', 'char', '*', 'b', ',', '...']`.
+
+	Args:
+		params: a ParamList node, or None for `()`.
+
+	Returns:
+		The list of tokens.
+	"""
+	if params == None:
+		return ['void']
+
+	result = []
+	for i in params.params:
+		if len(result) > 0:
+			result.append(',')
+
+		if isinstance(i, c_ast.EllipsisParam):
+			result.append('...')
+		else:
+			result.extend(tokens(i.type))
+
+	return result
+
+
+def struct_members(struct):
+	"""
+	Creates the tokens of each member of a struct, as `StructCompiler.parse`
+	would (see `ir.Struct`).
+
+	Fields declared on the same line are kept together, like the fields of a
+	declaration are.
+
+	Args:
+		struct: the Struct node.
+
+	Returns:
+		A list with, for each nested struct, `['struct', name, members]` and
+		for each line of fields, `['fields', [field tokens, ...]]`.
+	"""
+	members = []
+
+	for _, group in itertools.groupby(struct.decls, lambda i: i.coord.line):
+		group = list(group)
+		kind = group[0].type
+
+		# Nested struct declaration
+		if (
+			isinstance(kind, c_ast.TypeDecl) and
+			isinstance(kind.type, c_ast.Struct) and
+			kind.type.decls != None
+		):
+			members.append([
+				'struct',
+				kind.type.name or group[0].name,
+				struct_members(kind.type)
+			])
+			continue
+
+		fields = []
+
+		for decl in group:
+			kind, ptr_count, name = unwrap(decl.type)
+
+			# Red/System only supports a single pointer
+			note = None
+			if ptr_count > 1:
+				note = f'{GENERATOR.visit(decl)};'
+
+			fields.append([name, base_type(kind), ptr_count,
+				isinstance(kind, c_ast.Struct), note, [], None])
+
+		members.append(['fields', fields])
+
+	return members
+
+
+def struct_result(struct, name):
+	"""
+	Creates the parse result of a struct, as `StructCompiler.parse` would.
+
+	Args:
+		struct: the Struct node.
+		name(str): the name of the alias.
+
+	Returns:
+		The tokens of the struct (see `ir.Struct`).
+	"""
+	return [name, struct_members(struct)]
+
+
+def enum_result(enum, name):
+	"""
+	Creates the parse result of an enum, as `EnumCompiler.parse` would.
+
+	Args:
+		enum: the Enum node.
+		name(str): the name of the enum.
+
+	Returns:
+		The parse result: `[name, ['RED', ': ', '1', ',', 'GREEN']]`.
+	"""
+	members = []
+	for i in enum.values.enumerators:
+		if len(members) > 0:
+			members.append(',')
+
+		members.append(i.name)
+
+		if i.value != None:
+			members.append(': ')
+			members.extend(GENERATOR.visit(i.value).split())
+
+	return [name, members]
+
+
+def convert_typedef(node, line):
+	"""
+	Creates the compiler for a typedef.
+
+	Args:
+		node: the Typedef node.
+		line(str): its C code.
+
+	Returns:
+		The compiler, or None if RGB has no use for it.
+	"""
+	kind = node.type
+
+	# Function pointer
+	if isinstance(kind, c_ast.PtrDecl) and isinstance(kind.type, c_ast.FuncDecl):
+		args = parameters(kind.type.args)
+		if args == ['void']:
+			args = []
+		return compilers.handed_over(compilers.FUNC_PTR, line, [node.name, args])
+
+	if isinstance(kind, c_ast.TypeDecl):
+		inner = kind.type
+
+		if isinstance(inner, c_ast.Struct):
+			if inner.decls == None:
+				return compilers.handed_over(compilers.TYPEDEF, line,
+					['struct', inner.name, node.name])
+
+			return compilers.handed_over(compilers.STRUCT, line,
+				struct_result(inner, inner.name or node.name))
+
+		if isinstance(inner, c_ast.Enum) and inner.values != None:
+			return compilers.handed_over(compilers.ENUM, line,
+				enum_result(inner, inner.name or node.name))
+
+		if isinstance(inner, c_ast.Union):
+			return None
+
+	return compilers.handed_over(compilers.TYPEDEF, line, tokens(kind))
+
+
+def convert(node):
+	"""
+	Creates the compiler for a top-level declaration.
+
+	Args:
+		node: a node of the translation unit.
+
+	Returns:
+		The compiler, or None if RGB has no use for it (function bodies,
+		unions, forward declarations, pragmas, ...).
+	"""
+	if isinstance(node, c_ast.Typedef):
+		return convert_typedef(node, GENERATOR.visit(node) + ';')
+
+	if not isinstance(node, c_ast.Decl):
+		return None
+
+	kind = node.type
+	line = GENERATOR.visit(node) + ';'
+
+	if isinstance(kind, c_ast.FuncDecl):
+		return compilers.handed_over(compilers.FUNCTION, line,
+			[tokens(kind.type), parameters(kind.args)])
+
+	if isinstance(kind, c_ast.Struct):
+		if kind.decls == None or kind.name == None:
+			return None
+		return compilers.handed_over(compilers.STRUCT, line,
+			struct_result(kind, kind.name))
+
+	if isinstance(kind, c_ast.Enum):
+		if kind.values == None or kind.name == None:
+			return None
+		return compilers.handed_over(compilers.ENUM, line, enum_result(kind, kind.name))
+
+	if isinstance(kind, c_ast.Union) or node.name == None:
+		return None
+
+	return compilers.handed_over(compilers.GLOBAL_VAR, line, tokens(kind))
+
+
+def parse(text, header):
+	"""
+	Parses a preprocessed translation unit.
+
+	Args:
+		text(str): clang's preprocessed output.
+		header(str): the header it came from (for error messages).
+
+	Returns:
+		The FileAST node.
+	"""
+	try:
+		return c_parser.CParser().parse(PRELUDE + strip_extensions(text),
+			header)
+	except c_parser.ParseError as e:
+		raise Exception(
+			f'pycparser could not parse {header}: {e} '
+			'(the pyparsing backend may be able to)'
+		)
+
+
+def translate(header, llvm_dir, includes, dump_file=None, profiler=None):
+	"""
+	Preprocesses and parses the header, creating a compiler with its parse
+	result for each of the header's declarations.
+
+	Args:
+		header(str): the header to parse.
+		llvm_dir(str): the binary directory where LLVM lives.
+		includes(str): the path of the folder containing relevant headers.
+		dump_file(str): where to write the defines and declarations found
+			for debugging, or None.
+		profiler(Profiler): times each stage if given.
+
+	Returns:
+		A tuple of (pound defines, compilers, dependencies). The pound
+		defines are lines that still have to be classified and parsed.
+	"""
+	if llvm_dir[-1] not in '/\\':
+		llvm_dir += '/'
+
+	with stage(profiler, 'clang -E') as record:
+		text, deps = format.preprocess_unit(header, llvm_dir, includes)
+		record['items'] = text.count('\n')
+
+	with stage(profiler, 'clang -dM') as record:
+		defines = format.pound_defines(header, llvm_dir)
+		record['items'] = len(defines)
+
+	with stage(profiler, 'pycparser') as record:
+		unit = parse(text, header)
+		record['items'] = len(unit.ext)
+
+	with stage(profiler, 'walk AST') as record:
+		found = []
+		for node in unit.ext:
+			# Only the header's own declarations, not the ones it includes
+			if node.coord == None or node.coord.file != header:
+				continue
+
+			compiler = convert(node)
+			if compiler != None:
+				found.append(compiler)
+
+		record['items'] = len(found)
+
+	format.write_dump(dump_file, defines + [i.line + '\n' for i in found])
+
+	return defines, found, deps
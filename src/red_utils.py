@@ -25,7 +25,57 @@ Convenience functions for parsing different C language constructs into their
 Red/System equivalents.
 """
 
-from random import choice # For creating random IDs
+import contextlib # Switching the types in use
+from contextvars import ContextVar # The types in use by each run
+from operator import countOf # Counting tokens without a Python loop
+import rgb_config # Builtin types
+
+
+'''
+Multi-word C types and the single word they are shortened to. These are the
+same replacements as `parse_utils.StorageType` (without the misspelling), for
+the backends that don't go through the grammars.
+'''
+STORAGE_TYPES = {
+	'long long int' : 'int',
+	'long long' : 'long',
+	'long int' : 'int',
+	'long double' : 'double',
+	'short int' : 'int'
+}
+
+# Words of a type that don't change its Red/System equivalent
+QUALIFIERS = {
+	'const', 'volatile', 'restrict', '__restrict', '_Atomic', 'signed',
+	'unsigned'
+}
+
+# Keywords in front of struct, union and enum names
+TAGS = ('struct', 'union', 'enum')
+
+
+def base_type(words):
+	"""
+	Returns the single word the grammars would turn a type into.
+
+	Multi-word types are shortened the same way `parse_utils.StorageType`
+	does. Structs, unions and enums are referred to
+	by their name (their Red/System alias).
+
+	Args:
+		words (list): the words of the type, without any of `QUALIFIERS`.
+
+	Returns:
+		The type as a string.
+	"""
+	if len(words) > 0 and words[0] in TAGS:
+		return words[1] if len(words) > 1 else 'int'
+
+	if len(words) == 0:
+		return 'int'
+
+	words = ' '.join(words)
+	return STORAGE_TYPES.get(words, words)
 
 
 def c_code_warning(file, c_code, line):
@@ -82,25 +132,101 @@ def fix_hex_num(num):
 		return num + 'h'
 
 
-def rand_id(count):
+class TokenSpan:
 	"""
-	Generates a random identifier for use in Red/System code.
+	A read-only view of part of a token list.
 
-	Some functions declarations do not provide argument names, this function
-	can be used to generate some since Red/System needs them for importing such
-	functions.
-
-	Args:
-		count(int): the number of letters + numbers that the id will have.
+	Splitting a parameter list or picking the type out of a declaration used
+	to slice (copy) the tokens every time. A span just remembers where its
+	tokens are in the shared list, so any number of them can be taken from a
+	declaration without copying a single token.
 
-	Returns:
-		A string consisting of (letters * `count`) + (numbers * `count`).
-		For example, if count is 3, "abc123" will be returned.
+	Attributes:
+		tokens(list): the shared tokens (a list or a tuple).
+		start(int): the index of the first token of the span.
+		end(int): the index after the last token of the span.
 	"""
-	r = range(count)
-	alphabet = ''.join([choice('abcdefghijklmnopqrstuvwxyz') for i in r])
-	nums = ''.join([choice('0123456789') for i in r])
-	return alphabet + nums
+	__slots__ = ('tokens', 'start', 'end')
+
+	def __init__(self, tokens, start=0, end=None):
+		"""
+		Constructor.
+		"""
+		self.tokens = tokens
+		self.start = start
+		self.end = len(tokens) if end == None else end
+
+	def __len__(self):
+		return self.end - self.start
+
+	def __iter__(self):
+		# islice() would step over every token before the span
+		return map(self.tokens.__getitem__, range(self.start, self.end))
+
+	def __getitem__(self, index):
+		if isinstance(index, int):
+			if index < 0:
+				index += self.end
+			else:
+				index += self.start
+
+			if index < self.start or index >= self.end:
+				raise IndexError('Token span index out of range')
+
+			return self.tokens[index]
+
+		if isinstance(index, slice):
+			start, end, step = index.indices(len(self))
+			if step != 1:
+				raise ValueError('Token spans can only be sliced in order')
+
+			return TokenSpan(
+				self.tokens, self.start + start, self.start + max(start, end)
+			)
+
+		raise TypeError('Token span indices must be integers or slices')
+
+	def __repr__(self):
+		return f'TokenSpan({list(self)!r})'
+
+	def count(self, token):
+		"""
+		Counts how many times `token` is in the span.
+
+		Args:
+			token(str): the token to look for.
+
+		Returns:
+			The count as an int.
+		"""
+		return countOf(iter(self), token)
+
+	def split(self, delimiter):
+		"""
+		Splits the span on `delimiter` in a single pass.
+
+		Args:
+			delimiter(str): the token to split on.
+
+		Returns:
+			A list of spans over the same tokens, one for each sequence
+			between delimiters (empty ones included).
+		"""
+		tokens = self.tokens
+		spans = []
+		start = self.start
+
+		while True:
+			try:
+				index = tokens.index(delimiter, start, self.end)
+			except ValueError:
+				break
+
+			spans.append(TokenSpan(tokens, start, index))
+			start = index + 1
+
+		spans.append(TokenSpan(tokens, start, self.end))
+		return spans
 
 
 def split_list(the_list, delimiter):
@@ -125,26 +251,185 @@ def split_list(the_list, delimiter):
 	if delimiter not in the_list:
 		return [the_list]
 
-	else:
-		copy = the_list.copy()
-		new_list = []
+	return [list(i) for i in TokenSpan(the_list).split(delimiter)]
 
-		while delimiter in copy:
-			index = copy.index(delimiter)
-			new_list.append(copy[:index])
-			copy = copy[index + 1:]
 
-		new_list.append(copy)
+class TypeRegistry:
+	"""
+	Knows which Red/System type every C type name ends up as.
+
+	It starts with the builtin types of `rgb_config.TYPES` and learns each
+	typedef of the header being generated. Resolving a name follows its
+	typedef chain down to a builtin (adding up the pointers along the way),
+	and every name on the way is remembered so that no chain is followed
+	twice. Chains that end in a name that isn't known are not remembered,
+	so learning a new typedef never makes what was remembered wrong. Builtins
+	always win over a typedef of the same name.
+
+	Attributes:
+		builtins(dict): C type -> Red/System type.
+		typedefs(dict): typedef name -> (C type, pointers).
+		resolved(dict): name -> (Red/System type, pointers), filled while
+			resolving.
+		structs(dict): the name of each struct that has an alias -> its
+			`ir.Struct`, for laying out the structs that contain it.
+	"""
+	__slots__ = ('builtins', 'typedefs', 'resolved', 'structs')
+
+	def __init__(self, builtins=None, typedefs=None, structs=None):
+		"""
+		Constructor.
+
+		Args:
+			builtins(dict): the builtin types, `rgb_config.TYPES` if None.
+			typedefs(dict): typedefs that are already known.
+			structs(dict): structs that are already known.
+		"""
+		self.builtins = rgb_config.TYPES if builtins == None else builtins
+		self.typedefs = {} if typedefs == None else dict(typedefs)
+		self.resolved = {}
+		self.structs = {} if structs == None else dict(structs)
+
+	def copy(self):
+		"""
+		Returns:
+			A registry with the same builtins, typedefs and structs.
+		"""
+		return TypeRegistry(self.builtins, self.typedefs, self.structs)
+
+	def add(self, name, the_type, pointers=0):
+		"""
+		Learns a typedef.
+
+		Args:
+			name(str): the name of the typedef.
+			the_type(str): the single word C type it stands for.
+			pointers(int): how many pointers it adds.
+		"""
+		# Only a typedef that is declared again differently changes what
+		# was remembered
+		if self.typedefs.get(name, (the_type, pointers)) != (
+			the_type, pointers
+		):
+			self.resolved.clear()
+
+		self.typedefs[name] = (the_type, pointers)
+
+	def add_typedef(self, result):
+		"""
+		Learns the typedef a `TypedefCompiler` parsed. Typedefs of structs
+		are not learned since the struct is referred to by its name, and
+		neither are results without a type (that the grammar couldn't read).
+
+		Args:
+			result(ir.Typedef): the parse result.
+		"""
+		if len(result.type) == 0 or result.type[0] in TAGS:
+			return
+
+		self.add(result.name, result.type[0], result.type.count('*'))
+
+	def add_struct(self, result):
+		"""
+		Learns the struct a `StructCompiler` parsed, whose alias makes a
+		typedef of it unnecessary and whose fields tell how much room it takes
+		up in other structs.
+
+		Args:
+			result(ir.Struct): the parse result.
+		"""
+		self.structs[result.name] = result
+
+	def resolve(self, name):
+		"""
+		Follows the typedefs of `name` to the type it stands for.
+
+		Args:
+			name(str): a C type.
+
+		Returns:
+			A tuple of (Red/System type, pointers). A name that is neither a
+			builtin nor a typedef (nor a typedef of one) is returned as is.
+		"""
+		found = self.resolved.get(name)
+		if found != None:
+			return found
+
+		# Walk down the chain until something known is reached
+		chain = []
+		walked = set()
+		current = name
+		known = True
+
+		while True:
+			found = self.resolved.get(current)
+			if found != None:
+				break
+
+			if current in self.builtins:
+				found = (self.builtins[current], 0)
+				break
+
+			# Unknown, or a typedef that refers back to itself
+			if current not in self.typedefs or current in walked:
+				found = (current, 0)
+				known = False
+				break
+
+			chain.append(current)
+			walked.add(current)
+			current = self.typedefs[current][0]
+
+		# Every typedef of the chain resolves to the same type. A typedef of
+		# an unknown name may still come, so those aren't remembered.
+		if known:
+			self.resolved[current] = found
+
+		the_type, pointers = found
+
+		for typedef in reversed(chain):
+			pointers += self.typedefs[typedef][1]
+			if known:
+				self.resolved[typedef] = (the_type, pointers)
+
+		return the_type, pointers
+
+
+# The types each run resolves names with (see `using_types`)
+_types = ContextVar('types', default=TypeRegistry())
+
+
+def types():
+	"""
+	Returns:
+		The `TypeRegistry` in use.
+	"""
+	return _types.get()
 
-		return new_list
+
+@contextlib.contextmanager
+def using_types(registry):
+	"""
+	Makes `mangle_type` and the functions that use it resolve types with
+	`registry` until the end of the with-block. Each thread (and asyncio
+	task) has its own, so several headers can be generated at once.
+
+	Args:
+		registry(TypeRegistry): the types to use.
+	"""
+	token = _types.set(registry)
+	try:
+		yield registry
+	finally:
+		_types.reset(token)
 
 
 def mangle_type(the_type):
 	"""
 	Turns `the_type` into its Red/System equivalent.
 
-	Note: This list will grow as issues are submitted that contain specific
-	types that have exact Red/System built-in equivalents.
+	The builtin types are listed in `rgb_config.TYPES` and typedefs are
+	followed down to them (see `TypeRegistry`).
 
 	Args:
 		the_type(str): the C type to change to Red/System.
@@ -155,43 +440,7 @@ def mangle_type(the_type):
 
 		`long` in C becomes `float64` in Red/System.
 	"""
-	if the_type == 'char':
-		return 'byte'
-
-	elif the_type == 'bool':
-		return 'logic'
-
-	elif the_type == 'long':
-		# NOTE(Pebaz): The Red/System float (float64) datatype is 64-bits
-		# wide so it will accept 64-bit integer literals.
-		return 'float64'
-
-	elif the_type == 'short':
-		return 'integer'
-
-	elif the_type == 'int':
-		return 'integer'
-
-	elif the_type == 'double':
-		return 'float64'
-
-	elif the_type == 'float':
-		return 'float32' 
-
-	elif the_type == '__int8':
-		return 'byte'
-
-	elif the_type == '__int16':
-		return 'integer'
-
-	elif the_type == '__int32':
-		return 'integer'
-
-	elif the_type == '__int64':
-		return 'float64'
-
-	else:
-		return the_type
+	return _types.get().resolve(the_type)[0]
 
 
 def make_type(target):
@@ -234,15 +483,46 @@ def pointer(target, ptr_count):
 	return '[pointer! [integer!]]'
 
 
-def argument(target):
+def red_type(the_type, ptr_count):
+	"""
+	Turns a single word C type and its number of pointers into a Red/System
+	type. Pointers that typedefs of the type add are counted too.
+
+	Args:
+		the_type(str): the C type.
+		ptr_count(int): the number of pointer redirects.
+
+	Returns:
+		A string of the Red/System type, such as `[integer!]`.
+	"""
+	the_type, pointers = _types.get().resolve(the_type)
+	ptr_count += pointers
+
+	# If the type is a pointer, handle it
+	if ptr_count > 0:
+		return pointer(the_type, ptr_count)
+
+	# Else handle it's type
+	else:
+		return make_type(the_type)
+
+
+def argument(target, position=1):
 	"""
 	Turns a list of strings into a function argument in Red/System.
 
 	The list can contain: `['int', 'age']`, and this function will return:
 	`age [integer!]`
 
+	An argument without a name is named after its position, `arg_name_2`
+	for the second argument, so that the same header always generates the
+	same file.
+
 	Args:
-		target(list): the list of strings to convert.
+		target(list): the list (or `TokenSpan`) of strings to convert. It is
+			only read, never changed or copied.
+		position(int): where the argument is in the argument list,
+			starting at 1.
 
 	Returns:
 		A string that contains a compileable Red/System version of the given C
@@ -252,26 +532,20 @@ def argument(target):
 		`age [integer!]`
 	"""
 	ptr_count = target.count('*')
-	name = target[-1]
-	the_type = target[:len(target) - ptr_count - 1]
+	words = len(target) - ptr_count
 
 	# If the argument has no name, we have to generate one
-	if len(the_type) == 0:
-		target.append('arg_name_' + rand_id(2))
-		return argument(target)
-
-	elif len(the_type) > 1:
-		raise Exception('Type longer than 1 word: %s' % str(target))
+	if words == 1:
+		name = f'arg_name_{position}'
 
-	the_type = mangle_type(the_type[0])
+	else:
+		name = target[-1]
+		words -= 1
 
-	# If the type is a pointer, handle it
-	if ptr_count > 0:
-		return f'{name} {pointer(the_type, ptr_count)}'
+	if words > 1:
+		raise Exception('Type longer than 1 word: %s' % str(list(target)))
 
-	# Else handle it's type
-	else:
-		return f'{name} {make_type(the_type)}'
+	return f'{name} {red_type(target[0], ptr_count)}'
 
 
 def get_return_type(target):
@@ -282,19 +556,10 @@ def get_return_type(target):
 	`[pointer! [integer!]]`
 
 	Args:
-		target(list): the list of strings that make up the C return type.
+		target(list): the list (or `TokenSpan`) of strings that make up the C
+			return type.
 
 	Returns:
 		A string containing the Red/System version of the C return type.
 	"""
-	ptr_count = target.count('*')
-	the_type = target[:len(target) - ptr_count]
-	the_type = mangle_type(the_type[0])
-
-	# If the type is a pointer, handle it
-	if ptr_count > 0:
-		return f'{pointer(the_type, ptr_count)}'
-
-	# Else handle it's type
-	else:
-		return f'{make_type(the_type)}'
+	return red_type(target[0], target.count('*'))
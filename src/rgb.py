@@ -25,16 +25,158 @@ Contains functionality to use compiler classes for each type of desired cross-
 compilation target from a C header file.
 """
 
+import io # Putting the output together in memory
 import os # Get only filename from path
-from pyparsing import * # Best parsing framework in Python
-from compilers.pound_define import PoundDefineCompiler # Compiles Pound Defines
-from compilers.macro import MacroCompiler # Compiles macros
-from compilers.func_ptr import FuncPtrCompiler # Compiles Function Pointers
-from compilers.typedef import TypedefCompiler # Compiles Typdefs
-from compilers.function import FunctionCompiler # Compiles Functions
-from compilers.global_var import GlobalVarCompiler # Compiles Global Vars
-from compilers.struct import StructCompiler # Compiles Structs
-from compilers.enum import EnumCompiler # Compiles Enums
+import re # Classifying lines without parsing them
+import shutil # Copying streamed sections into the output file
+import string # Identifier characters
+import tempfile # Spooling streamed sections
+import time # Timing each declaration for the profiler
+import compilers # Compiler classes, imported once a kind is first used
+from profiler import stage # Timing each stage
+from red_utils import TypeRegistry, using_types # Resolving typedefs
+
+
+# Fewest declarations each worker process has to be given before parsing in
+# parallel pays for starting the processes up.
+PARALLEL_MIN_PER_JOB = 500
+
+# How many chunks each worker process gets (more chunks = better balancing)
+PARALLEL_CHUNKS_PER_JOB = 4
+
+# Characters that can't come right after a keyword (same as pyparsing)
+_NOT_IDENT = r'(?![A-Za-z0-9_$])'
+
+# What Pyparsing calls `alphanums + '_'`
+IDENT_CHARS = string.ascii_letters + string.digits + '_'
+
+# Matches exactly the lines that the `Macro` grammar accepts, so classifying a
+# pound define doesn't need a trial parse.
+MACRO_LINE = re.compile(
+	r'\s*#define' + _NOT_IDENT +
+	r'\s*[A-Za-z_][A-Za-z0-9_]*\s*\(' +
+	r'(?:\s*(?:[A-Za-z_][A-Za-z0-9_]*|,|\.\.\.' + _NOT_IDENT + r'))*' +
+	r'\s*\)'
+)
+
+# Every line the `FunctionPtr` grammar accepts starts like this. Only lines that
+# match it get a trial parse.
+FUNC_PTR_START = re.compile(
+	r'\s*typedef void' + _NOT_IDENT + r'\s*\(\s*' +
+	r'(?:(?:__stdcall|__cdecl)' + _NOT_IDENT + r'\s*)?\*'
+)
+
+# The order in which each kind of compiler is written to the output file.
+# Everything in IMPORT_SECTIONS goes inside of the #import block. Kinds are
+# named rather than imported so that unused compilers are never imported.
+SECTIONS = (
+	compilers.STRUCT,
+	compilers.POUND_DEFINE,
+	compilers.MACRO,
+	compilers.ENUM,
+	compilers.TYPEDEF,
+	compilers.FUNC_PTR
+)
+IMPORT_SECTIONS = (
+	compilers.FUNCTION,
+	compilers.GLOBAL_VAR
+)
+
+
+# How many bytes of the output files are compared at a time when streaming
+COMPARE_CHUNK = 1 << 16
+
+
+def write_if_changed(path, text):
+	"""
+	Writes a generated file unless it already has exactly the same contents.
+
+	Leaving an unchanged file alone keeps its modification time, so build
+	tools don't recompile what depends on it. When it did change, the new
+	contents are written to a temporary file that is then renamed over it,
+	so nothing ever sees half a file.
+
+	Args:
+		path(str): the file to write.
+		text(str): its contents.
+
+	Returns:
+		True if the file was written, False if it was already up to date.
+	"""
+	# The same bytes a text mode file would have been written with
+	data = text.replace('\n', os.linesep).encode('UTF-8')
+
+	try:
+		with open(path, 'rb') as file:
+			if os.fstat(file.fileno()).st_size == len(data):
+				if file.read() == data:
+					return False
+	except FileNotFoundError:
+		pass
+
+	temp = path + '.tmp'
+	with open(temp, 'wb') as file:
+		file.write(data)
+
+	os.replace(temp, path)
+	return True
+
+
+def replace_if_changed(temp, path):
+	"""
+	Puts a generated file that was written to a temporary file in place,
+	unless the file already has exactly the same contents.
+
+	This is `write_if_changed` for output that is never in memory all at
+	once: both files are compared a chunk at a time, then the temporary
+	file is either renamed over the file or removed.
+
+	Args:
+		temp(str): the temporary file, next to `path`.
+		path(str): the file to write.
+
+	Returns:
+		True if the file was written, False if it was already up to date.
+	"""
+	try:
+		if os.path.getsize(temp) == os.path.getsize(path):
+			with open(temp, 'rb') as new, open(path, 'rb') as old:
+				while True:
+					chunk = new.read(COMPARE_CHUNK)
+					if chunk != old.read(COMPARE_CHUNK):
+						break
+
+					if len(chunk) == 0:
+						os.remove(temp)
+						return False
+	except FileNotFoundError:
+		pass
+
+	os.replace(temp, path)
+	return True
+
+
+def _parse_chunk(compilers):
+	"""
+	Parses a chunk of compilers inside of a worker process.
+
+	Only the parse results are sent back to the main process since it already
+	has the compilers themselves.
+
+	Args:
+		compilers(list): the compilers to parse.
+
+	Returns:
+		A list of (parse result, seconds it took) in the same order as
+		`compilers`.
+	"""
+	results = []
+	for i in compilers:
+		start = time.perf_counter()
+		i.parse()
+		results.append((i.result, time.perf_counter() - start))
+
+	return results
 
 
 class RGB:
@@ -51,8 +193,30 @@ class RGB:
 		dynlib(str): the path to the dynamic lib to import into Red/System.
 		call_con(str): one of (cdecl/stdcall).
 		outfile(str): the file to write all the compiled declarations.
+		jobs(int): how many processes to parse the declarations with.
+		memo(ParseMemo): remembered parse results from previous runs.
+		stream(bool): whether to generate each declaration as soon as it is
+			parsed instead of keeping them all until the end.
+		kind_counts(dict): how many compilers of each kind were created.
+		buckets(dict): kind of compiler -> list of its compilers in the
+			order they were created. Empty when streaming.
+		counters(dict): how many lines were classified, how many trial
+			parses were needed, how many of their results were handed to a
+			compiler and how many times a compiler had to parse.
+		profiler(Profiler): times each stage and declaration, or None.
+		parsed(list): compilers that already have their parse result.
+		includes(list): other Red/System files to `#include` at the top of
+			the output file (see `shared`).
+		types(TypeRegistry): the builtin types and every typedef that was
+			generated, which the types of the other declarations are
+			resolved with.
+		symbols(SymbolFilter): picks the declarations to parse and
+			generate, or None for all of them.
+		changed(bool): whether the output file was written (False if it
+			already had the generated code), None until it is generated.
 	"""
-	def __init__(self, declarations, dynlib, call_con, outfile=None):
+	def __init__(self, declarations, dynlib, call_con, outfile=None, jobs=1,
+		memo=None, stream=False, profiler=None, parsed=(), symbols=None):
 		"""
 		Constructor.
 		
@@ -61,13 +225,50 @@ class RGB:
 
 		Args:
 			declarations(list): list of declarations to parse/generate.
-			dynlib(str): the dynamic library target.
+			dynlib(str): the dynamic library target. If None, the output file
+				has no #import block, only the sections that don't need a
+				library (see `shared`), and `outfile` has to be given.
 			call_con(str): one of (cdecl/stdcall).
 			outfile(str): path to output file with Red/System file extension.
+			jobs(int): number of worker processes used for parsing. 1 parses
+				everything in this process.
+			memo(ParseMemo): if given, declarations parsed in a previous run
+				are not parsed again.
+			stream(bool): parse and generate each declaration as it arrives
+				from `declarations` (which can then be any iterable, such as
+				a `format.HeaderStream`) so that memory use stays flat. Jobs
+				are ignored when streaming.
+			profiler(Profiler): if given, the time spent classifying,
+				parsing and generating is recorded in it, along with the
+				time each declaration took to parse.
+			parsed(list): compilers whose parse results were already made
+				by another backend (see `pycparser_backend`). They are
+				generated after the ones made from `declarations` without
+				being parsed or put in the memo.
+			symbols(SymbolFilter): if given, only the declarations it picks
+				are parsed and generated (see `symbols`). Cannot be used
+				when streaming.
 		"""
 		self.declarations = declarations
-		self.dynlib = os.path.basename(dynlib)
+		self.dynlib = None if dynlib == None else os.path.basename(dynlib)
 		self.call_con = call_con
+		self.jobs = jobs
+		self.memo = memo
+		self.stream = stream
+		self.profiler = profiler
+		self.parsed = parsed
+		self.symbols = symbols
+		self.changed = None
+		self.includes = []
+		self.types = TypeRegistry()
+		self.kind_counts = {}
+		self.buckets = { kind : [] for kind in SECTIONS + IMPORT_SECTIONS }
+		self.counters = {
+			'lines' : 0,
+			'trial_parses' : 0,
+			'handed_over' : 0,
+			'parses' : 0
+		}
 
 		if outfile == None:
 			self.outfile = dynlib.split('.')[0] + '.reds'
@@ -79,15 +280,214 @@ class RGB:
 		Parses and then generates each declaration to the output file.
 
 		Meant to be called from other modules to perform the compilation steps.
+
+		Returns:
+			The list of compilers that were parsed and generated. When
+			streaming, the compilers are not kept so the list is empty.
+		"""
+		if self.stream:
+			self.__stream_all(self.declarations)
+			return []
+
+		results = self.__parse_all()
+		self.generate()
+		return results
+
+	def classify(self):
 		"""
-		results = self.__parse_all(self.declarations)
-		self.__generate(results)
+		Creates a compiler for each declaration without parsing any of them.
+
+		Each compiler is also put in the bucket of its kind so that they don't
+		have to be searched for when generating.
 
-	def __parse_all(self, lines):
+		Returns:
+			The list of compilers in the order of the declarations.
+		"""
+
+		# Contains compilers that have their line attached to them
+		results = []
+
+		with stage(self.profiler, 'classify') as record:
+			for compiler in self.__group(self.declarations):
+				results.append(compiler)
+				self.buckets[compiler.KIND].append(compiler)
+
+			record['items'] = len(results)
+
+		return results
+
+	def __parse_all(self):
 		"""
 		Go through each line in the declarations list and parse it according to
 		its type.
 
+		Returns:
+			The list of compilers, including the already parsed ones.
+		"""
+		results = self.classify()
+		parsed = list(self.parsed)
+
+		if self.symbols != None:
+			results, parsed = self.__select(results, parsed)
+
+		# Gather results from each compiler
+		self.parse(results)
+
+		for compiler in parsed:
+			kind = compiler.KIND
+			self.kind_counts[kind] = self.kind_counts.get(kind, 0) + 1
+			self.buckets[kind].append(compiler)
+
+		return results + parsed
+
+	def __select(self, results, parsed):
+		"""
+		Keeps only the declarations `symbols` picks, before any of them is
+		parsed.
+
+		Lines that look like function pointers were classified without a
+		trial parse (see `__classify_line`), so the picked ones get it
+		now and the ones that turn out to be typedefs are given a
+		`TypedefCompiler` instead.
+
+		Args:
+			results(list): the classified compilers.
+			parsed(list): the compilers that already have a result.
+
+		Returns:
+			A tuple of the picked (results, parsed).
+		"""
+		with stage(self.profiler, 'select') as record:
+			picked = set(id(i) for i in self.symbols.select(results + parsed))
+			results = [i for i in results if id(i) in picked]
+			parsed = [i for i in parsed if id(i) in picked]
+
+			for index, compiler in enumerate(results):
+				if compiler.KIND != compilers.FUNC_PTR:
+					continue
+
+				if compiler.result == None:
+					self.counters['trial_parses'] += 1
+					compiler.result = compilers.FuncPtrCompiler.try_parse(
+						compiler.line
+					)
+
+					if compiler.result == None:
+						results[index] = compilers.TypedefCompiler(
+							compiler.line
+						)
+					else:
+						self.counters['handed_over'] += 1
+
+			# Only the picked declarations are counted and generated
+			self.kind_counts = {}
+			self.buckets = { kind : [] for kind in self.buckets }
+
+			for compiler in results:
+				kind = compiler.KIND
+				self.kind_counts[kind] = self.kind_counts.get(kind, 0) + 1
+				self.buckets[kind].append(compiler)
+
+			record['items'] = len(results) + len(parsed)
+
+		return results, parsed
+
+	def __stream_all(self, lines):
+		"""
+		Parses and generates each declaration as soon as all of its lines
+		have arrived.
+
+		The output of each section is spooled to its own temporary file and
+		the sections are put together in the output file at the end, so the
+		output is the same as when not streaming but no compiler is kept
+		around after it has been generated. The sections are put together in
+		a temporary file next to the output file, which replaces it only if
+		it changed (see `replace_if_changed`). A typedef of a struct that only
+		comes later gets no define, just like when not streaming.
+
+		Args:
+			lines(iterable): declarations, possibly still being produced.
+		"""
+		spools = {
+			kind : tempfile.TemporaryFile('w+')
+			for kind in SECTIONS + IMPORT_SECTIONS
+		}
+
+		# Tags of the structs of typedefs such as `typedef struct Point Point;`
+		forward = set()
+
+		try:
+			with using_types(self.types):
+				for compiler in self.__group(lines):
+					with stage(self.profiler, 'parse') as record:
+						self.__parse_one(compiler)
+						record['items'] = 1
+
+					# A typedef can only be used after it was declared
+					kind = compiler.KIND
+					if kind == compilers.TYPEDEF:
+						self.types.add_typedef(compiler.result)
+					elif kind == compilers.STRUCT:
+						self.types.add_struct(compiler.result)
+
+					with stage(self.profiler, 'generate') as record:
+						compiler.generate(spools[kind])
+						record['items'] = 1
+
+					if kind == compilers.TYPEDEF:
+						words = compiler.result.type
+						if len(words) > 1 and words[0] == 'struct':
+							forward.add(words[1])
+
+			# The defines of structs declared after their typedef are left
+			# out, as they are when not streaming
+			dropped = set()
+			tags = forward & self.types.structs.keys()
+			if len(tags) > 0:
+				from compilers.typedef import struct_define
+				dropped = { struct_define(i) for i in tags }
+
+			# Text mode gives the same bytes `write_if_changed` writes
+			temp = self.outfile + '.tmp'
+			with open(temp, 'w', encoding='UTF-8') as file:
+				file.write('Red/System []\n\n')
+
+				for kind in SECTIONS:
+					spools[kind].seek(0)
+
+					if kind == compilers.TYPEDEF and len(dropped) > 0:
+						file.writelines(
+							i for i in spools[kind] if i not in dropped
+						)
+					else:
+						shutil.copyfileobj(spools[kind], file)
+
+				file.write(
+					f'\n\n\n#import [\n\t"{self.dynlib}" {self.call_con} [\n'
+				)
+
+				for kind in IMPORT_SECTIONS:
+					spools[kind].seek(0)
+					shutil.copyfileobj(spools[kind], file)
+
+				file.write('\t]\n]')
+
+			with stage(self.profiler, 'write') as record:
+				self.changed = replace_if_changed(temp, self.outfile)
+				record['items'] = 1
+		finally:
+			for spool in spools.values():
+				spool.close()
+
+			# Left over if generating failed
+			if os.path.exists(self.outfile + '.tmp'):
+				os.remove(self.outfile + '.tmp')
+
+	def __group(self, lines):
+		"""
+		Creates a compiler for each declaration and yields it once all of
+		its lines have been attached to it.
+
 		Every type of C declaration gets parsed one line at a time. However,
 		for special declarations like structs, they are multiline, which means
 		that each line that makes them up should be added to `self.line`. Since
@@ -95,13 +495,13 @@ class RGB:
 		harder.
 
 		Args:
-			lines(list): declarations list
-		"""
+			lines(iterable): declarations list
 
-		# Contains compilers that have their line attached to them
-		results = []
+		Yields:
+			Each compiler, in the order of the declarations.
+		"""
 
-		# One of 'Enum' or 'Struct'
+		# `compilers.ENUM` or `compilers.STRUCT` while their lines are added
 		state = None
 
 		# Add lines that belong to Enum or Struct to this compiler
@@ -114,22 +514,26 @@ class RGB:
 
 			# If there is no state set, a new compiler can be created
 			if state == None:
-				compiler = self.__choose_compiler(line)
+				classified = self.__classify_line(line)
 
-				if compiler != None:
+				if classified != None:
+					kind, result = classified
+					compiler = compilers.create(kind, line)
+					self.kind_counts[kind] = self.kind_counts.get(kind, 0) + 1
 
-					# Set the state if there will be multiple lines
-					if compiler.__class__.__name__ == 'EnumCompiler':
-						state = 'Enum'
+					if result != None:
+						compiler.result = result
 
-					elif compiler.__class__.__name__ == 'StructCompiler':
-						state = 'Struct'
+					# Set the state if there will be multiple lines
+					if kind in (compilers.ENUM, compilers.STRUCT):
+						state = kind
 
-					# Finally, add the compiler to the list for parsing
-					results.append(compiler)
+					# Single line declarations are complete right away
+					else:
+						yield compiler
 
 			# Handle multiple lines
-			elif state == 'Struct' or state == 'Enum':
+			else:
 
 				# Add the line to the current compiler in either case
 				compiler.line += line
@@ -141,124 +545,254 @@ class RGB:
 					# End of top-level declaration?
 					if nest_level == 0:
 						state = None
+						yield compiler
 
 				# Nesting level 1 equals a single struct/enum declaration
 				elif '{' in line:
 					nest_level += 1
 
-		# Gather results from each compiler
-		for i in results:
-			i.parse()
+		# The last declaration never ended
+		if state != None:
+			yield compiler
 
-		return results
+	def parse(self, results):
+		"""
+		Calls `parse()` on every compiler, in parallel if it is worth it.
 
-	def __choose_compiler(self, line):
+		Grouping the lines of multi-line declarations has to happen in order,
+		but once every compiler has its full line they can be parsed
+		independently. The compilers are split into chunks that are parsed by
+		a pool of processes and the results are put back into the original
+		compilers in order, so the generated output is identical to parsing
+		them one after another.
+
+		If there are too few declarations to keep every process busy, less
+		processes are used, down to no extra process at all.
+
+		Compilers that already got their result while being classified and
+		the ones that are in the memo (if any) are not parsed again.
+
+		Args:
+			results(list): the compilers to parse.
 		"""
-		Figures out which compiler to use for a given line.
+		handed_over = [i for i in results if i.result != None]
+		pending = [i for i in results if i.result == None]
+
+		if self.memo != None:
+			with stage(self.profiler, 'memo lookup') as record:
+				pending = [i for i in pending if not self.memo.load(i)]
+				record['items'] = len(results) - len(handed_over)
+
+		self.counters['parses'] += len(pending)
+
+		with stage(self.profiler, 'parse') as record:
+			self.__parse_pending(pending)
+			record['items'] = len(pending)
+
+		if self.memo != None:
+			with stage(self.profiler, 'memo store') as record:
+				for i in handed_over + pending:
+					self.memo.store(i)
+				record['items'] = len(handed_over + pending)
+
+	def __parse_one(self, compiler):
+		"""
+		Parses a single compiler unless its result is already known.
+
+		Args:
+			compiler: the compiler to parse.
+		"""
+		if compiler.result == None:
+			if self.memo != None and self.memo.load(compiler):
+				return
+
+			self.counters['parses'] += 1
+			self.__parse_timed(compiler)
+
+		if self.memo != None:
+			self.memo.store(compiler)
+
+	def __parse_timed(self, compiler):
+		"""
+		Parses a compiler, telling the profiler (if any) how long it took.
+
+		Args:
+			compiler: the compiler to parse.
+		"""
+		if self.profiler == None:
+			compiler.parse()
+			return
+
+		start = time.perf_counter()
+		compiler.parse()
+		self.profiler.declaration(compiler, time.perf_counter() - start)
+
+	def __parse_pending(self, results):
+		"""
+		Parses the compilers, serially or in a process pool.
+
+		Args:
+			results(list): the compilers to parse.
+		"""
+		jobs = min(self.jobs, len(results) // PARALLEL_MIN_PER_JOB)
+
+		if jobs <= 1:
+			for i in results:
+				self.__parse_timed(i)
+			return
+
+		# Contiguous chunks so that the results can simply be concatenated
+		chunk_count = jobs * PARALLEL_CHUNKS_PER_JOB
+		chunk_size = -(-len(results) // chunk_count)
+		chunks = [
+			results[i:i + chunk_size]
+			for i in range(0, len(results), chunk_size)
+		]
+
+		# Only imported when needed since it takes a while
+		from concurrent.futures import ProcessPoolExecutor
+
+		with ProcessPoolExecutor(max_workers=jobs) as pool:
+			index = 0
+			for chunk_results in pool.map(_parse_chunk, chunks):
+				for result, seconds in chunk_results:
+					results[index].result = result
+					if self.profiler != None:
+						self.profiler.declaration(results[index], seconds)
+					index += 1
+
+	def __classify_line(self, line):
+		"""
+		Figures out which kind of declaration a given line starts.
 
 		Determines which compiler should be used to parse and then generate the
 		Red/System version of a C declaration by looking for attributes unique
 		to each one.
 
+		Only lines that look like function pointers need a trial parse to be
+		sure. If it succeeds, its result is handed to the compiler so that the
+		line is not parsed a second time.
+
 		Args:
 			line(str): The line obtained from running Clang-Format.
+
+		Returns:
+			A tuple of (kind, result of the trial parse or None), or None if
+			the line has nothing to compile.
 		"""
 		if len(line.strip()) == 0:
 			return
 
-		compiler_state = 'Single_Line'
+		self.counters['lines'] += 1
 
 		# Global Variable
 		if line.startswith('extern'):
-			return GlobalVarCompiler(line)
+			return compilers.GLOBAL_VAR, None
 
 		# Could be pound define or macro
 		elif '#define' in line:
-			if MacroCompiler.try_parse(line):
-				return MacroCompiler(line)
+			if MACRO_LINE.match(line):
+				return compilers.MACRO, None
 			else:
-				return PoundDefineCompiler(line)
+				return compilers.POUND_DEFINE, None
 
 		# Struct declaration start
 		elif 'struct' in line and ';' not in line:
-			return StructCompiler(line)
+			return compilers.STRUCT, None
 
 		# Enum declaration start
 		elif 'enum' in line:
-			if line[line.index('enum') - 1] not in alphanums + '_':
-				return EnumCompiler(line)
+			if line[line.index('enum') - 1] not in IDENT_CHARS:
+				return compilers.ENUM, None
+
+		# Function Pointer, tried once it is known to be needed (see
+		# `__select`) when only some of the declarations are generated
+		elif FUNC_PTR_START.match(line) and self.symbols != None:
+			return compilers.FUNC_PTR, None
+
+		elif FUNC_PTR_START.match(line):
+			self.counters['trial_parses'] += 1
+			result = compilers.FuncPtrCompiler.try_parse(line)
 
-		# Function Pointer
-		elif FuncPtrCompiler.try_parse(line):
-			return FuncPtrCompiler(line)
+			# Starts with 'typedef void' so it can only be a Typedef
+			if result == None:
+				return compilers.TYPEDEF, None
+
+			self.counters['handed_over'] += 1
+			return compilers.FUNC_PTR, result
 
 		# Typedef only since 'struct' and 'enum' were not run
 		elif 'typedef' in line:
-			return TypedefCompiler(line)
+			return compilers.TYPEDEF, None
 
 		# Has to be a Function if it didn't ping anything else
 		else:
-			return FunctionCompiler(line)
+			return compilers.FUNCTION, None
 
-	def __generate(self, results):
+	def generate(self):
 		"""
 		Writes all Red/System declarations to the header file.
 
 		All declarations are written in their proper order so that they remain
-		organized.
+		organized. Each section is written straight from its bucket.
 
-		Args:
-			results(list): contains all the compilers.
+		Every typedef and struct is learned by `types` first, so that the
+		types of the declarations are resolved to the Red/System type they
+		stand for and a struct isn't defined again by a typedef of it.
+
+		The whole file is put together in memory and only written if it
+		differs from the existing one (see `write_if_changed`).
 		"""
+		for i in self.buckets[compilers.TYPEDEF]:
+			self.types.add_typedef(i.result)
+
+		for i in self.buckets[compilers.STRUCT]:
+			self.types.add_struct(i.result)
 
 		# Control the output of the generated code
-		with open(self.outfile, 'w') as file:
+		file = io.StringIO()
+
+		with stage(self.profiler, 'generate') as record, \
+			using_types(self.types):
 
 			# Write the Red/System header
 			file.write('Red/System []\n\n')
 
-			# Structs
-			for i in results:
-				if i.__class__.__name__ == 'StructCompiler':
-					i.generate(file)
+			for path in self.includes:
+				file.write(f'#include %{path}\n\n')
 
-			# Pound Defines
-			for i in results:
-				if i.__class__.__name__ == 'PoundDefineCompiler':
+			# Structs, Pound Defines, Macros, Enums, Typedefs, Function Pointers
+			for kind in SECTIONS:
+				for i in self.buckets[kind]:
 					i.generate(file)
 
-			# Macros
-			for i in results:
-				if i.__class__.__name__ == 'MacroCompiler':
-					i.generate(file)
+			# A module of shared declarations has no library to import
+			if self.dynlib != None:
+				# Import the library with the appropriate calling convention:
+				file.write(
+					f'\n\n\n#import [\n\t"{self.dynlib}" {self.call_con} [\n'
+				)
 
-			# Enums
-			for i in results:
-				if i.__class__.__name__ == 'EnumCompiler':
-					i.generate(file)
-			
-			# Typedefs
-			for i in results:
-				if i.__class__.__name__ == 'TypdefCompiler':
-					i.generate(file)
+				# Functions and Global Variables
+				for kind in IMPORT_SECTIONS:
+					for i in self.buckets[kind]:
+						i.generate(file)
 
-			# Function Pointers
-			for i in results:
-				if i.__class__.__name__ == 'FuncPtrCompiler':
-					i.generate(file)
+				# Finally write the closing square bracket
+				file.write('\t]\n]')
 
-			# Import the library with the appropriate calling convention:
-			file.write(f'\n\n\n#import [\n\t"{self.dynlib}" {self.call_con} [\n')
-			
-			# Functions
-			for i in results:
-				if i.__class__.__name__ == 'FunctionCompiler':
-					i.generate(file)
+			record['items'] = sum(len(i) for i in self.buckets.values())
 
-			# Global Variabls
-			for i in results:
-				if i.__class__.__name__ == 'GlobalVarCompiler':
-					i.generate(file)
+		self.__write(file.getvalue())
 
-			# Finally write the closing square bracket
-			file.write('\t]\n]')
+	def __write(self, text):
+		"""
+		Writes the generated code to the output file unless it is already
+		there, remembering in `changed` whether it was.
+
+		Args:
+			text(str): the whole output file.
+		"""
+		with stage(self.profiler, 'write') as record:
+			self.changed = write_if_changed(self.outfile, text)
+			record['items'] = 1
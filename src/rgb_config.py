@@ -0,0 +1,78 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Settings that change what RGB generates.
+
+`TYPES` maps C types to the Red/System type they are written as. Every run
+starts with these and then learns the typedefs of the header it is
+generating, so a typedef that ends up at one of these types is written as it
+(see `red_utils.TypeRegistry`). Add the types of a library here when they
+need an exact Red/System equivalent that their typedefs don't give.
+"""
+
+
+'''
+C types (after `parse_utils.StorageType` has shortened multi-word types) and
+the Red/System type each one is written as. Red/System has no 64-bit integer,
+so 64-bit types become float64 which accepts 64-bit integer literals.
+Red/System only targets 32-bit platforms, so pointer sized integers are
+integers.
+'''
+TYPES = {
+	# Builtins
+	'char' : 'byte',
+	'bool' : 'logic',
+	'_Bool' : 'logic',
+	'short' : 'integer',
+	'int' : 'integer',
+	'long' : 'float64',
+	'float' : 'float32',
+	'double' : 'float64',
+
+	# Microsoft sized integers
+	'__int8' : 'byte',
+	'__int16' : 'integer',
+	'__int32' : 'integer',
+	'__int64' : 'float64',
+
+	# stdint.h
+	'int8_t' : 'byte',
+	'uint8_t' : 'byte',
+	'int16_t' : 'integer',
+	'uint16_t' : 'integer',
+	'int32_t' : 'integer',
+	'uint32_t' : 'integer',
+	'int64_t' : 'float64',
+	'uint64_t' : 'float64',
+	'intmax_t' : 'float64',
+	'uintmax_t' : 'float64',
+	'intptr_t' : 'integer',
+	'uintptr_t' : 'integer',
+
+	# stddef.h and friends
+	'size_t' : 'integer',
+	'ssize_t' : 'integer',
+	'ptrdiff_t' : 'integer',
+	'wchar_t' : 'integer',
+	'off_t' : 'integer'
+}
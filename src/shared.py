@@ -0,0 +1,244 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Moves the declarations that several headers have in common into one module.
+
+The headers of an SDK usually include the same internal headers, so the
+bindings generated for each of them repeat the same structs, enums, defines
+and typedefs (and the pound defines clang predefines are repeated in every
+one of them). Instead, every declaration of every header is hashed once it
+has been normalized, each unique declaration is parsed only once and the ones
+found in more than one header are written to a common module that the
+bindings of each header `#include`.
+
+Functions and global variables always stay with their own header since they
+are imported from that header's library.
+"""
+
+import os # Relative include paths
+import time # Timing each library
+import batch # Output names and summaries
+import format # Launching the formatter
+from rgb import RGB, SECTIONS # RGB compiler class, shareable kinds
+from memo import ParseMemo # Hashing normalized declarations
+
+
+def preprocess_all(jobs, llvm_dir, workers=1, cache=None, single_pass=False):
+	"""
+	Runs clang and clang-format on the header of every job.
+
+	Args:
+		jobs(list): dicts as returned by `batch.load_manifest`.
+		llvm_dir(str): the binary directory where LLVM lives
+		workers(int): how many headers to preprocess at the same time.
+		cache(PreprocessCache): cache for the formatter's output, or None.
+		single_pass(bool): see `format.preprocess`.
+
+	Returns:
+		A list with, for each job, its (declarations, seconds it took) or the
+		exception that stopped it.
+	"""
+	def run(job):
+		start = time.perf_counter()
+		try:
+			declarations, _ = format.preprocess(job['header'], llvm_dir,
+				job['include_dir'], None, cache, single_pass)
+		except Exception as e:
+			return e
+
+		return declarations, time.perf_counter() - start
+
+	if workers <= 1:
+		return [run(job) for job in jobs]
+
+	# Only imported when needed since it takes a while
+	from concurrent.futures import ThreadPoolExecutor
+
+	with ThreadPoolExecutor(max_workers=workers) as pool:
+		return list(pool.map(run, jobs))
+
+
+def include_path(common_file, out_file):
+	"""
+	Spells the path of the common module the way an output file includes it.
+
+	Red/System looks for included files relative to the file including them.
+
+	Args:
+		common_file(str): the common module.
+		out_file(str): the output file that includes it.
+
+	Returns:
+		The relative path, with forward slashes.
+	"""
+	folder = os.path.dirname(os.path.abspath(out_file))
+	path = os.path.relpath(os.path.abspath(common_file), folder)
+	return path.replace(os.sep, '/')
+
+
+def run_shared(jobs, llvm_dir, common_file, workers=1, cache=None, memo=None,
+	single_pass=False, parse_jobs=1):
+	"""
+	Generates the bindings of every job, writing the declarations that more
+	than one header has into `common_file`.
+
+	Every header is classified first so that it is known which declarations
+	are shared before any output file is written. Then the unique
+	declarations are parsed (in one go, so `parse_jobs` processes can share
+	them) and each duplicate is handed the result of the first one.
+
+	Only the pyparsing backend is supported. Dependency files and stamps are
+	not written since every output depends on every header.
+
+	Args:
+		jobs(list): dicts as returned by `batch.load_manifest`.
+		llvm_dir(str): the binary directory where LLVM lives
+		common_file(str): where to write the shared declarations.
+		workers(int): how many headers to preprocess at the same time.
+		cache(PreprocessCache): cache for the formatter's output, or None.
+		memo(ParseMemo): parse results of previous runs, or None.
+		single_pass(bool): see `format.preprocess`.
+		parse_jobs(int): how many processes to parse the unique
+			declarations with.
+
+	Returns:
+		A tuple of (summaries, totals). The summaries are the same as the ones
+		of `batch.run_batch`, with how many shared declarations each header
+		left out under 'shared'. The totals count the declarations of every
+		header, the unique ones, the shared ones and how many were parsed.
+	"""
+	libraries = []
+	summaries = []
+
+	for job, done in zip(jobs, preprocess_all(jobs, llvm_dir, workers, cache,
+		single_pass)):
+
+		if isinstance(done, Exception):
+			summaries.append(batch.failed_summary(job, done))
+			continue
+
+		declarations, seconds = done
+		start = time.perf_counter()
+		dynlib, out_file = batch.output_names(job['header'], job['dynlib'],
+			job['out_file'])
+
+		rgb_compiler = RGB(declarations, dynlib, job['call_con'], out_file)
+		keyed = [
+			(compiler, ParseMemo.key(compiler))
+			for compiler in rgb_compiler.classify()
+		]
+
+		libraries.append((job, rgb_compiler, keyed,
+			seconds + time.perf_counter() - start))
+		summaries.append(None)
+
+	# The first compiler of each declaration and the libraries that have it
+	unique = {}
+	owners = {}
+
+	for index, (_, _, keyed, _) in enumerate(libraries):
+		for compiler, key in keyed:
+			unique.setdefault(key, compiler)
+			owners.setdefault(key, set()).add(index)
+
+	common = RGB([], None, None, common_file, parse_jobs, memo)
+	common.parse(list(unique.values()))
+
+	for _, _, keyed, _ in libraries:
+		for compiler, key in keyed:
+			compiler.result = unique[key].result
+
+	shared = set(
+		key for key, compiler in unique.items()
+		if len(owners[key]) > 1 and compiler.KIND in SECTIONS
+	)
+
+	for key, compiler in unique.items():
+		if key in shared:
+			common.buckets[compiler.KIND].append(compiler)
+
+	common.generate()
+
+	# Put the summaries of the generated libraries between the failed ones
+	generated = iter(libraries)
+
+	for i, summary in enumerate(summaries):
+		if summary != None:
+			continue
+
+		job, rgb_compiler, keyed, seconds = next(generated)
+		start = time.perf_counter()
+		left_out = set(id(compiler) for compiler, key in keyed if key in shared)
+
+		for kind, bucket in rgb_compiler.buckets.items():
+			rgb_compiler.buckets[kind] = [
+				compiler for compiler in bucket if id(compiler) not in left_out
+			]
+
+		rgb_compiler.includes.append(include_path(common_file,
+			rgb_compiler.outfile))
+
+		# The shared typedefs are left out but their types are still used
+		rgb_compiler.types = common.types.copy()
+		rgb_compiler.generate()
+
+		kinds = dict(rgb_compiler.kind_counts)
+
+		summaries[i] = {
+			'header' : job['header'],
+			'out_file' : rgb_compiler.outfile,
+			'seconds' : seconds + time.perf_counter() - start,
+			'declarations' : len(rgb_compiler.declarations),
+			'kinds' : kinds,
+			'counters' : rgb_compiler.counters,
+			'shared' : len(left_out),
+			'skipped' : False,
+			'changed' : rgb_compiler.changed,
+			'error' : None
+		}
+
+	totals = {
+		'declarations' : sum(len(keyed) for _, _, keyed, _ in libraries),
+		'unique' : len(unique),
+		'shared' : len(shared),
+		'parses' : common.counters['parses']
+	}
+
+	return summaries, totals
+
+
+def print_totals(common_file, totals):
+	"""
+	Prints how much the common module saved.
+
+	Args:
+		common_file(str): where the shared declarations were written.
+		totals(dict): as returned by `run_shared`.
+	"""
+	print(
+		f' {totals["declarations"]} declarations, {totals["unique"]} unique, '
+		f'{totals["parses"]} parsed'
+	)
+	print(f' {totals["shared"]} shared declarations written to {common_file}')
+	print('-' * 80)
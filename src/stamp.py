@@ -0,0 +1,113 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Remembers what a generated file was made from so that build systems don't
+need to regenerate (and then recompile) it when nothing changed.
+
+The stamp lives next to the output file (`calc.reds.stamp`) and contains the
+hash of every input file, of the options used and of the output itself.
+Checking it only reads and hashes files, so it takes milliseconds and never
+launches clang.
+"""
+
+import os # Checking for the output file
+import json # Hashing the options
+from cache import hash_file, hash_strings, read_json, write_json
+
+
+def stamp_path(out_file):
+	"""
+	Gets the path of the stamp file for a generated file.
+
+	Args:
+		out_file(str): the generated Red/System file.
+
+	Returns:
+		The path of the stamp file.
+	"""
+	return out_file + '.stamp'
+
+
+def hash_options(options):
+	"""
+	Hashes the options that change what gets generated.
+
+	Args:
+		options(dict): option names to (JSON serializable) values.
+
+	Returns:
+		The hex hash of the options.
+	"""
+	return hash_strings(json.dumps(options, sort_keys=True))
+
+
+def is_up_to_date(out_file, options):
+	"""
+	Checks whether `out_file` would be generated exactly the same again.
+
+	It is up to date if it still has the contents it was generated with, the
+	options are the same and none of the files clang read last time changed.
+
+	Args:
+		out_file(str): the generated Red/System file.
+		options(dict): the options it would be generated with now.
+
+	Returns:
+		True if it does not need to be generated again.
+	"""
+	stamp = read_json(stamp_path(out_file))
+
+	if stamp == None or not os.path.exists(out_file):
+		return False
+
+	if stamp['options'] != hash_options(options):
+		return False
+
+	if stamp['output'] != hash_file(out_file):
+		return False
+
+	for dep, digest in stamp['deps'].items():
+		if hash_file(dep) != digest:
+			return False
+
+	return True
+
+
+def write_stamp(out_file, deps, options):
+	"""
+	Records what `out_file` was just generated from.
+
+	Args:
+		out_file(str): the generated Red/System file.
+		deps(list): the header and every file it includes.
+		options(dict): the options it was generated with.
+	"""
+	write_json(
+		stamp_path(out_file),
+		{
+			'options' : hash_options(options),
+			'output' : hash_file(out_file),
+			'deps' : { dep : hash_file(dep) for dep in deps }
+		}
+	)
@@ -0,0 +1,311 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Selects which declarations of a header are parsed and generated.
+
+Libraries are usually only needed for a few of their functions, but their
+headers pull in thousands of declarations. Before anything is parsed, every
+classified declaration is given the names it declares (found with a regular
+expression, not a grammar). A `SymbolFilter` then picks declarations by name:
+
+	include:        only the declarations with a matching name.
+	exclude:        never the declarations with a matching name.
+	reachable_from: the declarations with a matching name and every
+	                declaration they refer to, and every declaration those
+	                refer to, and so on (the structs, typedefs, enums,
+	                function pointers and defines a function needs).
+
+Each is a pattern or a list of patterns, which are globs (`gl*`) unless they
+start with `re:` (`re:gl(Begin|End)`). A declaration that isn't picked is
+never parsed, so parsing takes time in proportion to the selected API rather
+than to the whole header.
+"""
+
+import fnmatch # Glob patterns
+import re # Finding names without parsing
+import compilers # Kinds of declarations
+
+
+# Any C identifier
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+# The name of a pound define or macro
+DEFINE_NAME = re.compile(r'\s*#\s*define\s+([A-Za-z_][A-Za-z0-9_]*)')
+
+# The name of a function: the first identifier followed by a parenthesis
+CALL_NAME = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)\s*\(')
+
+# The name of a function pointer typedef
+FUNC_PTR_NAME = re.compile(
+	r'\(\s*(?:(?:__stdcall|__cdecl)\s+)?\*\s*([A-Za-z_][A-Za-z0-9_]*)'
+)
+
+# The tag of a struct, union or enum that has a body
+TAG_NAME = re.compile(
+	r'\b(?:struct|union|enum)\s+([A-Za-z_][A-Za-z0-9_]*)\s*\{'
+)
+
+# Words that are never the name of a declaration
+KEYWORDS = {
+	'auto', 'char', 'const', 'define', 'double', 'enum', 'extern', 'float',
+	'inline', 'int', 'long', 'register', 'restrict', 'short', 'signed',
+	'sizeof', 'static', 'struct', 'typedef', 'union', 'unsigned', 'void',
+	'volatile', '_Bool', '_Atomic', '__restrict', '__inline', '__stdcall',
+	'__cdecl', '__attribute__', '__declspec', '__asm__', '__extension__'
+}
+
+
+def pattern_list(patterns):
+	"""
+	Turns a pattern or several of them into a list.
+
+	Args:
+		patterns: a pattern, a list (or tuple) of patterns or None.
+
+	Returns:
+		A list of strings, or None.
+	"""
+	if patterns == None:
+		return None
+
+	if not isinstance(patterns, (list, tuple)):
+		return [str(patterns)]
+
+	return [str(i) for i in patterns]
+
+
+def matcher(patterns):
+	"""
+	Compiles glob or regular expression patterns into a single one.
+
+	Args:
+		patterns(list): the patterns, or None.
+
+	Returns:
+		A function that tells whether a name matches any of the patterns, or
+		None if there are no patterns.
+	"""
+	if patterns == None:
+		return None
+
+	expressions = [
+		i[3:] if i.startswith('re:') else fnmatch.translate(i)
+		for i in patterns
+	]
+	expression = re.compile('|'.join(f'(?:{i})' for i in expressions))
+
+	return lambda name: expression.fullmatch(name) != None
+
+
+def last_name(text):
+	"""
+	Finds the last identifier of a declaration, ignoring array sizes and
+	initializers.
+
+	Args:
+		text(str): the C code.
+
+	Returns:
+		The identifier, or None.
+	"""
+	text = re.split(r'[;\[=]', text, 1)[0]
+	names = [i for i in IDENTIFIER.findall(text) if i not in KEYWORDS]
+	return names[-1] if len(names) > 0 else None
+
+
+def declared_names(compiler):
+	"""
+	Finds the names a declaration declares without parsing it.
+
+	Structs and enums can have both a tag and the names of a typedef after
+	their closing brace.
+
+	Args:
+		compiler: a compiler that has its line (and maybe its result).
+
+	Returns:
+		A tuple of names, empty if none could be found.
+	"""
+	kind = compiler.KIND
+	line = compiler.line
+	names = []
+
+	if compiler.result != None:
+		result = compiler.result
+		names.append(result.values[1] if kind == compilers.POUND_DEFINE
+			else result.name)
+
+	if kind in (compilers.POUND_DEFINE, compilers.MACRO):
+		match = DEFINE_NAME.match(line)
+		names.append(match and match.group(1))
+
+	elif kind == compilers.FUNCTION:
+		for match in CALL_NAME.finditer(line):
+			if match.group(1) not in KEYWORDS:
+				names.append(match.group(1))
+				break
+
+	elif kind == compilers.FUNC_PTR:
+		match = FUNC_PTR_NAME.search(line)
+		names.append(match and match.group(1))
+
+	elif kind in (compilers.STRUCT, compilers.ENUM):
+		match = TAG_NAME.search(line)
+		names.append(match and match.group(1))
+
+		# typedef struct { ... } Name, *PName;
+		if '}' in line:
+			tail = line[line.rindex('}') + 1:].split(';')[0]
+			names.extend(i for i in IDENTIFIER.findall(tail)
+				if i not in KEYWORDS)
+
+	else:
+		names.append(last_name(line))
+
+	return tuple(dict.fromkeys(i for i in names if i != None))
+
+
+def references(compiler):
+	"""
+	Finds every identifier a declaration mentions. Parameter and field names
+	are included, which only matters if they happen to be the name of
+	another declaration.
+
+	Args:
+		compiler: a compiler that has its line.
+
+	Returns:
+		A set of names.
+	"""
+	return set(IDENTIFIER.findall(compiler.line)) - KEYWORDS
+
+
+class SymbolFilter:
+	"""
+	Picks the declarations to parse and generate by their names.
+
+	Attributes:
+		include(list): patterns of the names to generate, or None.
+		exclude(list): patterns of the names to leave out, or None.
+		reachable_from(list): patterns of the names to generate along with
+			everything they depend on, or None.
+	"""
+	__slots__ = ('include', 'exclude', 'reachable_from')
+
+	def __init__(self, include=None, exclude=None, reachable_from=None):
+		"""
+		Constructor.
+
+		Args:
+			include: a pattern, a list of them or None.
+			exclude: a pattern, a list of them or None.
+			reachable_from: a pattern, a list of them or None.
+		"""
+		self.include = pattern_list(include)
+		self.exclude = pattern_list(exclude)
+		self.reachable_from = pattern_list(reachable_from)
+
+	def options(self):
+		"""
+		Returns:
+			The patterns as a dict, to be stamped (see `stamp`).
+		"""
+		return {
+			'include' : self.include,
+			'exclude' : self.exclude,
+			'reachable_from' : self.reachable_from
+		}
+
+	def select(self, compilers):
+		"""
+		Picks the declarations to parse and generate.
+
+		Args:
+			compilers(list): every classified declaration, parsed or not.
+
+		Returns:
+			The picked compilers, in the same order.
+		"""
+		include = matcher(self.include)
+		exclude = matcher(self.exclude)
+		reachable_from = matcher(self.reachable_from)
+
+		# Excluded declarations can't be picked or depended upon
+		named = []
+		for compiler in compilers:
+			names = declared_names(compiler)
+			if exclude == None or not any(exclude(i) for i in names):
+				named.append((compiler, names))
+
+		if include == None and reachable_from == None:
+			return [compiler for compiler, _ in named]
+
+		picked = set()
+		pending = []
+
+		for compiler, names in named:
+			if include != None and any(include(i) for i in names):
+				picked.add(id(compiler))
+
+			if reachable_from != None and any(reachable_from(i) for i in names):
+				picked.add(id(compiler))
+				pending.append(compiler)
+
+		# Every declaration of each name, since a struct can be declared
+		# before it is defined
+		declarations = {}
+		for compiler, names in named:
+			for name in names:
+				declarations.setdefault(name, []).append(compiler)
+
+		walked = set()
+		while len(pending) > 0:
+			compiler = pending.pop()
+			if id(compiler) in walked:
+				continue
+
+			walked.add(id(compiler))
+			picked.add(id(compiler))
+
+			for name in references(compiler):
+				pending.extend(declarations.get(name, ()))
+
+		return [compiler for compiler, _ in named if id(compiler) in picked]
+
+
+def symbol_filter(include=None, exclude=None, reachable_from=None):
+	"""
+	Creates a `SymbolFilter` if any patterns are given.
+
+	Args:
+		include: a pattern, a list of them or None.
+		exclude: a pattern, a list of them or None.
+		reachable_from: a pattern, a list of them or None.
+
+	Returns:
+		The filter, or None when every declaration is generated.
+	"""
+	if include == None and exclude == None and reachable_from == None:
+		return None
+
+	return SymbolFilter(include, exclude, reachable_from)
@@ -0,0 +1,104 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for RGB. Run them from the root of the repository:
+
+	python -m pytest tests
+"""
+
+import os # Finding the source folder
+import sys # Making the source modules importable
+import pytest # Fixtures
+
+# The source modules import each other by name, just like when running
+# src/main.py, so the source folder has to be on the path.
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src')
+
+if SRC_DIR not in sys.path:
+	sys.path.insert(0, SRC_DIR)
+
+# Stands in for clang: leaves out the preprocessor lines of the header, which
+# is the only file it reads, unless asked to keep the pound defines with -dD.
+# It only knows the pound defines of the header.
+CLANG = '''#!/bin/sh
+case "$1" in
+	--version) echo "clang version 1.0"; exit 0;;
+	-dM) grep '^#define' "$3"; exit 0;;
+esac
+[ -f "$4" ] || exit 1
+echo "out.o: $4" > "$7"
+echo "# 1 \\"$4\\""
+if [ "$8" = "-dD" ]; then cat "$4"; else grep -v '^#' "$4"; fi
+exit 0
+'''
+
+# Stands in for clang-format: the header is already formatted
+CLANG_FORMAT = '''#!/bin/sh
+if [ "$1" = "--version" ]; then echo "clang-format version 1.0"; exit 0; fi
+cat
+'''
+
+
+@pytest.fixture
+def generate(tmp_path):
+	"""
+	Generates Red/System code from declarations, the way `main.py gen` does
+	once clang has preprocessed the header.
+
+	Returns:
+		A function that takes the declarations (one per line), the dynamic
+		library and any other options of `RGB` and returns the contents of
+		the output file.
+	"""
+	# Only imported once the source folder is on the path
+	from rgb import RGB
+
+	def run(declarations, dynlib='lib.dll', **options):
+		out_file = str(tmp_path / 'out.reds')
+		lines = [i + '\n' for i in declarations.strip().split('\n')]
+		RGB(lines, dynlib, 'cdecl', out_file, **options).compile()
+
+		with open(out_file) as file:
+			return file.read()
+
+	return run
+
+
+@pytest.fixture
+def llvm_dir(tmp_path):
+	"""
+	Creates a clang and a clang-format that are enough to run RGB on headers
+	that are already preprocessed and formatted (see `CLANG`).
+
+	Returns:
+		The folder they are in, ending with a slash.
+	"""
+	folder = tmp_path / 'llvm'
+	folder.mkdir()
+
+	for name, script in (('clang', CLANG), ('clang-format', CLANG_FORMAT)):
+		(folder / name).write_text(script)
+		os.chmod(folder / name, 0o755)
+
+	return f'{folder}/'
@@ -0,0 +1,118 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for the asyncio pipeline, with clang stubbed out.
+"""
+
+import asyncio # Running the pipeline
+import json # Writing manifests
+import pytest # Fixtures
+import async_batch # Code under test
+import batch # Reading manifests
+
+# What clang and clang-format turn each header into
+DECLARATIONS = [
+	'float calc_add(float x, float y);\n',
+	'float calc_sub(float x, float y);\n',
+]
+
+
+@pytest.fixture
+def preprocessed(monkeypatch):
+	"""
+	Replaces the tools with `DECLARATIONS`.
+
+	Returns:
+		The list of headers that were preprocessed.
+	"""
+	headers = []
+
+	async def preprocess(header, *args, **kwargs):
+		headers.append(header)
+		return list(DECLARATIONS), [header]
+
+	monkeypatch.setattr(async_batch, 'preprocess', preprocess)
+	return headers
+
+
+def test_manifest_symbol_options_pick_declarations(tmp_path, preprocessed):
+	(tmp_path / 'calc.h').write_text('')
+	(tmp_path / 'rgb.json').write_text(json.dumps([{
+		'header' : 'calc.h',
+		'out_file' : 'calc.reds',
+		'include_symbols' : ['calc_add'],
+	}]))
+
+	jobs = batch.load_manifest(str(tmp_path / 'rgb.json'))
+	summary, = asyncio.run(async_batch.compile_many(jobs, 'llvm'))
+
+	assert summary['error'] == None
+	assert summary['kinds'] == {'Function': 1}
+	assert 'calc_sub' not in (tmp_path / 'calc.reds').read_text()
+
+
+def test_compile_many_generates_what_run_library_does(
+	tmp_path, monkeypatch, llvm_dir
+):
+	monkeypatch.chdir(tmp_path)
+	headers = ['calc.h', 'geom.h', 'text.h']
+
+	for i in headers:
+		name = i[:-2]
+		(tmp_path / i).write_text(
+			f'#define {name.upper()}_H 1\n'
+			f'float {name}_add(float x, float y);\n'
+		)
+
+	jobs = [
+		{ 'header' : i, 'out_file' : i[:-2] + '.reds' }
+		for i in headers + ['missing.h']
+	]
+	summaries = asyncio.run(
+		async_batch.compile_many(jobs, llvm_dir, concurrency=2)
+	)
+
+	assert [i['error'] == None for i in summaries] == [True] * 3 + [False]
+
+	for i in headers:
+		output = (tmp_path / (i[:-2] + '.reds')).read_text()
+		batch.run_library(i, llvm_dir, dump_file=None,
+			out_file=i[:-2] + '.sync.reds')
+		assert (tmp_path / (i[:-2] + '.sync.reds')).read_text() == output
+		assert f'{i[:-2]}_add: "{i[:-2]}_add"' in output
+
+
+def test_process_limit_never_runs_more_than_its_count():
+	limit = async_batch.ProcessLimit(2)
+
+	async def stage(processes):
+		async with limit.hold(processes):
+			assert limit.running <= 2
+			await asyncio.sleep(0.01)
+
+	async def run():
+		await asyncio.gather(*[stage(i % 3 + 1) for i in range(9)])
+
+	asyncio.run(run())
+	assert (limit.running, limit.peak) == (0, 2)
@@ -0,0 +1,90 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for the whole pipeline, from the header to the output file.
+"""
+
+import pytest # Fixtures
+import batch # Code under test
+import rgb # Parsing small headers in processes
+
+# A header as it is once clang-format has formatted it
+HEADER = '''#define CALC_VERSION 3
+typedef unsigned int DWORD;
+typedef DWORD *LPDWORD;
+typedef struct Point Point;
+struct Point
+{
+    int x, y;
+    union
+    {
+        DWORD bits;
+        float value;
+    } u;
+    unsigned flags : 3, more : 2;
+};
+float calc_add(float x, float y);
+float calc_sub(float x, float y);
+void calc_point(Point *p, LPDWORD out);
+'''
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch, llvm_dir):
+	"""
+	Writes `HEADER` to calc.h.
+
+	Returns:
+		A function that runs `batch.run_library` on it with the given
+		options and returns the output.
+	"""
+	monkeypatch.chdir(tmp_path)
+	(tmp_path / 'calc.h').write_text(HEADER)
+
+	def run(**options):
+		out_file = tmp_path / 'calc.reds'
+		batch.run_library('calc.h', llvm_dir, dump_file=None,
+			out_file=str(out_file), **options)
+		return out_file.read_text()
+
+	return run
+
+
+def test_parsing_in_processes_generates_the_same(library, monkeypatch):
+	output = library()
+	monkeypatch.setattr(rgb, 'PARALLEL_MIN_PER_JOB', 1)
+
+	assert 'calc_add: "calc_add"' in output
+	assert 'Point!: alias struct!' in output
+	assert library(jobs=2) == output
+
+
+def test_streaming_generates_the_same(library):
+	output = library()
+
+	assert library(stream=True) == output
+
+	output = library(single_pass=True)
+	assert '#define CALC_VERSION 3' in output
+	assert library(stream=True, single_pass=True) == output
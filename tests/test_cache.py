@@ -0,0 +1,75 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for the cache of clang's output.
+"""
+
+from cache import PreprocessCache # Code under test
+from profiler import Profiler # Counting what a stage handled
+import format # Preprocessing through the cache
+
+
+def test_hits_until_an_input_changes(tmp_path, monkeypatch, llvm_dir):
+	monkeypatch.chdir(tmp_path)
+	header = tmp_path / 'calc.h'
+	header.write_text('float add(float x, float y);\n')
+	cache = PreprocessCache(str(tmp_path / 'cache'))
+	stored = (['float add(float x, float y);\n'], [str(header)])
+
+	assert cache.lookup(str(header), llvm_dir, '.') == None
+	cache.store(str(header), llvm_dir, '.', stored[1], stored[0])
+	assert cache.lookup(str(header), llvm_dir, '.') == stored
+	assert (cache.hits, cache.misses) == (1, 1)
+
+	header.write_text('float sub(float x, float y);\n')
+	assert cache.lookup(str(header), llvm_dir, '.') == None
+
+
+def test_a_new_style_misses(tmp_path, monkeypatch, llvm_dir):
+	monkeypatch.chdir(tmp_path)
+	header = tmp_path / 'calc.h'
+	header.write_text('float add(float x, float y);\n')
+	cache = PreprocessCache(str(tmp_path / 'cache'))
+	cache.store(str(header), llvm_dir, '.', [str(header)], ['add\n'])
+
+	(tmp_path / '.clang-format').write_text('IndentWidth: 4\n')
+	assert cache.lookup(str(header), llvm_dir, '.') == None
+
+	cache.store(str(header), llvm_dir, '.', [str(header)], ['add\n'])
+	(tmp_path / '.clang-format').write_text('IndentWidth: 8\n')
+	assert cache.lookup(str(header), llvm_dir, '.') == None
+
+
+def test_hits_are_profiled(tmp_path, monkeypatch, llvm_dir):
+	monkeypatch.chdir(tmp_path)
+	header = tmp_path / 'calc.h'
+	header.write_text('float add(float x, float y);\n')
+	cache = PreprocessCache(str(tmp_path / 'cache'))
+	cache.store(str(header), llvm_dir, '.', [str(header)], ['a\n', 'b\n'])
+	profiler = Profiler()
+
+	format.preprocess(str(header), llvm_dir, '.', None, cache,
+		profiler=profiler)
+
+	assert profiler.stages['cache lookup']['items'] == 2
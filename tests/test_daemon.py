@@ -0,0 +1,66 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for the daemon.
+"""
+
+import socket # Pretending to be a running daemon
+import pytest # Checking errors
+import daemon # Code under test
+
+# Stands in for clang-format: also prints the style it found, if any
+STYLED = '''#!/bin/sh
+cat
+cat .clang-format 2> /dev/null
+'''
+
+
+def test_a_running_daemon_keeps_its_socket(tmp_path):
+	path = str(tmp_path / 'rgb.sock')
+
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as running:
+		running.bind(path)
+		running.listen()
+
+		with pytest.raises(Exception, match='already serving'):
+			daemon.serve(path)
+
+	assert (tmp_path / 'rgb.sock').exists()
+
+
+def test_clang_format_runs_in_the_folder_of_the_request(tmp_path, llvm_dir):
+	(tmp_path / 'llvm' / 'clang-format').write_text(STYLED)
+
+	project = tmp_path / 'project'
+	project.mkdir()
+	(project / 'calc.h').write_text('float add(float x, float y);\n')
+	(project / '.clang-format').write_text('float styled(int x);\n')
+
+	response = daemon.Daemon(llvm_dir).answer({
+		'command' : 'gen', 'header' : 'calc.h', 'cwd' : str(project)
+	})
+
+	assert response['ok'], response
+	assert 'add: "add"' in response['text']
+	assert 'styled: "styled"' in response['text']
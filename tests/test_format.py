@@ -0,0 +1,45 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for running clang and clang-format.
+"""
+
+import pytest # Checking errors
+import format # Code under test
+
+# Stands in for clang-format: writes bytes that aren't UTF-8 after the header
+GARBLED = '''#!/bin/sh
+cat
+printf 'float \\377(void);\\n'
+'''
+
+
+def test_stream_raises_what_the_reader_could_not_read(tmp_path, llvm_dir):
+	(tmp_path / 'llvm' / 'clang-format').write_text(GARBLED)
+	header = tmp_path / 'calc.h'
+	header.write_text('float add(float x, float y);\n')
+	stream = format.HeaderStream(str(header), llvm_dir, '.', None)
+
+	with pytest.raises(UnicodeDecodeError):
+		list(stream)
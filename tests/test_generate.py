@@ -0,0 +1,140 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests that generate the examples and compare them with their outputs in
+example/*.reds, the order of the sections included.
+"""
+
+import os # Finding the examples
+
+# Where the examples are
+EXAMPLE_DIR = os.path.join(
+	os.path.dirname(os.path.dirname(__file__)), 'example'
+)
+
+
+def expected(name):
+	"""
+	Reads the output of an example. The examples were generated on Windows,
+	where every line clang printed also ended up with a carriage return.
+
+	Args:
+		name(str): the name of the example.
+
+	Returns:
+		The output, without carriage returns.
+	"""
+	path = os.path.join(EXAMPLE_DIR, name + '.reds')
+	with open(path, newline='') as file:
+		return file.read().replace('\r', '')
+
+
+def predefined(output):
+	"""
+	Recovers the macros clang predefined from the output of an example, as
+	they are only recorded there.
+
+	Args:
+		output(str): the output of the example.
+
+	Returns:
+		The `#define` lines clang printed, in order.
+	"""
+	lines = output.split('\n')
+	result = []
+
+	for i, line in enumerate(lines):
+		# Warnings quote the line they were made from
+		if line.startswith('; Line in Question from Header:'):
+			result.append(lines[i + 1][2:])
+
+		elif line.startswith('#define') and not lines[i - 1].startswith(
+			'; WARNING!'
+		):
+			result.append(line[:-3] if line.endswith(' []') else line)
+
+		elif line.startswith('#import'):
+			break
+
+	return result
+
+
+def test_calc(generate):
+	output = expected('calc')
+	functions = [
+		f'__declspec(dllexport) float __cdecl colonist_{i}(float x, float y);'
+		for i in ('add', 'sub', 'mul', 'div')
+	]
+
+	assert generate(
+		'\n'.join(functions + predefined(output)), 'calc.dll'
+	) == output
+
+
+def test_multiple_struct_variable_declarations(generate):
+	output = expected('multiple_struct_variable_declarations')
+	struct = [
+		'struct Point',
+		'{',
+		'    int x, y, z;',
+		'',
+		'    char **first_name, last_name;',
+		'};',
+	]
+
+	assert generate(
+		'\n'.join(struct + predefined(output)), 'example.dll'
+	) == output
+
+
+def test_typedef_of_a_struct_uses_its_alias(generate):
+	output = generate(
+		'struct Point\n'
+		'{\n'
+		'    int x;\n'
+		'};\n'
+		'typedef struct Point Point;\n'
+		'typedef struct Opaque Opaque;'
+	)
+
+	assert 'Point!: alias struct!' in output
+	assert '#define Point!' not in output
+	assert '#define Opaque! [pointer! [byte!]]' in output
+
+
+def test_typedef_before_its_struct_streams_like_it_generates(generate):
+	declarations = (
+		'typedef struct Point Point;\n'
+		'typedef struct Opaque Opaque;\n'
+		'typedef int Length;\n'
+		'struct Point\n'
+		'{\n'
+		'    Length x;\n'
+		'};'
+	)
+	output = generate(declarations)
+
+	assert '#define Point!' not in output
+	assert '#define Opaque! [pointer! [byte!]]' in output
+	assert generate(declarations, stream=True) == output
@@ -0,0 +1,73 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for IR files.
+"""
+
+import pytest # Checking errors
+import ir_file # Code under test
+from rgb import RGB # Parsing declarations to write
+
+
+def emit(path, out_file):
+	"""
+	Parses a few declarations and writes them to an IR file.
+
+	Args:
+		path(str): the IR file.
+		out_file(str): where the declarations are generated.
+	"""
+	lines = ['#define SIZE 4\n', 'int add(int a, int b);\n']
+	ir_file.write(path, RGB(lines, 'lib.dll', 'cdecl', out_file).compile())
+
+
+def test_declarations_are_read_back(tmp_path):
+	path = str(tmp_path / 'lib.rgbir')
+	emit(path, str(tmp_path / 'lib.reds'))
+
+	with ir_file.IRFile(path) as results:
+		assert results.kinds == ('PoundDefine', 'Function')
+		assert [i.line for i in results] == [
+			'#define SIZE 4\n', 'int add(int a, int b);\n'
+		]
+
+
+@pytest.mark.parametrize('contents', [b'', b'RGBIR\0\0', b'not an IR file!!'])
+def test_other_files_are_rejected(tmp_path, contents):
+	path = tmp_path / 'other.rgbir'
+	path.write_bytes(contents)
+
+	with pytest.raises(Exception, match='is not an IR file'):
+		with ir_file.IRFile(str(path)):
+			pass
+
+
+def test_truncated_files_are_rejected(tmp_path):
+	path = tmp_path / 'lib.rgbir'
+	emit(str(path), str(tmp_path / 'lib.reds'))
+	path.write_bytes(path.read_bytes()[:ir_file.HEADER.size + 8])
+
+	with pytest.raises(Exception, match='is truncated'):
+		with ir_file.IRFile(str(path)):
+			pass
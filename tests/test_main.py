@@ -0,0 +1,57 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for reading command lines without Fire.
+"""
+
+import pytest # Parametrized tests
+import fire.parser # What the values have to match
+from main import CLI, parse_command, parse_value # Code under test
+
+
+@pytest.mark.parametrize('value', [
+	'add', '1', '-3', '0x10', '1.5', 'True', 'None', '"text"', '1-2', 'a.b',
+	'x#y', 'calc.h', 'C:/LLVM/bin'
+])
+def test_values_are_parsed_like_fire(value):
+	expected = fire.parser.DefaultParseValue(value)
+
+	assert parse_value(value) == expected
+	assert type(parse_value(value)) == type(expected)
+
+
+@pytest.mark.parametrize('value', ['[add,mul]', 'add,mul', '(add,)'])
+def test_containers_are_left_to_fire(value):
+	argv = ['gen', 'calc.h', 'llvm', '--include-symbols', value]
+
+	assert parse_command(CLI(), argv) == None
+
+
+def test_simple_command_lines_are_parsed():
+	argv = ['gen', 'calc.h', 'llvm', '--jobs=4', '--include-symbols', 'add']
+	method, args, kwargs = parse_command(CLI(), argv)
+
+	assert method.__name__ == 'gen'
+	assert args == ['calc.h', 'llvm']
+	assert kwargs == {'jobs' : 4, 'include_symbols' : 'add'}
@@ -0,0 +1,68 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for the memo of parse results.
+"""
+
+import parse_utils # Changing the grammar version
+from memo import ParseMemo # Code under test
+
+DECLARATIONS = (
+	'typedef unsigned int DWORD;\n'
+	'float calc_add(float x, float y);\n'
+	'float calc_sub(float x, DWORD y);'
+)
+
+
+def test_saved_results_are_reused(generate, tmp_path):
+	path = str(tmp_path / 'memo.json')
+	memo = ParseMemo(path)
+	output = generate(DECLARATIONS, memo=memo)
+	memo.save()
+	assert (memo.hits, memo.misses) == (0, 3)
+
+	memo = ParseMemo(path)
+	assert generate(DECLARATIONS, memo=memo) == output
+	assert (memo.hits, memo.misses) == (3, 0)
+
+
+def test_changed_declarations_are_parsed_again(generate, tmp_path):
+	memo = ParseMemo(str(tmp_path / 'memo.json'))
+	generate(DECLARATIONS, memo=memo)
+
+	output = generate(DECLARATIONS.replace('calc_sub', 'calc_mul'), memo=memo)
+	assert (memo.hits, memo.misses) == (2, 4)
+	assert 'calc_mul: "calc_mul"' in output
+
+
+def test_a_new_grammar_version_parses_everything_again(
+	generate, tmp_path, monkeypatch
+):
+	memo = ParseMemo(str(tmp_path / 'memo.json'))
+	generate(DECLARATIONS, memo=memo)
+
+	monkeypatch.setattr(parse_utils, 'GRAMMAR_VERSION',
+		parse_utils.GRAMMAR_VERSION + 1)
+	generate(DECLARATIONS, memo=memo)
+	assert (memo.hits, memo.misses) == (0, 6)
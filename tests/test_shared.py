@@ -0,0 +1,68 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for moving shared declarations into a common module.
+"""
+
+import shared # Code under test
+
+# What both headers declare
+COMMON = '#define SHARED_H 1\ntypedef unsigned int DWORD;\n'
+
+
+def test_shared_declarations_are_generated_once(
+	tmp_path, monkeypatch, llvm_dir
+):
+	monkeypatch.chdir(tmp_path)
+	(tmp_path / 'calc.h').write_text(COMMON + 'DWORD calc_add(DWORD x);\n')
+	(tmp_path / 'geom.h').write_text(
+		COMMON + 'typedef float REAL;\nDWORD geom_area(REAL x);\n'
+	)
+
+	jobs = [
+		{
+			'header' : i, 'dynlib' : None, 'call_con' : 'cdecl',
+			'out_file' : i[:-2] + '.reds', 'include_dir' : '.'
+		}
+		for i in ('calc.h', 'geom.h')
+	]
+	summaries, totals = shared.run_shared(jobs, llvm_dir, 'common.reds')
+
+	common = (tmp_path / 'common.reds').read_text()
+	calc = (tmp_path / 'calc.reds').read_text()
+	geom = (tmp_path / 'geom.reds').read_text()
+
+	assert '#define DWORD! [integer!]' in common
+	assert '#define SHARED_H 1' in common
+	assert 'calc_add' not in common and 'geom_area' not in common
+
+	for output, summary in ((calc, summaries[0]), (geom, summaries[1])):
+		assert '#include %common.reds' in output
+		assert '#define DWORD!' not in output
+		assert summary['shared'] == 2
+
+	assert 'calc_add: "calc_add"' in calc
+	assert '#define REAL! [float32!]' in geom
+	assert 'x [integer!]' in calc and 'x [float32!]' in geom
+	assert totals['shared'] == 2
@@ -0,0 +1,80 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for skipping libraries that are up to date.
+"""
+
+import pytest # Fixtures
+import batch # Code under test
+import rgb_config # Changing the builtin types
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+	"""
+	A header whose declarations are made up instead of running clang.
+
+	Returns:
+		A function that runs `batch.run_library` on it and returns whether
+		it was skipped.
+	"""
+	monkeypatch.chdir(tmp_path)
+	header = tmp_path / 'calc.h'
+	header.write_text('float add(float x, float y);\n')
+
+	def preprocess(header, *args, **kwargs):
+		return ['float add(float x, float y);\n'], [header]
+
+	monkeypatch.setattr(batch.format, 'preprocess', preprocess)
+
+	def run():
+		return batch.run_library(str(header), 'llvm', dump_file=None,
+			out_file=str(tmp_path / 'calc.reds'),
+			skip_if_up_to_date=True)['skipped']
+
+	return run
+
+
+def test_skips_until_the_header_changes(tmp_path, library):
+	assert not library()
+	assert library()
+
+	(tmp_path / 'calc.h').write_text('float sub(float x, float y);\n')
+	assert not library()
+	assert library()
+
+
+def test_a_new_style_is_not_up_to_date(tmp_path, library):
+	assert not library()
+
+	(tmp_path / '.clang-format').write_text('IndentWidth: 4\n')
+	assert not library()
+	assert library()
+
+
+def test_new_builtin_types_are_not_up_to_date(library, monkeypatch):
+	assert not library()
+
+	monkeypatch.setitem(rgb_config.TYPES, 'HANDLE', 'integer!')
+	assert not library()
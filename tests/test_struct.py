@@ -0,0 +1,109 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for the struct parser.
+"""
+
+from compilers.struct import parse_struct, struct_rows # Code under test
+
+
+def rows(text):
+	"""
+	Parses a struct and generates its fields.
+
+	Args:
+		text(str): the C code of the struct.
+
+	Returns:
+		The Red/System rows without the empty ones.
+	"""
+	result = []
+	struct_rows(parse_struct(text).members, 0, result)
+	return [i for i in result if i != '']
+
+
+def test_qualified_pointers_keep_their_names():
+	assert rows(
+		'struct Q { const char * const *pp; char * const q; '
+		'int * volatile restrict r; };'
+	) == [
+		'pp [pointer! [integer!]] ; const char * const *pp;',
+		'q [pointer! [integer!]]',
+		'r [pointer! [integer!]]',
+	]
+
+
+def test_unions_take_up_the_room_of_their_largest_member():
+	assert rows(
+		'struct S { int a; union { int i; float f; } u; '
+		'union { double d; int i; } v; char c; };'
+	) == [
+		'a [integer!]',
+		'u [integer!] ; Please check, union { int i; float f; } u',
+		'v [float64!] ; Please check, union { double d; int i; } v',
+		'c [byte!]',
+	]
+
+
+def test_unions_are_laid_out_with_the_typedefs_and_structs_of_the_header(
+	generate
+):
+	text = generate('\n'.join([
+		'typedef unsigned int DWORD;',
+		'typedef double REAL;',
+		'struct Foo', '{', '    char c[12];', '};',
+		'struct S', '{',
+		'    union', '    {', '        DWORD low;', '        char c;',
+		'    } u;',
+		'    union', '    {', '        REAL r;', '        int i;', '    } v;',
+		'    union', '    {', '        struct Foo f;', '        int i;',
+		'    } w;',
+		'};',
+	]))
+
+	assert 'u [integer!] ; Please check, union { DWORD low; char c; } u' \
+		in text
+	assert 'v [float64!] ; Please check, union { REAL r; int i; } v' in text
+	assert 'w_1 [integer!] ; Please check, union { struct Foo f; int i; } w' \
+		in text
+	assert 'w_3 [integer!]' in text
+
+
+def test_unions_of_unknown_size_get_a_placeholder():
+	assert rows('struct S { union { struct Foo f; int i; } u; };') == [
+		'u [integer!] ; WARNING! Unknown size, please check: '
+		'union { struct Foo f; int i; } u',
+	]
+
+
+def test_bit_fields_share_storage_units():
+	assert rows(
+		'struct S { unsigned flags : 3, more : 2; unsigned rest : 28; '
+		'char c; unsigned char low : 4, : 4; };'
+	) == [
+		'flags [integer!] ; Please check, bit fields flags : 3, more : 2',
+		'rest [integer!] ; Please check, bit fields rest : 28',
+		'c [byte!]',
+		'low [byte!] ; Please check, bit fields low : 4, : 4',
+	]
@@ -0,0 +1,84 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for picking declarations by name.
+"""
+
+from symbols import symbol_filter # Code under test
+
+DECLARATIONS = '\n'.join([
+	'#define CALC_MAX 10',
+	'typedef unsigned int DWORD;',
+	'typedef DWORD *LPDWORD;',
+	'typedef float REAL;',
+	'float calc_add(float x, float y);',
+	'void calc_get(LPDWORD out);',
+	'REAL gl_sin(REAL x);',
+])
+
+
+def picked(generate, **patterns):
+	"""
+	Generates `DECLARATIONS` with a filter.
+
+	Args:
+		patterns: the arguments of `symbol_filter`.
+
+	Returns:
+		The names of the functions and defines in the output.
+	"""
+	output = generate(DECLARATIONS, symbols=symbol_filter(**patterns))
+	names = []
+
+	for line in output.split('\n'):
+		if line.startswith('#define'):
+			names.append(line.split()[1].rstrip('!'))
+		elif line.endswith('"'):
+			names.append(line.split(':')[0])
+
+	return names
+
+
+def test_include_only_keeps_matching_names(generate):
+	assert picked(generate, include=['calc_*', 'CALC_MAX']) == [
+		'CALC_MAX', 'calc_add', 'calc_get'
+	]
+
+
+def test_exclude_leaves_out_matching_names(generate):
+	assert picked(generate, exclude='re:(calc|gl)_.*') == [
+		'CALC_MAX', 'DWORD', 'LPDWORD', 'REAL'
+	]
+
+
+def test_reachable_from_keeps_what_the_names_depend_on(generate):
+	assert picked(generate, reachable_from='calc_get') == [
+		'DWORD', 'LPDWORD', 'calc_get'
+	]
+
+
+def test_exclude_wins_over_reachable_from(generate):
+	assert picked(generate, reachable_from='calc_get', exclude='DWORD') == [
+		'LPDWORD', 'calc_get'
+	]
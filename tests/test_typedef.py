@@ -0,0 +1,76 @@
+"""
+MIT License
+
+Copyright (c) 2018 Samuel Wilder
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+
+Tests for typedefs.
+"""
+
+from red_utils import TypeRegistry # Code under test
+
+
+def test_pointer_typedefs_are_resolved(generate):
+	output = generate(
+		'typedef UINT DWORD;\n'
+		'typedef DWORD *LPDWORD;\n'
+		'typedef char *LPSTR;\n'
+		'void f(LPDWORD b, LPSTR c);'
+	)
+
+	assert output.count('#define DWORD!') == 1
+	assert '#define char!' not in output
+	assert '#define LPDWORD! [pointer! [integer!]]' in output
+	assert '#define LPSTR! [pointer! [integer!]]' in output
+	assert 'b [pointer! [integer!]]' in output
+	assert 'c [pointer! [integer!]]' in output
+
+
+def test_typedefs_without_a_type_are_not_generated(generate):
+	output = generate('typedef DWORD;')
+
+	assert '#define DWORD!' not in output
+	assert 'Raw C Code Detected' in output
+
+
+def test_learning_a_typedef_keeps_the_chains_already_resolved():
+	registry = TypeRegistry({'int' : 'integer!'})
+	registry.add('DWORD', 'int')
+	registry.add('LPDWORD', 'DWORD', 1)
+
+	assert registry.resolve('LPDWORD') == ('integer!', 1)
+	assert registry.resolve('HANDLE') == ('HANDLE', 0)
+
+	registry.add('HANDLE', 'LPDWORD', 1)
+
+	assert registry.resolved['LPDWORD'] == ('integer!', 1)
+	assert registry.resolve('HANDLE') == ('integer!', 2)
+
+
+def test_declaring_a_typedef_again_forgets_what_was_resolved():
+	registry = TypeRegistry({'int' : 'integer!', 'char' : 'byte!'})
+	registry.add('DWORD', 'int')
+	registry.add('LPDWORD', 'DWORD', 1)
+	registry.resolve('LPDWORD')
+
+	registry.add('DWORD', 'char')
+
+	assert registry.resolve('LPDWORD') == ('byte!', 1)